@@ -929,7 +929,9 @@ export async function fetchCalendar(
 
 // National annual trend = mean of the 18 stations' temperature_max rows for this
 // day: scatter averaged per year, line params averaged. (Interim client-side
-// pooling; the precompute will eventually bake an era5:national row.)
+// pooling: precompute now bakes the same row into `annual_trend_national`, and
+// `daily_window_national` for fetchEra5NationalWindowRow; switch to those once the
+// fixtures are re-recorded against a deployment that serves them.)
 async function fetchNationalAnnualTrendRow(month: number, day: number): Promise<AnnualTrendRow | undefined> {
   const rows = await dsGet<AnnualTrendRow[]>(
     `annual_trend.json?_shape=array&${atCol("variable")}__exact=temperature_max&${atCol("month")}__exact=${month}&${atCol("day")}__exact=${day}&_size=50`
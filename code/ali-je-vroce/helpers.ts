@@ -148,7 +148,7 @@ export async function requestData(
       );
 
       const resultPercentile = await fetch(
-        `${STAGE_DATA_BASE_URL}/temperature/temperature~2Eslovenia_historical~2Edaily~2Eaverage_percentiles.json?date__endswith=-${monthDay}&station_id__exact=${stationID}&_col=p05&_col=p20&_col=p40&_col=p60&_col=p80&_col=p95`,
+        `${STAGE_DATA_BASE_URL}/temperature/station_percentiles.json?station_id=${stationID}&month_day=${monthDay}`,
          options.signal ? { signal: options?.signal } : undefined
       );
         const dataPercentile = await resultPercentile.json();
@@ -157,10 +157,6 @@ export async function requestData(
         let values = dataPercentile["rows"][0];
         if (!values) throw new Error("Percentiles not found");
 
-        // first column is rowid
-        columns.shift();
-        values.shift();
-
         // find bucket of current average
         let resultValue: string = "-1";
         let resultTemperatureValue = -1;
@@ -261,41 +257,6 @@ function isValidRecord(
   return isFiniteNumber(record.year) && isFiniteNumber(record.tavg);
 }
 
-/**
- * Builds a window of dates centered around a given date, returning MM-DD formatted strings.
- * 
- * @param centerMMDD - The center date in "MM-DD" format (e.g., "03-15" for March 15th)
- * @param windowDays - The total number of days in the window (should be odd for symmetric results)
- * @returns An array of date strings in "MM-DD" format representing the date window
- * 
- * @throws {Error} When month or day are invalid or out of range
- * 
- * @example
- * ```typescript
- * buildWindow("03-15", 5); // Returns ["03-13", "03-14", "03-15", "03-16", "03-17"]
- * buildWindow("12-31", 3); // Returns ["12-30", "12-31", "01-01"] (crosses year boundary)
- * ```
- */
-function buildWindow(centerMMDD: string, windowDays: number): string[] {
-  const half = Math.floor(windowDays / 2);
-  const [mm, dd] = centerMMDD.split("-").map((s) => Number(s));
-  if (!mm) throw new Error("Invalid month");
-  if (!dd) throw new Error("Invalid day");
-  if (mm < 1 || mm > 12) throw new Error("Month out of range");
-  if (dd < 1 || dd > 31) throw new Error("Day out of range");
-
-  const base = new Date(Date.UTC(2001, mm - 1, dd)); // non-leap baseline
-  const out = [];
-  for (let k = -half; k <= half; k++) {
-    const d = new Date(base);
-    d.setUTCDate(base.getUTCDate() + k);
-    const m = String(d.getUTCMonth() + 1).padStart(2, "0");
-    const day = String(d.getUTCDate()).padStart(2, "0");
-    out.push(`${m}-${day}`);
-  }
-  return out;
-}
-
 /**
  * Converts a value to a number or returns null if the conversion is not possible.
  * 
@@ -318,44 +279,39 @@ function convertToNumberOrNull(x: string | number | null | undefined): number |
   return Number.isFinite(y) ? y : null;
 }
 
-const DATASETTE_TABLE_PATH =
-  "temperature/temperature~2Eslovenia_historical~2Edaily.json";
+// Canned query declared in data/temperature/queries.yaml; the temperature database
+// refuses arbitrary SQL (including `?_where=`), so the window is matched server-side.
+const DATASETTE_QUERY_PATH = "temperature/historical_window.json";
 
 /**
- * Builds a URL for querying the Datasette API to retrieve temperature data for a specific station.
+ * Builds a URL for the `historical_window` canned query, which returns a station's daily
+ * average temperatures within ±halfWindow days of a month-day in every year.
  * 
  * @param options - Configuration object for building the URL
  * @param options.sid - Station ID to filter results by
- * @param options.inList - Comma-separated list of date patterns (MM-DD format) to filter by
- * @param options.withCols - Whether to include specific column selection in the URL (defaults to true)
+ * @param options.centerMMDD - Center date in MM-DD format
+ * @param options.halfWindow - Days included on each side of the center date
  * 
- * @returns A formatted Datasette API URL with query parameters for retrieving station temperature data
+ * @returns A formatted Datasette API URL with the canned query parameters
  * 
  * @example
  * ```typescript
- * const url = buildDatasetteUrl({
- *   sid: 123,
- *   inList: "'07-15','08-20'",
- *   withCols: true
- * });
- * // Returns URL with station filter, date range, and specific columns
+ * const url = buildDatasetteUrl({ sid: 123, centerMMDD: "07-15", halfWindow: 7 });
+ * // Returns URL for the 15 days around July 15th of every year, ordered by date
  * ```
  */
-function buildDatasetteUrl({ sid, inList, withCols = true }: {
+function buildDatasetteUrl({ sid, centerMMDD, halfWindow }: {
   sid: number;
-  inList: string;
-  withCols?: boolean;
+  centerMMDD: string;
+  halfWindow: number;
 }): string {
-  const BASE_URL = STAGE_DATA_BASE_URL;
-  const baseUrl = `${BASE_URL}/${DATASETTE_TABLE_PATH}`;
-  const common =
-    `${baseUrl}` +
-    `?_shape=array&_size=max` +
-    `&station_id__exact=${encodeURIComponent(String(sid))}` +
-    `&_where=${encodeURIComponent(`substr(date,6,5) IN (${inList})`)}` +
-    `&_order_by=date`;
-
-  return withCols ? common + `&_col=station_id&_col=date&_col=temperature_average_2m` : common;
+  return (
+    `${STAGE_DATA_BASE_URL}/${DATASETTE_QUERY_PATH}` +
+    `?_shape=array` +
+    `&station_id=${encodeURIComponent(String(sid))}` +
+    `&center_mmdd=${encodeURIComponent(centerMMDD)}` +
+    `&half_window=${halfWindow}`
+  );
 }
 
 /**
@@ -363,7 +319,7 @@ function buildDatasetteUrl({ sid, inList, withCols = true }: {
  * Contains temperature measurements and metadata for a specific weather station on a given date.
  *
  * @interface HistoricalRowFromDatasette
- * @property {number} rowid - Unique identifier for the database row
+ * @property {number} [rowid] - Unique identifier for the database row (table views only)
  * @property {number} station_id - Identifier of the weather station that recorded the data
  * @property {string} date - Date when the temperature data was recorded (ISO date string format)
  * @property {number} [temperature_average_2m] - Optional average temperature at 2 meters height in Celsius
@@ -371,7 +327,7 @@ function buildDatasetteUrl({ sid, inList, withCols = true }: {
  * @property {number} [temperature_average] - Optional average temperature value in Celsius
  */
 type HistoricalRowFromDatasette = {
-  rowid: number;
+  rowid?: number;
   station_id: number;
   date: string;
   temperature_average_2m?: number;
@@ -473,27 +429,19 @@ function processDatasetteResponse(rows: HistoricalRowFromDatasette[], stationId:
 }
 
 /**
- * Fetches data from Datasette with fallback for invalid columns
+ * Fetches the historical window rows from Datasette
  */
 async function fetchFromDatasette(
   sid: number, 
-  inList: string, 
+  centerMMDD: string, 
+  halfWindow: number, 
   timeoutMs: number = 10000
 ): Promise<HistoricalRowFromDatasette[]> {
-  let url = buildDatasetteUrl({ sid, inList, withCols: true });
-  let response = await fetchWithTimeout(url, { timeoutMs });
+  const url = buildDatasetteUrl({ sid, centerMMDD, halfWindow });
+  const response = await fetchWithTimeout(url, { timeoutMs });
   
   if (!response.ok) {
-    const text = await response.text().catch(() => "");
-    if (response.status === 400 && /invalid columns/i.test(text)) {
-      // Retry without column specification
-      url = buildDatasetteUrl({ sid, inList, withCols: false });
-      response = await fetchWithTimeout(url, { timeoutMs });
-    }
-    
-    if (!response.ok) {
-      throw new Error(`Datasette request failed with status ${response.status}`);
-    }
+    throw new Error(`Datasette request failed with status ${response.status}`);
   }
 
   const responseData = await response.json() as HistoricalRowFromDatasette[];
@@ -545,11 +493,10 @@ export async function requestHistoricalWindow({
   window_days: number;
 }): Promise<NormalizedTemperatureRecord[]> {
   const sid = Number(station_id);
-  const mmddList = buildWindow(center_mmdd, window_days);
-  const inList = mmddList.map((d) => `'${d}'`).join(", ");
+  if (!/^\d{2}-\d{2}$/.test(center_mmdd)) throw new Error("Invalid center date");
 
   try {
-    const rows = await fetchFromDatasette(sid, inList);
+    const rows = await fetchFromDatasette(sid, center_mmdd, Math.floor(window_days / 2));
     const processedData = processDatasetteResponse(rows, sid);
     return normalizeTemperatureRecords(processedData);
   } catch (error) {
@@ -7,23 +7,43 @@ Supports differential updates: automatically detects the latest date in existing
 files and fetches only new data from that point forward. Use --force-refresh to
 rebuild all files from START_DATE.
 
+Stations that share a date range are fetched together, up to --batch-size per
+multi-location request; requests run concurrently (--concurrency workers) and every
+request draws from one shared token bucket (--rate), which pauses all workers when
+Open-Meteo answers with a minutely/hourly/daily limit. OPEN_METEO_ARCHIVE_URL points the
+collector at another archive endpoint, e.g. a local stub server in tests.
+
+Long date ranges are fetched in year-range chunks. Chunks that end before the refresh
+window hold final ERA5 data and are kept in a size-capped LRU cache under --cache-dir,
+so a re-run (or a rerun --force-refresh) asks the API only for what can still change.
+A full-history fetch writes each chunk as it arrives and journals its progress, so an
+interrupted run resumes where it stopped instead of starting over from START_DATE.
+
 Install dependencies:
     pip install openmeteo-requests requests-cache retry-requests pandas pyyaml
 """
 
 import openmeteo_requests
+import requests
 import requests_cache
 import pandas as pd
 from retry_requests import retry
+import csv
+import io
+import json
 import os
+import shutil
 import sys
 import time
+import threading
 import urllib3
 import argparse
+from urllib.parse import parse_qs, urlparse
 import glob
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from local_day import local_daily_dates
 
@@ -56,7 +76,37 @@ parser.add_argument(
     action="store_true",
     help="Enable verbose output for debugging",
 )
-args = parser.parse_args()
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    default=4,
+    help="Number of requests in flight at the same time (default: 4)",
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=10,
+    help="Most stations sharing a date range that go into one request (default: 10)",
+)
+parser.add_argument(
+    "--rate",
+    type=float,
+    default=500,
+    help="Open-Meteo API calls per minute the shared token bucket allows (default: 500)",
+)
+parser.add_argument(
+    "--cache-dir",
+    help="Directory of the response cache (default: $OPEN_METEO_CACHE_DIR or .openmeteo_cache next to this script)",
+)
+parser.add_argument(
+    "--cache-max-mb",
+    type=float,
+    default=256,
+    help="Size cap of the response cache; least recently used responses are pruned first (default: 256)",
+)
+# Parsed for real in main(); the defaults let the helpers run when this module is
+# imported (tests).
+args = parser.parse_args([])
 
 START_DATE = str(CONFIG["data_start_date"])
 # ERA5-Land reanalysis from Open-Meteo has a ~5-day lag; for the most recent days
@@ -68,6 +118,7 @@ ERA5_PRELIM_DAYS = 7   # rows within this window are tagged source="era5t"
 REFRESH_WINDOW   = 15  # always re-fetch last N days to pick up ERA5T→ERA5 upgrades
 END_DATE = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
 OUTPUT_DIR = os.environ.get("DATA_DIR", "/app/data/si")
+ARCHIVE_URL = os.environ.get("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
 
 # ── Derive required variables from enabled features ───────────────────────────
 # Temperature: needed by regression_chart, trend_calendar, station_map,
@@ -91,23 +142,22 @@ if not DAILY_VARIABLES:
 LOCATIONS = CONFIG["stations"]
 
 # T-5.70: names of stations that reached a SUCCESS path this run (a written CSV,
-# or an "already up-to-date" early return). fetch_location adds to this set only
-# on success; its broad `except` never does. The post-loop assert compares this
+# or an "already up-to-date" early return). plan_fetch / write_location add to this
+# set only on success; the broad `except`s in fetch_batch never do. The post-run
+# assert compares this
 # against the intended station list and fails the run if any station is absent,
 # turning a silent skip (429/timeout/malformed response) into a loud failure.
 UPDATED_STATIONS = set()
 
-# ── Setup Open-Meteo client with cache + retry ────────────────────────────────
-
-cache_session = requests_cache.CachedSession(".openmeteo_cache", expire_after=-1)
-retry_session = retry(cache_session, retries=3, backoff_factor=2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)  # creates data/<COUNTRY>/ if needed
+# Serialises the per-station output blocks of the concurrent fetch workers.
+OUTPUT_LOCK = threading.Lock()
 
 # Precompute strict date bounds as date objects
 start_date = pd.to_datetime(START_DATE).date()
 end_date   = pd.to_datetime(END_DATE).date()
+# Rows dated before this are outside every refresh window: final ERA5 that no later
+# run rewrites, so responses ending before it may be cached.
+final_before = (datetime.now() - timedelta(days=REFRESH_WINDOW)).date()
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
@@ -126,13 +176,62 @@ def get_legacy_filenames(location_name):
     return glob.glob(pattern)
 
 
+# Station CSVs are sorted by date with one row per date (validate_raw checks it), so
+# everything a differential run needs is at the end of the file: the last date, and
+# the rows the refresh window rewrites. These helpers read that tail in blocks from
+# the end instead of parsing ~27k rows of history.
+TAIL_BLOCK = 64 * 1024
+# Unchanged rows read in front of the rewritten ones, only so the appended rows get the
+# dtypes a whole-file read would give them (float32 responses widen to float64).
+TAIL_CONTEXT_ROWS = 32
+
+
+def _date_column(header):
+    return next(csv.reader([header.decode()])).index("date")
+
+
+def read_csv_tail(filepath, cut_date, context_rows=TAIL_CONTEXT_ROWS):
+    """Locate the rows of a sorted station CSV dated on or after `cut_date`.
+
+    Returns (header, offset, text): the header line, the byte offset of the first row
+    dated >= cut_date (the end of the file if there is none), and the header plus up
+    to `context_rows` rows before that offset plus every row after it, as bytes.
+    """
+    with open(filepath, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        date_idx = _date_column(header)
+        pos = f.seek(0, os.SEEK_END)
+        buf = b""
+        while True:
+            read_from = max(data_start, pos - TAIL_BLOCK)
+            f.seek(read_from)
+            buf = f.read(pos - read_from) + buf
+            pos = read_from
+            # Unless the block reaches the header, its first line may be cut short.
+            if pos == data_start:
+                head, rows = b"", buf.splitlines(keepends=True)
+            else:
+                head, _, body = buf.partition(b"\n")
+                head += _
+                rows = body.splitlines(keepends=True)
+            dates = [next(csv.reader([r.decode()]))[date_idx] for r in rows]
+            keep = sum(1 for d in dates if d < str(cut_date))
+            if keep >= context_rows or pos == data_start:
+                break
+    offset = pos + len(head) + sum(len(r) for r in rows[:keep])
+    context = rows[max(0, keep - context_rows):keep]
+    return header, offset, header + b"".join(context) + b"".join(rows[keep:])
+
+
 def read_last_date_from_csv(filepath):
-    """Extract the latest date from an existing CSV file.
-    
+    """Extract the latest date from an existing CSV file, reading only its tail.
+
     Returns a date object or None if file is empty/invalid.
     """
     try:
-        df = pd.read_csv(filepath, usecols=["date"])
+        _, _, text = read_csv_tail(filepath, "9999-12-31", context_rows=1)
+        df = pd.read_csv(io.BytesIO(text), usecols=["date"])
         if df.empty:
             return None
         last_date_str = df["date"].iloc[-1]
@@ -143,6 +242,39 @@ def read_last_date_from_csv(filepath):
         return None
 
 
+def append_to_csv(filepath, df_new, cut_date):
+    """Merge df_new into the station CSV by rewriting only its rows dated >= cut_date.
+
+    Leaves the same bytes as load_existing_data + concat + drop_duplicates + sort +
+    to_csv over the whole file: both read floats with round-trip precision, so the
+    rows before cut_date, left as they are on disk, are also what the whole-file
+    rewrite writes back. Only for a sorted, duplicate-free CSV already in the current
+    column layout; returns None without touching the file otherwise (the caller then
+    rewrites it whole). Returns (rows written, rows added).
+    """
+    try:
+        header, offset, text = read_csv_tail(filepath, cut_date)
+    except ValueError:   # empty file, or no date column
+        return None
+    if next(csv.reader([header.decode()])) != list(df_new.columns):
+        return None
+    df_tail = pd.read_csv(io.BytesIO(text), float_precision="round_trip")
+    df_tail["date"] = pd.to_datetime(df_tail["date"]).dt.date
+    if not df_tail["date"].is_monotonic_increasing or not df_tail["date"].is_unique:
+        return None
+    n_context = int((df_tail["date"] < cut_date).sum())
+    n_replaced = len(df_tail) - n_context
+    df_combined = pd.concat([df_tail, df_new], ignore_index=True)
+    df_combined = df_combined.drop_duplicates(subset=["date"], keep="last")
+    df_combined = df_combined.sort_values("date").reset_index(drop=True)
+    df_out = df_combined.iloc[n_context:]
+    with open(filepath, "r+b") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(df_out.to_csv(index=False, header=False).encode())
+    return len(df_out), len(df_out) - n_replaced
+
+
 def load_existing_data(filepath):
     """Load existing CSV data into a DataFrame.
 
@@ -152,7 +284,7 @@ def load_existing_data(filepath):
     try:
         if not os.path.exists(filepath):
             return None
-        df = pd.read_csv(filepath)
+        df = pd.read_csv(filepath, float_precision="round_trip")
         if not df.empty:
             df["date"] = pd.to_datetime(df["date"]).dt.date
             if "source" not in df.columns:
@@ -200,43 +332,239 @@ def seconds_until_utc_midnight():
     return int((midnight - now).total_seconds()) + 60  # +60s buffer
 
 
-def wait_if_rate_limited():
-    """Check API status and sleep until the appropriate limit resets."""
-    try:
-        _probe_station = CONFIG["stations"][0]
-        probe = cache_session.get(
-            "https://archive-api.open-meteo.com/v1/archive",
-            params={"latitude": round(_probe_station["lat"], 1),
-                    "longitude": round(_probe_station["lon"], 1),
-                    "start_date": "2024-01-01", "end_date": "2024-01-02",
-                    "daily": "temperature_2m_max", "timezone": "UTC"},
-            timeout=10,
-        )
-    except Exception as e:
-        print(f"  API probe failed ({e.__class__.__name__}): {e}", flush=True)
-        return
-    if probe.from_cache:
-        return  # cached response, no actual API call was made
+# ── Rate limiting ─────────────────────────────────────────────────────────────
+# Open-Meteo's free tier allows 600 calls/minute, 5,000/hour and 10,000/day
+# (https://open-meteo.com/en/pricing), where a request for more than 14 days or more
+# than 10 variables counts as several calls. The bucket below meters requests by that
+# weight; the hourly and daily limits are not modelled — the API's own "limit
+# exceeded" answer pauses the bucket instead (T-5.45 kept a fixed 10 s gap between
+# stations only because a 429 used to skip the station rather than retry it).
+
+MINUTELY_LIMIT_WAIT = 60
+HOURLY_LIMIT_WAIT   = 3600
+LIMIT_RETRIES       = 3    # limit answers tolerated per station before it is skipped
+
+
+def request_weight(start, end, n_variables):
+    """Open-Meteo's call count for one location over [start, end] (dates, inclusive)."""
+    days = (end - start).days + 1
+    return max(days / 14, 1.0) * max(n_variables / 10, 1.0)
+
+
+def limit_wait(error):
+    """Seconds to pause for a rate-limit error, or None if it is not one."""
+    reason = str(error).lower()
+    if "limit exceeded" not in reason and "429" not in reason:
+        return None
+    if "daily" in reason:
+        return seconds_until_utc_midnight()
+    if "hourly" in reason:
+        return HOURLY_LIMIT_WAIT
+    return MINUTELY_LIMIT_WAIT
+
+
+class RateLimiter:
+    """Token bucket shared by the fetch workers.
+
+    Refills at `per_minute` API calls per minute up to one minute's worth. A request
+    heavier than the bucket could never be metered; split_request keeps every request
+    within it. `pause` empties the bucket and holds every worker until the limit the
+    API reported has reset.
+    """
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, weight=1.0):
+        if weight > self.capacity:
+            raise ValueError(f"a request of {weight:.0f} calls does not fit a bucket of {self.capacity}")
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.resume_at and self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                wait = max(self.resume_at - now, (weight - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            now = time.monotonic()
+            if now + seconds > self.resume_at:
+                self.resume_at = now + seconds
+                with OUTPUT_LOCK:
+                    print(f"  API limit hit — pausing all requests for {seconds / 60:.1f} minutes", flush=True)
+            self.tokens = 0.0
+            self.updated = now
+
+
+# ── Response cache ────────────────────────────────────────────────────────────
+# The cache used to be a never-expiring SQLite file keyed on the full request. Every
+# differential request has a new end date, so it only ever grew and no entry was read
+# twice. Now only requests that end before the refresh window are stored: those are
+# the year-range chunks of a long fetch (fetch_chunks), keyed by their coordinates and
+# years, and their data cannot change. Requests that reach into the refresh window are
+# never stored. The store is requests-cache's LRU file cache, pruned to --cache-max-mb.
+
+CHUNK_YEARS = 10   # a chunk never spans two decades (1950–1959, 1960–1969, …)
+
+
+def fetch_chunks(start, end, cacheable_before):
+    """Split the fetch window [start, end] (dates, inclusive) into the requests to make.
+
+    Whole years that end before `cacheable_before` go into decade-aligned chunks;
+    whatever is left (the current year, or the refresh window) is the final chunk. A
+    window shorter than a year is one chunk. Returns [(start, end), …] as date
+    strings, in order.
+    """
+    chunks = []
+    last_year = min(cacheable_before.year, end.year) - 1
+    if (end - start).days < 365:
+        last_year = start.year - 1
+    year = start.year
+    while year <= last_year:
+        chunk_end = min(year - year % CHUNK_YEARS + CHUNK_YEARS - 1, last_year)
+        chunks.append((max(start, date(year, 1, 1)), date(chunk_end, 12, 31)))
+        year = chunk_end + 1
+    rest = max(start, date(year, 1, 1))
+    if rest <= end:
+        chunks.append((rest, end))
+    return [(a.strftime("%Y-%m-%d"), b.strftime("%Y-%m-%d")) for a, b in chunks]
+
+
+def split_request(locs, chunk, capacity):
+    """Split one chunk's request for `locs` into requests of at most `capacity` calls.
+
+    The chunk is cut into spans that one station can fetch within `capacity`, and each
+    span's stations into groups that fit it together. Returns [(span, locs), …], span
+    by span, with the spans as date strings.
+    """
+    start = date.fromisoformat(chunk[0])
+    end = date.fromisoformat(chunk[1])
+    shortest = request_weight(start, start, len(DAILY_VARIABLES))   # up to 14 days
+    if shortest > capacity:
+        raise ValueError(f"--rate {capacity} is below the weight of a single request")
+    span_days = int(14 * capacity / shortest)
+
+    requests = []
+    while start <= end:
+        span_end = min(start + timedelta(days=span_days - 1), end)
+        weight = request_weight(start, span_end, len(DAILY_VARIABLES))
+        size = max(1, int(capacity // weight))
+        span = (start.strftime("%Y-%m-%d"), span_end.strftime("%Y-%m-%d"))
+        requests.extend((span, locs[i:i + size]) for i in range(0, len(locs), size))
+        start = span_end + timedelta(days=1)
+    return requests
+
+
+def is_cacheable(response):
+    """requests-cache filter: store only responses that end before the refresh window."""
+    query = parse_qs(urlparse(response.request.url).query)
+    return date.fromisoformat(query["end_date"][0]) < final_before
+
+
+def make_session(cache_dir, max_mb):
+    """HTTP session for the Open-Meteo client, with cache + retry."""
+    cache_session = requests_cache.CachedSession(
+        backend=requests_cache.FileCache(cache_dir, max_cache_bytes=int(max_mb * 1024 * 1024)),
+        expire_after=requests_cache.NEVER_EXPIRE,
+        filter_fn=is_cacheable,
+    )
+    return retry(cache_session, retries=3, backoff_factor=2)
+
+
+def is_cached(session, params):
+    """Whether the archive request with these params would be answered from the cache."""
+    # openmeteo_requests adds format=flatbuffers to every request it sends.
+    request = requests.Request("GET", ARCHIVE_URL, params={**params, "format": "flatbuffers"})
+    return session.cache.contains(request=session.prepare_request(request))
+
+
+# ── Full-history rebuild journal ─────────────────────────────────────────────
+# A full fetch (--force-refresh, or a station without data) used to hold all ~76 years
+# in memory and write the CSV at the very end, so an hourly limit or a timeout near the
+# end lost every chunk already paid for. Now each chunk is appended to a partial CSV as
+# soon as it arrives and recorded in a journal next to it, under --cache-dir/rebuild/.
+# The journal lists the chunks written and the partial file's size after the last one
+# (bytes past it are a chunk that was cut off mid-write). The next run resumes after
+# the last journalled chunk; once the last chunk is in, the partial CSV replaces the
+# station CSV and the journal is removed.
+
+def rebuild_paths(name):
+    """(partial CSV, journal) paths of a station's full-history rebuild."""
+    directory = Path(args.cache_dir) / "rebuild"
+    return directory / get_filename_for_location(name), directory / f"{name}.json"
+
+
+def read_journal(name):
+    """The journal of a station's interrupted rebuild, or None if there is nothing to
+    resume (no journal, no partial CSV, or a journal from another START_DATE)."""
+    part, journal = rebuild_paths(name)
     try:
-        body = probe.json()
-    except Exception:
-        return
-    reason = body.get("reason", "").lower() if isinstance(body, dict) else ""
-    if "daily" in reason and "limit exceeded" in reason:
-        secs = seconds_until_utc_midnight()
-        hrs = secs / 3600
-        print(f"  Daily API limit hit — waiting {hrs:.1f} hours until UTC midnight...", flush=True)
-        time.sleep(secs)
-    elif probe.status_code == 429 or ("hourly" in reason and "limit exceeded" in reason):
-        print("  Hourly API limit hit — waiting 60 minutes...", flush=True)
-        time.sleep(3600)
-
-
-def fetch_location(loc):
+        with open(journal) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("start_date") != START_DATE or not state.get("chunks") or not part.exists():
+        return None
+    return state
+
+
+def write_chunk(loc, chunk, response, say):
+    """Append one chunk of a station's full history to its partial CSV and journal it."""
+    name = loc["name"]
+    part, journal = rebuild_paths(name)
+    state = read_journal(name) or {"start_date": START_DATE, "chunks": [], "rows": 0, "size": 0}
+    if not state["chunks"]:
+        say(f"{name}:")
+        say_elevation(loc, response, say)
+    df = location_rows(loc, [(chunk, response)], say)
+
+    part.parent.mkdir(parents=True, exist_ok=True)
+    with open(part, "r+b" if state["chunks"] else "wb") as f:
+        f.truncate(state["size"])
+        f.seek(state["size"])
+        f.write(df.to_csv(index=False, header=not state["chunks"]).encode())
+        f.flush()
+        os.fsync(f.fileno())
+        state["size"] = f.tell()
+    state["chunks"].append(list(chunk))
+    state["rows"] += len(df)
+    tmp = journal.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, journal)
+    say(f"  {name}: wrote {chunk[0]} -> {chunk[1]} ({len(df)} rows)")
+
+
+def finish_rebuild(loc, say):
+    """Move a station's completed partial CSV into place and drop its journal."""
+    name = loc["name"]
+    part, journal = rebuild_paths(name)
+    state = read_journal(name)
+    filepath = os.path.join(OUTPUT_DIR, get_filename_for_location(name))
+    with open(part, "r+b") as f:
+        f.truncate(state["size"])
+    shutil.move(part, filepath)
+    journal.unlink()
+    say(f"  {name}: date range in CSV: {state['chunks'][0][0]} -> {state['chunks'][-1][1]}")
+    say(f"  {name}: saved {state['rows']} total rows -> {filepath}")
+    UPDATED_STATIONS.add(name)  # T-5.70: fetched & written
+
+
+def plan_fetch(loc, say=print):
+    """Return the (start, end, full) window to fetch for one station, or None if its
+    CSV is already up to date (which counts as updated, T-5.70). `full` marks a
+    full-history fetch, written chunk by chunk through the rebuild journal."""
     name      = loc["name"]
     lat       = loc["lat"]
     lon       = loc["lon"]
-    elevation = loc["elevation"]
 
     # Use simplified filename format
     filename = get_filename_for_location(name)
@@ -245,11 +573,23 @@ def fetch_location(loc):
     # Attempt to migrate legacy date-embedded files to new format
     consolidate_legacy_files(name, filepath)
 
+    # An interrupted full-history fetch resumes after its last journalled chunk, even
+    # without --force-refresh: the old CSV (if any) is still the one in place.
+    journalled = read_journal(name)
+    if journalled is not None:
+        resume_from = date.fromisoformat(journalled["chunks"][-1][1]) + timedelta(days=1)
+        if resume_from > end_date:
+            say(f"Finishing {name} — every chunk was already written")
+            finish_rebuild(loc, say)
+            return None
+        say(f"Resuming {name} ({lat}, {lon})... full, from {resume_from} "
+            f"({len(journalled['chunks'])} chunk(s) already written)")
+        return resume_from.strftime("%Y-%m-%d"), END_DATE, True
+
     # Determine fetch date range (differential or full)
     fetch_start_date = START_DATE
     fetch_end_date = END_DATE
-    fetch_mode = "full (--force-refresh)"
-    
+
     if os.path.exists(filepath) and not args.force_refresh:
         # Differential update: fetch from day after last date, but always reach
         # back REFRESH_WINDOW days so ERA5T rows get upgraded to final ERA5.
@@ -265,198 +605,317 @@ def fetch_location(loc):
                 fetch_start_date = effective_start.strftime("%Y-%m-%d")
                 fetch_end_date   = END_DATE
                 fetch_mode = f"differential+refresh (from {fetch_start_date} to {fetch_end_date})"
-                print(f"Updating {name} ({lat}, {lon})... {fetch_mode}", flush=True)
+                say(f"Updating {name} ({lat}, {lon})... {fetch_mode}")
             else:
-                print(f"Skipping {name} — already up-to-date (last: {last_date})", flush=True)
+                say(f"Skipping {name} — already up-to-date (last: {last_date})")
                 UPDATED_STATIONS.add(name)  # T-5.70: up-to-date is a success, not a skip
-                return
+                return None
         else:
-            print(f"Fetching {name} ({lat}, {lon})... full (existing file is empty)", flush=True)
+            say(f"Fetching {name} ({lat}, {lon})... full (existing file is empty)")
     else:
         if args.force_refresh and os.path.exists(filepath):
-            print(f"Fetching {name} ({lat}, {lon})... full (--force-refresh)", flush=True)
+            say(f"Fetching {name} ({lat}, {lon})... full (--force-refresh)")
         else:
-            print(f"Fetching {name} ({lat}, {lon})... full", flush=True)
+            say(f"Fetching {name} ({lat}, {lon})... full")
+
+    return fetch_start_date, fetch_end_date, fetch_start_date == START_DATE
+
+
+def make_batches(plans, batch_size):
+    """Group [(loc, (start, end, full)), …] into lists of at most batch_size stations that
+    share one fetch window, so each list is one multi-location request."""
+    by_window = {}
+    for loc, window in plans:
+        by_window.setdefault(window, []).append(loc)
+    return [
+        (locs[i:i + batch_size], window)
+        for window, locs in by_window.items()
+        for i in range(0, len(locs), max(1, batch_size))
+    ]
+
+
+def fetch_batch(locs, window, session, limiter):
+    """Fetch and write the stations of one batch. Runs on a worker thread: its output
+    is collected and printed in one block at the end, so concurrent batches do not
+    interleave."""
+    lines = []
+    try:
+        _fetch_batch(locs, window, session, limiter, lines.append)
+    finally:
+        with OUTPUT_LOCK:
+            print("\n".join(lines), flush=True)
+
+
+def _fetch_batch(locs, window, session, limiter, say):
+    fetch_start_obj = pd.to_datetime(window[0]).date()
+    fetch_end_obj = pd.to_datetime(window[1]).date()
+    names = ", ".join(loc["name"] for loc in locs)
+    chunks = fetch_chunks(fetch_start_obj, fetch_end_obj, final_before)
+    say(f"Requesting {window[0]} -> {window[1]} in {len(chunks)} chunk(s) "
+        f"for {len(locs)} station(s): {names}")
+
+    # A full-history fetch writes every chunk as it arrives (write_chunk); a
+    # differential one merges the whole window into the CSV at the end.
+    full = window[2]
+    parts = {loc["name"]: [] for loc in locs}
+    try:
+        for chunk in chunks:
+            for span, group in split_request(locs, chunk, limiter.capacity):
+                responses = request_chunk(group, span, session, limiter, say)
+                for loc, response in zip(group, responses):
+                    if full:
+                        write_chunk(loc, span, response, say)
+                    else:
+                        parts[loc["name"]].append((span, response))
+    except Exception as e:
+        # T-5.70: no station of the batch is added to UPDATED_STATIONS, so the
+        # post-run assert reports THAT they were skipped; these lines record WHY (a
+        # limit that outlasted LIMIT_RETRIES pauses, a timeout, a malformed/empty
+        # response). A full fetch keeps its written chunks for the next run.
+        for loc in locs:
+            say(f"  Failed for {loc['name']} ({e.__class__.__name__}): {e} — SKIPPED this run")
+        return
+
+    for loc in locs:
+        try:
+            if full:
+                finish_rebuild(loc, say)
+            else:
+                write_location(loc, parts[loc["name"]], fetch_start_obj, say)
+        except Exception as e:
+            say(f"  Failed for {loc['name']} ({e.__class__.__name__}): {e} — SKIPPED this run")
 
-    wait_if_rate_limited()
 
+def request_chunk(locs, chunk, session, limiter, say):
+    """Request one chunk of the batch's window; returns one response per location."""
+    # Open-Meteo takes comma-separated coordinate lists and answers with one
+    # response per location, in request order (api.ts does the same for live values).
     params = {
-        "latitude":   lat,
-        "longitude":  lon,
-        "start_date": fetch_start_date,
-        "end_date":   fetch_end_date,
+        "latitude":   ",".join(str(loc["lat"]) for loc in locs),
+        "longitude":  ",".join(str(loc["lon"]) for loc in locs),
+        "start_date": chunk[0],
+        "end_date":   chunk[1],
         "daily":      DAILY_VARIABLES,
         "timezone":   "Europe/Ljubljana",  # D-4 (T-4.3b): local-day aggregation, not UTC
     }
-
-    try:
-        responses = openmeteo.weather_api(
-            "https://archive-api.open-meteo.com/v1/archive", params=params
-        )
-        response = responses[0]
-
-        era5_elevation = response.Elevation()
-        elev_diff = era5_elevation - elevation
-        print(f"  ERA5-Land model elevation : {era5_elevation:.1f} m", flush=True)
-        print(f"  Station elevation         : {elevation} m", flush=True)
-        print(f"  Difference (ERA5-station) : {elev_diff:.1f} m", flush=True)
-
-        daily = response.Daily()
-
-        _has_precip = "precipitation_sum" in DAILY_VARIABLES
-        _idx_precip = 3 if _has_precip else None
-        _idx_et0    = 4 if _has_precip else None
-
-        # D-4 (T-4.3b): daily.Time()/TimeEnd() are the Unix epochs of each LOCAL
-        # midnight (timezone=Europe/Ljubljana). local_daily_dates shifts by the
-        # response's UTC offset so .date reads the correct local calendar day
-        # instead of labelling every row one day early. See local_day.py.
-        df_new = pd.DataFrame({
-            "date": local_daily_dates(
-                daily.Time(),
-                daily.TimeEnd(),
-                daily.Interval(),
-                response.UtcOffsetSeconds(),
-            ),
-            "temperature_max":  daily.Variables(0).ValuesAsNumpy(),
-            "temperature_min":  daily.Variables(1).ValuesAsNumpy(),
-            "temperature_mean": daily.Variables(2).ValuesAsNumpy(),
-            **({
-                "precipitation_sum":      daily.Variables(_idx_precip).ValuesAsNumpy(),
-                "et0_evapotranspiration": daily.Variables(_idx_et0).ValuesAsNumpy(),
-            } if _has_precip else {}),
-        })
-
-        before = len(df_new)
-        fetch_start_obj = pd.to_datetime(fetch_start_date).date()
-        fetch_end_obj = pd.to_datetime(fetch_end_date).date()
-        df_new = df_new[(df_new["date"] >= fetch_start_obj) & (df_new["date"] <= fetch_end_obj)]
-        dropped = before - len(df_new)
-        if dropped:
-            print(f"  Dropped {dropped} out-of-range row(s) (timezone artifact)", flush=True)
-
-        # Add metadata columns
-        df_new.insert(0, "location",            name)
-        df_new.insert(1, "latitude",            lat)
-        df_new.insert(2, "longitude",           lon)
-        df_new.insert(3, "elevation_station_m", elevation)
-        df_new.insert(4, "elevation_era5_m",    round(era5_elevation, 1))
-        df_new.insert(5, "elevation_diff_m",    round(elev_diff, 1))
-
-        # Tag data source: era5t for recent days (within ERA5 reanalysis lag),
-        # era5 for everything older (final reanalysis confirmed available).
-        prelim_cutoff = (datetime.now() - timedelta(days=ERA5_PRELIM_DAYS)).date()
-        df_new["source"] = ["era5t" if d >= prelim_cutoff else "era5" for d in df_new["date"]]
-
-        # Merge with existing data if differential update
-        if not args.force_refresh and os.path.exists(filepath):
-            df_existing = load_existing_data(filepath)
-            if df_existing is not None and not df_existing.empty:
-                # Combine existing and new data
-                df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-                # Remove duplicates (keep last/newest)
-                df_combined = df_combined.drop_duplicates(subset=["date"], keep="last")
-                # Sort by date
-                df_combined = df_combined.sort_values("date").reset_index(drop=True)
-                df_final = df_combined
-                total_rows = len(df_final)
-                new_rows = len(df_new)
-                print(f"  Merged {new_rows} new rows with existing data", flush=True)
-            else:
-                df_final = df_new
-                total_rows = len(df_final)
-                new_rows = total_rows
+    weight = request_weight(pd.to_datetime(chunk[0]).date(), pd.to_datetime(chunk[1]).date(),
+                            len(DAILY_VARIABLES)) * len(locs)
+
+    # A cached chunk costs no API calls, so it does not draw from the bucket. A
+    # limit answer pauses every worker (RateLimiter.pause) and the chunk is retried
+    # once the limit resets; any other error propagates to _fetch_batch.
+    client = openmeteo_requests.Client(session=session)
+    cached = is_cached(session, params)
+    for attempt in range(LIMIT_RETRIES + 1):
+        if not cached:
+            limiter.acquire(weight)
+        try:
+            responses = client.weather_api(ARCHIVE_URL, params=params)
+            break
+        except Exception as e:
+            wait = limit_wait(e)
+            if wait is None or attempt == LIMIT_RETRIES:
+                raise
+            say(f"  API limit hit ({e}) — retrying after the pause")
+            limiter.pause(wait)
+    if len(responses) != len(locs):
+        raise ValueError(f"expected {len(locs)} location responses, got {len(responses)}")
+    say(f"  {chunk[0]} -> {chunk[1]}{' (cached)' if cached else ''}")
+    return responses
+
+
+def response_frame(response, start_obj, end_obj, say):
+    """The daily rows of one location's response that fall within [start_obj, end_obj]."""
+    daily = response.Daily()
+
+    _has_precip = "precipitation_sum" in DAILY_VARIABLES
+    _idx_precip = 3 if _has_precip else None
+    _idx_et0    = 4 if _has_precip else None
+
+    # D-4 (T-4.3b): daily.Time()/TimeEnd() are the Unix epochs of each LOCAL
+    # midnight (timezone=Europe/Ljubljana). local_daily_dates shifts by the
+    # response's UTC offset so .date reads the correct local calendar day
+    # instead of labelling every row one day early. See local_day.py.
+    df = pd.DataFrame({
+        "date": local_daily_dates(
+            daily.Time(),
+            daily.TimeEnd(),
+            daily.Interval(),
+            response.UtcOffsetSeconds(),
+        ),
+        "temperature_max":  daily.Variables(0).ValuesAsNumpy(),
+        "temperature_min":  daily.Variables(1).ValuesAsNumpy(),
+        "temperature_mean": daily.Variables(2).ValuesAsNumpy(),
+        **({
+            "precipitation_sum":      daily.Variables(_idx_precip).ValuesAsNumpy(),
+            "et0_evapotranspiration": daily.Variables(_idx_et0).ValuesAsNumpy(),
+        } if _has_precip else {}),
+    })
+
+    before = len(df)
+    df = df[(df["date"] >= start_obj) & (df["date"] <= end_obj)]
+    dropped = before - len(df)
+    if dropped:
+        say(f"  Dropped {dropped} out-of-range row(s) (timezone artifact)")
+    return df
+
+
+def say_elevation(loc, response, say):
+    # Per location: every response of a batch carries its own ERA5-Land cell.
+    era5_elevation = response.Elevation()
+    say(f"  ERA5-Land model elevation : {era5_elevation:.1f} m")
+    say(f"  Station elevation         : {loc['elevation']} m")
+    say(f"  Difference (ERA5-station) : {era5_elevation - loc['elevation']:.1f} m")
+
+
+def location_rows(loc, parts, say):
+    """Turn one location's chunk responses, [((start, end), response), …] in date
+    order, into its CSV rows."""
+    name      = loc["name"]
+    lat       = loc["lat"]
+    lon       = loc["lon"]
+    elevation = loc["elevation"]
+    era5_elevation = parts[0][1].Elevation()
+    elev_diff = era5_elevation - elevation
+
+    # Each chunk is cut to its own bounds, so a timezone-artifact row cannot reach
+    # into the neighbouring chunk and duplicate a date.
+    df_new = pd.concat([
+        response_frame(response, pd.to_datetime(a).date(), pd.to_datetime(b).date(), say)
+        for (a, b), response in parts
+    ], ignore_index=True)
+
+    # Add metadata columns
+    df_new.insert(0, "location",            name)
+    df_new.insert(1, "latitude",            lat)
+    df_new.insert(2, "longitude",           lon)
+    df_new.insert(3, "elevation_station_m", elevation)
+    df_new.insert(4, "elevation_era5_m",    round(era5_elevation, 1))
+    df_new.insert(5, "elevation_diff_m",    round(elev_diff, 1))
+
+    # Tag data source: era5t for recent days (within ERA5 reanalysis lag),
+    # era5 for everything older (final reanalysis confirmed available).
+    prelim_cutoff = (datetime.now() - timedelta(days=ERA5_PRELIM_DAYS)).date()
+    df_new["source"] = ["era5t" if d >= prelim_cutoff else "era5" for d in df_new["date"]]
+    return df_new
+
+
+def write_location(loc, parts, fetch_start_obj, say):
+    """Merge one location's chunk responses into its CSV (see location_rows)."""
+    name = loc["name"]
+    filepath = os.path.join(OUTPUT_DIR, get_filename_for_location(name))
+    say(f"{name}:")
+    say_elevation(loc, parts[0][1], say)
+    df_new = location_rows(loc, parts, say)
+
+    # Merge with existing data if differential update: rewrite only the tail of the
+    # file from the first fetched date on, unless it is not in the current layout.
+    if not args.force_refresh and os.path.exists(filepath):
+        appended = append_to_csv(filepath, df_new, fetch_start_obj)
+        if appended is not None:
+            written, added = appended
+            say(f"  Rewrote {written} row(s) from {fetch_start_obj} on ({added} new) -> {filepath}")
+            UPDATED_STATIONS.add(name)  # T-5.70: fetched & written — counts even if added == 0
+            return
+        df_existing = load_existing_data(filepath)
+        if df_existing is not None and not df_existing.empty:
+            # Combine existing and new data
+            df_combined = pd.concat([df_existing, df_new], ignore_index=True)
+            # Remove duplicates (keep last/newest)
+            df_combined = df_combined.drop_duplicates(subset=["date"], keep="last")
+            # Sort by date
+            df_combined = df_combined.sort_values("date").reset_index(drop=True)
+            df_final = df_combined
+            total_rows = len(df_final)
+            new_rows = len(df_new)
+            say(f"  Merged {new_rows} new rows with existing data")
         else:
             df_final = df_new
             total_rows = len(df_final)
             new_rows = total_rows
+    else:
+        df_final = df_new
+        total_rows = len(df_final)
+        new_rows = total_rows
+
+    say(f"  Date range in CSV: {df_final['date'].iloc[0]} -> {df_final['date'].iloc[-1]}")
+
+    df_final.to_csv(filepath, index=False)
+    say(f"  Saved {total_rows} total rows ({new_rows} new) -> {filepath}")
+    UPDATED_STATIONS.add(name)  # T-5.70: fetched & written — counts even if new_rows == 0
+
+
+def collect(locations, session, limiter, concurrency, batch_size):
+    """Plan every location, then fetch the batches on `concurrency` worker threads."""
+    plans = []
+    for loc in locations:
+        window = plan_fetch(loc)
+        if window is not None:
+            plans.append((loc, window))
+    batches = make_batches(plans, batch_size)
+    print(f"\n{len(plans)} station(s) to fetch in {len(batches)} request(s)\n", flush=True)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # list() re-raises anything fetch_batch did not handle itself.
+        list(pool.map(lambda batch: fetch_batch(*batch, session, limiter), batches))
+
+
+def main(argv=None):
+    global args
+    args = parser.parse_args(argv)
+    if args.cache_dir is None:
+        args.cache_dir = os.environ.get("OPEN_METEO_CACHE_DIR", str(Path(__file__).parent / ".openmeteo_cache"))
+    os.makedirs(OUTPUT_DIR, exist_ok=True)  # creates data/<COUNTRY>/ if needed
+
+    # ── Fetch and save ────────────────────────────────────────────────────────
+
+    print(f"\nStarting data collection {'[FORCE REFRESH MODE]' if args.force_refresh else '[DIFFERENTIAL UPDATE MODE]'}")
+    print(f"Date range: {START_DATE} to {END_DATE}")
+    print(f"Locations: {len(LOCATIONS)} ({args.concurrency} concurrent requests of up to "
+          f"{args.batch_size} stations, {args.rate:g} API calls/min)")
+    print(f"Response cache: {args.cache_dir} (pruned to {args.cache_max_mb:g} MB)")
+    print()
+
+    session = make_session(args.cache_dir, args.cache_max_mb)
+    collect(LOCATIONS, session, RateLimiter(args.rate), args.concurrency, args.batch_size)
+
+    # ── Post-run completeness assert (T-5.70) ─────────────────────────────────
+    # fetch_batch swallows any error it cannot retry (a limit past LIMIT_RETRIES,
+    # a timeout, a malformed/empty response) in its broad `except` and moves on, so
+    # a refresh can finish "successfully" with a station silently not updated.
+    # Compare the stations that reached a success path (written CSV, or
+    # already-up-to-date) against the INTENDED list — every station the run
+    # attempted — and fail LOUDLY if any is missing, so the workflow goes red, no PR
+    # opens with a partial set, and the failure-alert issue fires
+    # (data-refresh.yaml). Derived from LOCATIONS, never a hardcoded 18, so it moves
+    # automatically if si.yaml gains or loses a station.
+    expected_stations = {loc["name"] for loc in LOCATIONS}
+    missing_stations = sorted(expected_stations - UPDATED_STATIONS)
+    if missing_stations:
+        print("\n" + "=" * 72, flush=True)
+        print(
+            f"REFRESH INCOMPLETE: {len(missing_stations)} of {len(expected_stations)} "
+            f"station(s) did NOT update this run:",
+            flush=True,
+        )
+        for _name in missing_stations:
+            print(f"  - {_name}", flush=True)
+        print(
+            "\nEach was skipped by a broad `except` in fetch_batch — an API limit\n"
+            "that outlasted the retries, a timeout, or a malformed/empty response. The\n"
+            "per-station cause is on its 'Failed for ...' line above.\n"
+            "\nThis is a FAILED refresh, not a quiet day: a successful fetch that simply\n"
+            "had no new rows still counts as updated and never reaches here. The fix is\n"
+            "to RE-RUN the refresh once the cause clears — do NOT relax or delete this\n"
+            "assert to make the run green, and do NOT open a PR with the partial set: a\n"
+            "skipped station silently stops being updated while every other gate passes\n"
+            "(T-5.70).",
+            flush=True,
+        )
+        print("=" * 72, flush=True)
+        sys.exit(1)
 
-        print(f"  Date range in CSV: {df_final['date'].iloc[0]} -> {df_final['date'].iloc[-1]}", flush=True)
-
-        df_final.to_csv(filepath, index=False)
-        print(f"  Saved {total_rows} total rows ({new_rows} new) -> {filepath}", flush=True)
-        UPDATED_STATIONS.add(name)  # T-5.70: fetched & written — counts even if new_rows == 0
+    print("\nDone! All files saved to:", os.path.abspath(OUTPUT_DIR))
 
-    except Exception as e:
-        err = str(e).lower()
-        if "daily" in err and "limit exceeded" in err:
-            secs = seconds_until_utc_midnight()
-            hrs = secs / 3600
-            print(f"  Daily API limit hit — waiting {hrs:.1f} hours until UTC midnight, then will retry {name}...", flush=True)
-            time.sleep(secs)
-            # Re-queue this location by recursing once
-            fetch_location(loc)
-            return
-        elif "hourly" in err and "limit exceeded" in err:
-            print(f"  Hourly API limit hit — waiting 60 minutes, then will retry {name}...", flush=True)
-            time.sleep(3600)
-            fetch_location(loc)
-            return
-        else:
-            # T-5.70: widen the log (exception type + station) but keep control
-            # flow unchanged — converting this to a raise is retry-on-429 territory
-            # and is out of scope. The station is simply not added to
-            # UPDATED_STATIONS, so the post-loop assert reports THAT it was skipped;
-            # this line records WHY (429/timeout/malformed/empty response).
-            print(f"  Failed for {name} ({e.__class__.__name__}): {e} — SKIPPED this run", flush=True)
-
-    # Politeness gap between stations. NOT zero, and here is why it stays:
-    # a refresh makes ~18 sequential Open-Meteo archive requests (one per station).
-    # At 10s spacing that is ~6 req/min — ~1% of the free tier's published limits
-    # of 600 req/min and 5,000 req/hour (https://open-meteo.com/en/pricing, checked
-    # 2026-08-07). Was 65s (undocumented, untouched since the MVP import 2bfc8a4) —
-    # ~17 min of pure waiting per run for no measured reason (T-5.45). Kept small
-    # rather than removed: dropping to zero would need retry-on-429 handling, because
-    # today a 429 that survives the 3 HTTP retries and is not tagged "daily/hourly
-    # limit exceeded" is swallowed by the except above and the station is SKIPPED,
-    # not retried — so tighter spacing must not become no spacing.
-    print(f"  Waiting 10 seconds before next request...", flush=True)
-    time.sleep(10)
-
-
-# ── Fetch and save ────────────────────────────────────────────────────────────
-
-print(f"\nStarting data collection {'[FORCE REFRESH MODE]' if args.force_refresh else '[DIFFERENTIAL UPDATE MODE]'}")
-print(f"Date range: {START_DATE} to {END_DATE}")
-print(f"Locations: {len(LOCATIONS)}")
-print()
-
-for loc in LOCATIONS:
-    fetch_location(loc)
-
-# ── Post-loop completeness assert (T-5.70) ───────────────────────────────────
-# fetch_location swallows any non-rate-limit error (a 429 past the HTTP retries, a
-# timeout, a malformed/empty response) in its broad `except` and moves on, so a
-# refresh can finish "successfully" with a station silently not updated. Compare
-# the stations that reached a success path (written CSV, or already-up-to-date)
-# against the INTENDED list — every station the loop attempted — and fail LOUDLY
-# if any is missing, so the workflow goes red, no PR opens with a partial set, and
-# the failure-alert issue fires (data-refresh.yaml). Derived from LOCATIONS, never
-# a hardcoded 18, so it moves automatically if si.yaml gains or loses a station.
-expected_stations = {loc["name"] for loc in LOCATIONS}
-missing_stations = sorted(expected_stations - UPDATED_STATIONS)
-if missing_stations:
-    print("\n" + "=" * 72, flush=True)
-    print(
-        f"REFRESH INCOMPLETE: {len(missing_stations)} of {len(expected_stations)} "
-        f"station(s) did NOT update this run:",
-        flush=True,
-    )
-    for _name in missing_stations:
-        print(f"  - {_name}", flush=True)
-    print(
-        "\nEach was skipped by the broad `except` in fetch_location — a 429 that\n"
-        "survived the HTTP retries, a timeout, or a malformed/empty response. The\n"
-        "per-station cause is on its 'Failed for ...' line above.\n"
-        "\nThis is a FAILED refresh, not a quiet day: a successful fetch that simply\n"
-        "had no new rows still counts as updated and never reaches here. The fix is\n"
-        "to RE-RUN the refresh once the cause clears — do NOT relax or delete this\n"
-        "assert to make the run green, and do NOT open a PR with the partial set: a\n"
-        "skipped station silently stops being updated while every other gate passes\n"
-        "(T-5.70).",
-        flush=True,
-    )
-    print("=" * 72, flush=True)
-    sys.exit(1)
 
-print("\nDone! All files saved to:", os.path.abspath(OUTPUT_DIR))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ Generate climate-si.db — a self-contained SQLite for Datasette.
 Run after mk_collect.py has populated DATA_DIR with station CSVs:
     DATA_DIR=/app/data/si python3 precompute_datasette.py
 
-Output: DATA_DIR/climate-si.db
+Output: DATA_DIR/climate-si.db (+ its datasette inspect-data, climate-si.inspect.json)
 
 Tables written
 --------------
@@ -67,6 +67,9 @@ else:
 
 DATA_DIR         = Path(os.environ.get("DATA_DIR", "/app/data/si"))
 DB_PATH          = DATA_DIR / "climate-si.db"
+# Row counts of DB_PATH's tables in datasette inspect-data form, written alongside it
+# (see write_inspect_fragment).
+INSPECT_PATH     = DB_PATH.with_suffix(".inspect.json")
 LAPSE_RATE       = 0.0065
 TREND_START_YEAR = CONFIG.get("trend_start_year", 1950)
 PROJ_END_YEAR    = CONFIG.get("projection_end_year", 2050)
@@ -172,13 +175,19 @@ def assert_station_metadata_complete() -> None:
 
 # ── Data loading ───────────────────────────────────────────────────────────────
 
-def load_all() -> pd.DataFrame:
+def load_all(frames: dict[str, pd.DataFrame] | None = None) -> pd.DataFrame:
+    """All raw station rows, lapse-corrected. `frames` are the station frames
+    validate_raw.load_raw_frames already read and parsed (main passes them, so each raw
+    file is parsed once); without them every CSV in DATA_DIR is read here."""
+    if frames is None:
+        frames = {Path(f).stem: pd.read_csv(f) for f in glob.glob(str(DATA_DIR / "*.csv"))}
     dfs = []
-    for f in sorted(glob.glob(str(DATA_DIR / "*.csv"))):
-        df = pd.read_csv(f)
-        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    for name in sorted(frames, key=lambda n: f"{n}.csv"):   # the CSVs' glob order
+        df = frames[name]
+        if not pd.api.types.is_datetime64_dtype(df["date"]):
+            df = df.assign(date=pd.to_datetime(df["date"], format="%Y-%m-%d"))
         if "source" not in df.columns:
-            df["source"] = "era5"
+            df = df.assign(source="era5")
         dfs.append(df)
     if not dfs:
         sys.exit(f"No CSV files found in {DATA_DIR}")
@@ -1153,8 +1162,142 @@ def build_spei_station(data: pd.DataFrame, stations_df: pd.DataFrame) -> pd.Data
     return pd.DataFrame(out_rows)
 
 
+# ── 9. national aggregates (Slovenija = one station, one vote) ─────────────────
+# The "Slovenija" views used to fan out to every station's row for the day
+# (`daily_window.json?month&day&_size=50`, same for annual_trend) and pool them in the
+# browser. These builders run the SAME pooling once, at build time, over the per-station
+# frames already in memory, so each national view is a single indexed row. The maths is
+# a line-for-line port of api.ts (averageDistributions / interpDensity /
+# fetchNationalAnnualTrendRow) and percentile.ts (cdfPercentile / curveQuantile), with
+# the same float operation order — the served numbers are the ones the page computed.
+
+NATIONAL_GRID_POINTS = 200   # averageDistributions' N, matches the per-station KDE grid
+
+
+def _average_distributions(curves: list[np.ndarray]) -> np.ndarray:
+    """api.ts averageDistributions: the unweighted mean of the stations' KDE curves
+    (D-15), resampled onto one grid spanning their union. interpDensity is 0 at and
+    outside a curve's end points, which np.interp alone is not."""
+    valid = [c for c in curves if len(c) >= 2]
+    if not valid:
+        return np.empty((0, 2))
+    xmin = min(c[0, 0] for c in valid)
+    xmax = max(c[-1, 0] for c in valid)
+    x = xmin + (xmax - xmin) * np.arange(NATIONAL_GRID_POINTS) / (NATIONAL_GRID_POINTS - 1)
+    total = np.zeros_like(x)
+    for c in valid:
+        density = np.interp(x, c[:, 0], c[:, 1])
+        density[(x <= c[0, 0]) | (x >= c[-1, 0])] = 0.0
+        total += density
+    return np.column_stack([np.round(x, 3), np.round(total / len(valid), 6)])
+
+
+def _cdf_percentile(xs: np.ndarray, ys: np.ndarray, cum: np.ndarray, value: float) -> float:
+    """percentile.ts cdfPercentile (trapezoid CDF of the curve at `value`), with the
+    running segment sums precomputed in `cum` (cum[k] = area of segments 0..k-1)."""
+    total = cum[-1]
+    if total <= 0:
+        return 0.0
+    k = int(np.searchsorted(xs, value, side="right")) - 1   # segment whose x0 <= value
+    k = min(max(k, 0), len(xs) - 1)
+    partial = cum[k]
+    if k < len(xs) - 1 and value > xs[k]:
+        x0, x1, y0, y1 = xs[k], xs[k + 1], ys[k], ys[k + 1]
+        dx = x1 - x0
+        if dx > 0:
+            yv = y0 + ((y1 - y0) * (value - x0)) / dx
+            partial += ((y0 + yv) / 2) * (value - x0)
+    return min(100.0, max(0.0, (partial / total) * 100))
+
+
+def _curve_quantiles(curve: np.ndarray, pcts) -> list[float]:
+    """percentile.ts curveQuantile: bisect cdfPercentile for each pct (60 halvings).
+    Unrounded on purpose — the band edges must land exactly on their percentile of the
+    served curve (T-4.31 b2), and rounding to 0.01 °C would move them off it."""
+    if len(curve) < 2:
+        return [float("nan")] * len(pcts)
+    xs, ys = curve[:, 0], curve[:, 1]
+    cum = [0.0]
+    for i in range(len(xs) - 1):
+        dx = xs[i + 1] - xs[i]
+        # Accumulated left to right, in the order cdfPercentile adds its segments.
+        cum.append(cum[-1] + (((ys[i] + ys[i + 1]) / 2) * dx if dx > 0 else 0.0))
+    cum = np.array(cum)
+    out = []
+    for pct in pcts:
+        lo, hi = float(xs[0]), float(xs[-1])
+        for _ in range(60):
+            mid = (lo + hi) / 2
+            if _cdf_percentile(xs, ys, cum, mid) < pct:
+                lo = mid
+            else:
+                hi = mid
+        out.append(hi)
+    return out
+
+
+def build_daily_window_national(dw_df: pd.DataFrame) -> pd.DataFrame:
+    """National ±window climatology per day-of-year, from the per-station daily_window
+    rows: the averaged KDE curve and the p5..p95 band cutoffs read off it."""
+    rows = []
+    if dw_df.empty:   # withheld upstream → withheld here (an empty frame, no columns)
+        return pd.DataFrame(rows)
+    for (month, day), g in dw_df.groupby(["month", "day"], sort=True):
+        curves = [np.array(json.loads(d), dtype=float)
+                  for d in g["distribution_json"] if d]
+        dist = _average_distributions(curves)
+        p5, p10, p20, p50, p80, p95 = _curve_quantiles(dist, (5, 10, 20, 50, 80, 95))
+        rows.append({
+            "month":         int(month),
+            "day":           int(day),
+            "p5": p5, "p10": p10, "p20": p20, "p50": p50, "p80": p80, "p95": p95,
+            "n_samples":     int(g["n_samples"].sum()),
+            "station_count": int(len(g)),
+            "year_min":      int(g["year_min"].min()),
+            "year_max":      int(g["year_max"].max()),
+            "distribution_json": json.dumps(dist.tolist(), separators=(",", ":")),
+        })
+    return pd.DataFrame(rows)
+
+
+def build_annual_trend_national(at_df: pd.DataFrame) -> pd.DataFrame:
+    """National annual trend per variable × day-of-year, from the per-station
+    annual_trend rows: fit parameters averaged across stations, the scatter averaged
+    per year over the stations that have that year."""
+    line_cols = ["slope", "intercept", "slope_hi", "intercept_hi", "slope_lo", "intercept_lo"]
+    rows = []
+    if at_df.empty:
+        return pd.DataFrame(rows)
+    for (variable, month, day), g in at_df.groupby(["variable", "month", "day"], sort=True):
+        # api.ts avg() reads a missing value as 0 (`f(r) ?? 0`).
+        avg = lambda col: float(g[col].fillna(0).mean())  # noqa: E731
+        per_year: dict[int, list[float]] = {}
+        for scatter in g["scatter_json"]:
+            for pt in json.loads(scatter):
+                per_year.setdefault(pt["x"], []).append(pt["y"])
+        scatter = [{"x": x, "y": round(sum(ys) / len(ys), 2)} for x, ys in sorted(per_year.items())]
+        base = g.iloc[0]
+        rows.append({
+            "variable":      variable,
+            "month":         int(month),
+            "day":           int(day),
+            "day_label":     base["day_label"],
+            "year_min":      int(g["year_min"].min()),
+            "year_max":      int(g["year_max"].max()),
+            "trend10":       round(avg("trend10"), 3),
+            "p_val":         avg("p_val"),
+            "tau":           round(avg("tau"), 3),
+            "n_years":       int(g["n_years"].max()),
+            "proj_end_year": int(base["proj_end_year"]),
+            **{col: avg(col) for col in line_cols},
+            "scatter_json":  json.dumps(scatter, separators=(",", ":")),
+            "station_count": int(len(g)),
+        })
+    return pd.DataFrame(rows)
+
+
 def build_all_tables(data):
-    """Build all nine derived tables in memory from loaded station data.
+    """Build every derived table in memory from loaded station data.
 
     The single build sequence, shared by main() (which then validates + writes to
     SQLite) and tests/test_reference_manifest.py (which hashes the output over a
@@ -1162,38 +1305,44 @@ def build_all_tables(data):
     one sequence means the reference-manifest gate exercises exactly the builders
     that ship, not a copy that could drift.
     """
-    print("\n[1/10] Building stations table…")
+    print("\n[1/12] Building stations table…")
     stations_df = build_stations(data)
     print(f"  {len(stations_df)} stations "
           f"({stations_df['station_id'].notna().sum()} with Vremenar ID)")
 
-    print("\n[2/10] Building daily table…")
+    print("\n[2/12] Building daily table…")
     daily_df = build_daily(data, stations_df)
 
-    print("\n[3/10] Computing daily_percentiles (per station × DOY, mean temp)…")
+    print("\n[3/12] Computing daily_percentiles (per station × DOY, mean temp)…")
     perc_df = build_daily_percentiles(data, stations_df)
 
-    print("\n[4/10] Computing daily_window (per station × DOY, KDE of max temp)…")
+    print("\n[4/12] Computing daily_window (per station × DOY, KDE of max temp)…")
     dw_df = build_daily_window(data, stations_df)
 
-    print("\n[5/10] Computing annual_trend (per station × variable × DOY)…")
+    print("\n[5/12] Computing annual_trend (per station × variable × DOY)…")
     at_df = build_annual_trend(data, stations_df)
 
-    print("\n[6/10] Computing annual_trend_windows (exploratory ±3/±15/±45)…")
+    print("\n[6/12] Computing annual_trend_windows (exploratory ±3/±15/±45)…")
     atw_df = build_annual_trend_windows(data, stations_df)
 
-    print("\n[7/10] Computing season_heatmap (per station × year × season)…")
+    print("\n[7/12] Computing season_heatmap (per station × year × season)…")
     sh_df = build_season_heatmap(data, stations_df)
 
-    print("\n[8/10] Computing tropical (days/nights × threshold × streak, NB GLM)…")
+    print("\n[8/12] Computing tropical (days/nights × threshold × streak, NB GLM)…")
     tr_df = build_tropical(data, stations_df)
 
-    print("\n[9/10] Computing spei (national seasonal drought heatmap)…")
+    print("\n[9/12] Computing spei (national seasonal drought heatmap)…")
     spei_df = build_spei_heatmap(data)
 
-    print("\n[10/10] Computing spei_station (per-station SPEI-3/SPEI-30 trends)…")
+    print("\n[10/12] Computing spei_station (per-station SPEI-3/SPEI-30 trends)…")
     ss_df = build_spei_station(data, stations_df)
 
+    print("\n[11/12] Computing daily_window_national (averaged KDE per DOY)…")
+    dwn_df = build_daily_window_national(dw_df)
+
+    print("\n[12/12] Computing annual_trend_national (averaged trend per variable × DOY)…")
+    atn_df = build_annual_trend_national(at_df)
+
     return {
         "stations": stations_df,
         "daily": daily_df,
@@ -1205,14 +1354,28 @@ def build_all_tables(data):
         "tropical": tr_df,
         "spei": spei_df,
         "spei_station": ss_df,
+        "daily_window_national": dwn_df,
+        "annual_trend_national": atn_df,
     }
 
 
+def write_inspect_fragment(db_path: Path, counts: dict[str, int], out_path: Path) -> None:
+    """Write the row counts main() already holds in memory, in the shape of db_path's
+    `datasette inspect` entry. `invoke create-databases --prebuilt` checks its copies
+    against them; the served database's own entry (hash, size) is computed there, from
+    the database the tables are copied into."""
+    fragment = {db_path.stem: {"tables": {name: {"count": int(n)} for name, n in counts.items()}}}
+    out_path.write_text(json.dumps(fragment, indent=2))
+
+
 def main():
     print(f"Writing to {DB_PATH}")
 
-    print("\nLoading ERA5 station CSVs…")
-    data = load_all()
+    # Raw inputs are validated on the way in (T-5.11's checks, validate_raw), and the
+    # frames that pass are the ones load_all uses — each CSV is read and parsed once.
+    print("\nLoading and validating ERA5 station CSVs…")
+    frames = validate_raw.load_raw_frames(DATA_DIR, CONFIG)
+    data = load_all(frames)
     print(f"  {len(data):,} rows · {data['location'].nunique()} stations · "
           f"{data['year'].min()}–{data['year'].max()}")
 
@@ -1244,9 +1407,14 @@ def main():
     cur.execute("CREATE INDEX IF NOT EXISTS idx_trop ON tropical(era5_name, kind, threshold, streak)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_spei_xy ON spei(x, y)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_spei_station ON spei_station(era5_name, series)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_dwn_md ON daily_window_national(month, day)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_atn_md ON annual_trend_national(variable, month, day)")
     conn.commit()
     conn.close()
 
+    write_inspect_fragment(DB_PATH, {name: len(df) for name, df in tables.items()}, INSPECT_PATH)
+    print(f"  wrote table row counts → {INSPECT_PATH}")
+
     import os
     size_mb = os.path.getsize(DB_PATH) / 1e6
     print(f"\nDone. {DB_PATH} ({size_mb:.0f} MB)")
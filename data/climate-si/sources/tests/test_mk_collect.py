@@ -0,0 +1,431 @@
+"""mk_collect's batched, concurrent collector, against a local stub of the Open-Meteo
+archive.
+
+The stub answers the same request the real API gets (`format=flatbuffers`) with a
+response built from the openmeteo_sdk schema, so the whole fetch → parse → CSV path
+runs; only the values are synthetic. OPEN_METEO_ARCHIVE_URL (here: the module
+attribute it sets) is the seam — nothing in mk_collect is mocked.
+"""
+
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import flatbuffers
+import numpy as np
+import pandas as pd
+import pytest
+
+import mk_collect as mc
+
+
+def _epoch(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+
+
+def _weather_api_response(lat, lon, elevation, start, end, n_variables, level=10.0) -> bytes:
+    """One length-prefixed WeatherApiResponse flatbuffer with a daily block of
+    `n_variables` series over [start, end], in UTC (offset 0)."""
+    days = (end - start).days + 1
+    b = flatbuffers.Builder(1024)
+    variables = []
+    for i in range(n_variables):
+        values = b.CreateNumpyVector(np.full(days, level - i, dtype=np.float32))
+        b.StartObject(4)                            # VariableWithValues
+        b.PrependUOffsetTRelativeSlot(3, values, 0)  # values
+        variables.append(b.EndObject())
+    b.StartVector(4, len(variables), 4)
+    for offset in reversed(variables):
+        b.PrependUOffsetTRelative(offset)
+    variables_vector = b.EndVector()
+    b.StartObject(4)                                # VariablesWithTime
+    b.PrependInt64Slot(0, _epoch(start), 0)         # time
+    b.PrependInt64Slot(1, _epoch(end) + 86400, 0)   # time_end
+    b.PrependInt32Slot(2, 86400, 0)                 # interval
+    b.PrependUOffsetTRelativeSlot(3, variables_vector, 0)
+    daily = b.EndObject()
+    b.StartObject(11)                               # WeatherApiResponse
+    b.PrependFloat32Slot(0, lat, 0.0)
+    b.PrependFloat32Slot(1, lon, 0.0)
+    b.PrependFloat32Slot(2, elevation, 0.0)
+    b.PrependUOffsetTRelativeSlot(10, daily, 0)     # daily
+    b.Finish(b.EndObject())
+    buf = bytes(b.Output())
+    return len(buf).to_bytes(4, "little") + buf
+
+
+def _elevation(lat: float) -> float:
+    """The stub's ERA5 cell elevation for a location — distinct per station, so a
+    batch that mixed up its responses would write the wrong one."""
+    return round(100 + (lat - 45) * 1000, 1)
+
+
+class StubArchive:
+    """Threaded HTTP stub of /v1/archive. `answers` is a list of callables consulted
+    in order for each request; one returning None defers to the next, and the last
+    resort is a successful response with one message per requested location."""
+
+    def __init__(self):
+        self.requests = []
+        self.answers = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                # `daily` is repeated once per variable; everything else is single.
+                query = {k: v if k == "daily" else v[0]
+                         for k, v in parse_qs(urlparse(self.path).query).items()}
+                with stub.lock:
+                    stub.requests.append(query)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    status, body, ctype = stub.answer(query)
+                    self.send_response(status)
+                    self.send_header("Content-Type", ctype)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/archive"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, query):
+        for answer in self.answers:
+            result = answer(query)
+            if result is not None:
+                return result
+        start = date.fromisoformat(query["start_date"])
+        end = date.fromisoformat(query["end_date"])
+        body = b"".join(
+            _weather_api_response(float(lat), float(lon), _elevation(float(lat)),
+                                  start, end, len(query["daily"]))
+            for lat, lon in zip(query["latitude"].split(","), query["longitude"].split(","))
+        )
+        return 200, body, "application/octet-stream"
+
+
+def _error(status, reason):
+    return status, json.dumps({"error": True, "reason": reason}).encode(), "application/json"
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    archive = StubArchive()
+    monkeypatch.setattr(mc, "ARCHIVE_URL", archive.url)
+    monkeypatch.setattr(mc, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(mc, "START_DATE", "2024-01-01")
+    monkeypatch.setattr(mc, "LOCATIONS", mc.CONFIG["stations"][:4])
+    monkeypatch.setattr(mc, "UPDATED_STATIONS", set())
+    # The response cache and rebuild journals live in the test's directory, not next
+    # to mk_collect.
+    monkeypatch.setenv("OPEN_METEO_CACHE_DIR", str(tmp_path / "cache"))
+    yield archive
+    archive.server.shutdown()
+
+
+def _chunks(start):
+    return mc.fetch_chunks(date.fromisoformat(start), mc.end_date, mc.final_before)
+
+
+def test_collects_every_station_concurrently(stub, tmp_path):
+    stub.delay = 0.2
+    mc.main(["--concurrency", "4", "--batch-size", "1"])
+
+    assert mc.UPDATED_STATIONS == {s["name"] for s in mc.LOCATIONS}
+    assert len(stub.requests) == 4 * len(_chunks("2024-01-01"))
+    assert stub.max_in_flight > 1
+    for loc in mc.LOCATIONS:
+        df = pd.read_csv(tmp_path / f"{loc['name']}.csv")
+        assert df["date"].iloc[0] == "2024-01-01"
+        assert df["date"].iloc[-1] == mc.END_DATE
+        assert (df["elevation_era5_m"] == _elevation(loc["lat"])).all()
+
+
+def test_stations_sharing_a_window_share_a_request(stub, tmp_path):
+    # One station already has data up to two days ago, so only the refresh window is
+    # due for it; the other three need their full history and go out together.
+    first = mc.LOCATIONS[0]
+    mc.main(["--batch-size", "1"])
+    df = pd.read_csv(tmp_path / f"{first['name']}.csv")
+    df.iloc[:-2].to_csv(tmp_path / f"{first['name']}.csv", index=False)
+    for loc in mc.LOCATIONS[1:]:
+        (tmp_path / f"{loc['name']}.csv").unlink()
+    stub.requests.clear()
+
+    mc.main([])
+
+    refresh_from = (datetime.now() - timedelta(days=mc.REFRESH_WINDOW)).strftime("%Y-%m-%d")
+    windows = sorted((q["start_date"], len(q["latitude"].split(","))) for q in stub.requests)
+    assert windows == sorted([(a, 3) for a, _ in _chunks("2024-01-01")] + [(refresh_from, 1)])
+    for loc in mc.LOCATIONS:
+        df = pd.read_csv(tmp_path / f"{loc['name']}.csv")
+        assert df["date"].iloc[-1] == mc.END_DATE
+        assert (df["elevation_era5_m"] == _elevation(loc["lat"])).all()
+        assert df["date"].is_unique
+
+
+def test_limit_answer_pauses_and_retries_the_station(stub, monkeypatch):
+    monkeypatch.setattr(mc, "MINUTELY_LIMIT_WAIT", 0.3)
+    limited = []
+
+    def first_request_is_limited(query):
+        if not limited:
+            limited.append(query["latitude"])
+            return _error(429, "Minutely API request limit exceeded. Please try again in one minute.")
+        return None
+
+    stub.answers.append(first_request_is_limited)
+    started = time.monotonic()
+    mc.main(["--rate", "100000"])
+
+    assert mc.UPDATED_STATIONS == {s["name"] for s in mc.LOCATIONS}
+    # The one batch: every chunk once, and the limited one twice.
+    assert len(stub.requests) == len(_chunks("2024-01-01")) + 1
+    assert time.monotonic() - started >= 0.3
+
+
+def test_unretryable_failure_fails_the_run(stub, capsys):
+    broken = mc.LOCATIONS[1]
+    stub.answers.append(
+        lambda q: _error(400, "Invalid coordinates")
+        if str(broken["lat"]) in q["latitude"].split(",") else None
+    )
+    with pytest.raises(SystemExit) as exc:
+        mc.main(["--batch-size", "2"])
+
+    # The whole batch holding the broken station fails; the other batch is written.
+    assert exc.value.code == 1
+    failed = {loc["name"] for loc in mc.LOCATIONS[:2]}
+    assert mc.UPDATED_STATIONS == {loc["name"] for loc in mc.LOCATIONS} - failed
+    out = capsys.readouterr().out
+    assert all(f"  - {name}" in out for name in failed)
+
+
+def test_rate_limiter_meters_by_weight():
+    limiter = mc.RateLimiter(per_minute=600)       # 10 calls per second
+    limiter.acquire(600)
+    started = time.monotonic()
+    limiter.acquire(2)                            # the bucket is empty: ~0.2 s refill
+    assert 0.1 < time.monotonic() - started < 1.0
+    assert mc.request_weight(date(2024, 1, 1), date(2024, 1, 14), 5) == 1.0
+    assert mc.request_weight(date(2024, 1, 1), date(2024, 1, 28), 20) == 4.0
+
+    with pytest.raises(ValueError):
+        limiter.acquire(601)
+
+
+def test_split_request_keeps_every_request_within_the_bucket():
+    stations = [{"name": f"s{i}"} for i in range(10)]
+    decade = ("1950-01-01", "1959-12-31")            # ~261 calls per station
+    for capacity, spans in [(5000, 1), (500, 1), (100, 3)]:
+        requests = mc.split_request(stations, decade, capacity)
+        assert all(
+            mc.request_weight(date.fromisoformat(a), date.fromisoformat(b), len(mc.DAILY_VARIABLES))
+            * len(group) <= capacity
+            for (a, b), group in requests
+        )
+        by_span = {}
+        for span, group in requests:
+            by_span.setdefault(span, []).extend(group)
+        assert len(by_span) == spans
+        assert all(group == stations for group in by_span.values())
+        ends = [date(1949, 12, 31)] + [date.fromisoformat(b) for _, b in by_span]
+        starts = [date.fromisoformat(a) for a, _ in by_span] + [date(1960, 1, 1)]
+        assert all(e + timedelta(days=1) == s for e, s in zip(ends, starts))
+    assert len(mc.split_request(stations, decade, 5000)) == 1
+    assert len(mc.split_request(stations, decade, 500)) == 10
+
+
+def test_heavy_batches_are_split_to_the_rate(stub, tmp_path, monkeypatch):
+    # A bucket of 60 calls holds one station's 2024–2025 chunk (~52 calls) and two
+    # stations' 2026 one; nothing may be drawn past it. The bucket does not refill
+    # here, only the draws are checked.
+    drawn = []
+
+    class RecordingLimiter(mc.RateLimiter):
+        def acquire(self, weight=1.0):
+            assert weight <= self.capacity
+            drawn.append(weight)
+
+    monkeypatch.setattr(mc, "RateLimiter", RecordingLimiter)
+    mc.main(["--rate", "60", "--batch-size", "4"])
+
+    assert mc.UPDATED_STATIONS == {s["name"] for s in mc.LOCATIONS}
+    assert len(drawn) == len(stub.requests) > len(_chunks("2024-01-01"))
+    for loc in mc.LOCATIONS:
+        df = pd.read_csv(tmp_path / f"{loc['name']}.csv")
+        assert df["date"].iloc[0] == "2024-01-01"
+        assert df["date"].iloc[-1] == mc.END_DATE
+        assert df["date"].is_unique
+
+
+def test_fetch_chunks_split_final_years_by_decade():
+    final_before = date(2026, 10, 4)
+    assert mc.fetch_chunks(date(1950, 1, 1), date(2026, 10, 18), final_before) == [
+        ("1950-01-01", "1959-12-31"), ("1960-01-01", "1969-12-31"), ("1970-01-01", "1979-12-31"),
+        ("1980-01-01", "1989-12-31"), ("1990-01-01", "1999-12-31"), ("2000-01-01", "2009-12-31"),
+        ("2010-01-01", "2019-12-31"), ("2020-01-01", "2025-12-31"), ("2026-01-01", "2026-10-18"),
+    ]
+    # A station that fell behind mid-decade: its first chunk starts where it stopped.
+    assert mc.fetch_chunks(date(2013, 6, 2), date(2026, 10, 18), final_before)[:2] == [
+        ("2013-06-02", "2019-12-31"), ("2020-01-01", "2025-12-31"),
+    ]
+    # A refresh window across the new year stays one request.
+    assert mc.fetch_chunks(date(2025, 12, 20), date(2026, 1, 18), date(2026, 1, 4)) == [
+        ("2025-12-20", "2026-01-18"),
+    ]
+
+
+def test_rerun_reads_final_chunks_from_the_cache(stub, tmp_path, capsys):
+    mc.main([])
+    first = {loc["name"]: (tmp_path / f"{loc['name']}.csv").read_bytes() for loc in mc.LOCATIONS}
+    stub.requests.clear()
+    capsys.readouterr()
+
+    mc.main(["--force-refresh"])
+
+    # Only the chunk that reaches into the refresh window goes to the API again; the
+    # others are recognised as cached before they would draw from the rate limiter.
+    chunks = _chunks("2024-01-01")
+    assert [(q["start_date"], q["end_date"]) for q in stub.requests] == chunks[-1:]
+    assert capsys.readouterr().out.count(" (cached)") == len(chunks) - 1
+    for name, content in first.items():
+        assert (tmp_path / f"{name}.csv").read_bytes() == content
+
+
+def test_cache_is_pruned_to_its_size_cap(stub, tmp_path):
+    cap_mb = 0.05
+    mc.main(["--batch-size", "1", "--cache-max-mb", str(cap_mb)])
+
+    cache = mc.make_session(tmp_path / "cache", cap_mb).cache.responses
+    # Each station's final chunk is stored on its own; not all four fit.
+    assert 0 < len(cache) < len(mc.LOCATIONS)
+    assert cache.size() <= cap_mb * 1024 * 1024
+
+
+def test_interrupted_full_fetch_resumes_from_the_journal(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(mc, "START_DATE", "2005-01-01")
+    chunks = _chunks("2005-01-01")
+    assert len(chunks) >= 3
+    stub.answers.append(lambda q: _error(400, "Timeout") if q["start_date"] == chunks[2][0] else None)
+    fast = ["--rate", "100000"]  # a decade per request outweighs the default bucket
+    with pytest.raises(SystemExit):
+        mc.main(fast)
+
+    # The first two chunks of every station are on disk and journalled; the CSVs
+    # themselves are not touched until the last chunk is in.
+    rebuild = tmp_path / "cache" / "rebuild"
+    for loc in mc.LOCATIONS:
+        journal = json.loads((rebuild / f"{loc['name']}.json").read_text())
+        assert journal["chunks"] == [list(c) for c in chunks[:2]]
+        assert not (tmp_path / f"{loc['name']}.csv").exists()
+    # A run killed while appending the third chunk leaves bytes past the journal.
+    with open(rebuild / f"{mc.LOCATIONS[0]['name']}.csv", "a") as f:
+        f.write("Celje,46.2")
+
+    stub.answers.clear()
+    stub.requests.clear()
+    mc.main(fast)
+
+    assert [q["start_date"] for q in stub.requests] == [c[0] for c in chunks[2:]]
+    assert mc.UPDATED_STATIONS == {loc["name"] for loc in mc.LOCATIONS}
+    assert list(rebuild.iterdir()) == []
+    resumed = {loc["name"]: (tmp_path / f"{loc['name']}.csv").read_bytes() for loc in mc.LOCATIONS}
+
+    mc.main(["--force-refresh", *fast])
+    for name, content in resumed.items():
+        assert (tmp_path / f"{name}.csv").read_bytes() == content
+    df = pd.read_csv(tmp_path / f"{mc.LOCATIONS[0]['name']}.csv")
+    assert df["date"].iloc[0] == "2005-01-01"
+    assert df["date"].iloc[-1] == mc.END_DATE
+    assert df["date"].is_unique
+
+
+# ── tail-aware CSV merge ─────────────────────────────────────────────────────
+#
+# append_to_csv must leave exactly the file the whole-file merge wrote (read the CSV,
+# concat the new rows, drop duplicate dates keeping the new ones, sort, to_csv), and
+# every line before the first fetched date must stay as it was. The committed raw CSVs
+# are the realistic input — float32 history from full fetches and float64-widened rows
+# from earlier differential merges. Domzale has values that a default-precision read
+# does not parse back to the same float (28.931249618530277).
+
+_RAW_DIR = Path(__file__).resolve().parents[2] / "data" / "raw"
+_RAW_CSV = _RAW_DIR / "Celje.csv"
+
+
+def _whole_file_merge(filepath, df_new):
+    df = pd.concat([mc.load_existing_data(filepath), df_new], ignore_index=True)
+    df = df.drop_duplicates(subset=["date"], keep="last").sort_values("date")
+    return df.to_csv(index=False).splitlines(keepends=True)
+
+
+def _split_at(lines, cut):
+    """(lines dated before `cut`, the rest); the header counts as before."""
+    date_idx = lines[0].rstrip().split(",").index("date")
+    n = next((i for i, line in enumerate(lines[1:], 1)
+              if line.split(",")[date_idx] >= str(cut)), len(lines))
+    return lines[:n], lines[n:]
+
+
+def _new_rows(template, start, days):
+    dates = [d.date() for d in pd.date_range(start, periods=days)]
+    df = pd.DataFrame({col: template[col].iloc[-1] for col in template.columns}, index=range(days))
+    df["date"] = dates
+    for col in ["temperature_max", "temperature_min", "temperature_mean",
+                "precipitation_sum", "et0_evapotranspiration"]:
+        df[col] = np.linspace(-3.3, 33.3, days, dtype=np.float32)
+    df["source"] = "era5t"
+    return df
+
+
+@pytest.mark.parametrize("station", ["Celje", "Domzale"])
+@pytest.mark.parametrize("overlap_days, block", [(15, mc.TAIL_BLOCK), (15, 700), (0, 700), (-20, 700)])
+def test_append_matches_whole_file_merge(tmp_path, monkeypatch, station, overlap_days, block):
+    # overlap_days > 0 re-fetches that many stored days (the refresh window); 0 starts
+    # the day after the last row; < 0 leaves a gap (a station that fell behind).
+    monkeypatch.setattr(mc, "TAIL_BLOCK", block)
+    target = tmp_path / f"{station}.csv"
+    target.write_bytes((_RAW_DIR / f"{station}.csv").read_bytes())
+    existing = mc.load_existing_data(target)
+    last = existing["date"].iloc[-1]
+    df_new = _new_rows(existing, last - timedelta(days=overlap_days - 1), 20)
+    cut = df_new["date"].iloc[0]
+    kept, _ = _split_at(target.read_text().splitlines(keepends=True), cut)
+    merged = _whole_file_merge(target, df_new)
+
+    written, added = mc.append_to_csv(target, df_new, cut)
+
+    assert target.read_text().splitlines(keepends=True) == merged
+    assert merged[:len(kept)] == kept
+    assert written == 20
+    assert added == 20 - max(overlap_days, 0)
+    assert mc.read_last_date_from_csv(target) == df_new["date"].iloc[-1]
+
+
+def test_append_leaves_legacy_layout_to_the_whole_file_merge(tmp_path):
+    target = tmp_path / "Celje.csv"
+    legacy = pd.read_csv(_RAW_CSV).drop(columns=["source"]).tail(100)
+    legacy.to_csv(target, index=False)
+    before = target.read_bytes()
+    df_new = _new_rows(mc.load_existing_data(target), "2030-01-01", 3)
+
+    assert mc.append_to_csv(target, df_new, df_new["date"].iloc[0]) is None
+    assert target.read_bytes() == before
@@ -8,6 +8,8 @@ calendar / the formula, never read back from the code, so a Phase 4 edit that
 moves a value fails loudly.
 """
 
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -149,6 +151,22 @@ def test_load_all_rejects_unknown_source(tmp_path, monkeypatch):
     assert "forecast" in str(exc.value)
 
 
+def test_load_all_takes_the_frames_validate_raw_parsed(monkeypatch):
+    # precompute main hands load_all the frames validate_raw.load_raw_frames already
+    # read and parsed; the result must be what reading the CSVs again gives.
+    import validate as v
+    import validate_raw
+
+    fixture = Path(__file__).parent / "fixtures" / "reference-raw"
+    config = v._load_config()
+    names = {p.stem for p in fixture.glob("*.csv")}
+    config = {**config, "stations": [s for s in config["stations"] if s["name"] in names]}
+    frames = validate_raw.load_raw_frames(fixture, config)
+
+    monkeypatch.setattr(pc, "DATA_DIR", fixture)
+    pd.testing.assert_frame_equal(pc.load_all(frames), pc.load_all())
+
+
 def test_lapse_rate_constant():
     assert pc.LAPSE_RATE == 0.0065
 
@@ -368,3 +386,66 @@ def test_build_tropical_allows_trusted_and_honest_withholds(monkeypatch):
     assert not pc.build_tropical(data, stations_df).empty
     monkeypatch.setattr(pc, "_tropical_trend", lambda fy, fc, y: ({}, False))
     assert not pc.build_tropical(data, stations_df).empty
+
+
+# ── datasette inspect-data fragment ──────────────────────────────────────────
+#
+# main() writes the row counts of climate-si.db's tables, so the image build can check
+# its copies without a COUNT(*) scan. The shape is that of the `tables` part of a
+# datasette --inspect-file entry: {db stem: {tables: {name: {count}}}}. The hash and
+# size are left to tasks.inspect_fragment, which computes them for the served database.
+
+
+def test_inspect_fragment_matches_datasette_shape(tmp_path):
+    import json
+    import sqlite3
+
+    db = tmp_path / "climate-si.db"
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE daily (x INTEGER)")
+    conn.executemany("INSERT INTO daily VALUES (?)", [(1,), (2,), (3,)])
+    conn.commit()
+    conn.close()
+    out = tmp_path / "climate-si.inspect.json"
+
+    pc.write_inspect_fragment(db, {"daily": 3}, out)
+
+    assert json.loads(out.read_text()) == {
+        "climate-si": {
+            "tables": {"daily": {"count": 3}},
+        }
+    }
+
+
+# ── national aggregates ──────────────────────────────────────────────────────
+#
+# build_daily_window_national replaces the browser-side pooling of
+# fetchEra5NationalWindowRow (api.ts), so it must produce the numbers the frontend
+# suite pins for the same input (tests/unit/national-aggregation.test.ts): the 18
+# recorded station rows for 21 Jul, served by the offline fixture layer.
+
+_NATIONAL_FIXTURE = (Path(__file__).resolve().parents[4] / "tests" / "fixtures" / "http"
+                     / "climate-si" / "daily_window__national-all__month-7__day-21.json")
+
+
+def test_daily_window_national_matches_frontend_pooling():
+    import json
+
+    dw = pd.DataFrame(json.loads(_NATIONAL_FIXTURE.read_text()))
+    out = pc.build_daily_window_national(dw)
+
+    assert len(out) == 1
+    row = out.iloc[0]
+    assert (row["month"], row["day"]) == (7, 21)
+    assert row["n_samples"] == 20682
+    assert row["station_count"] == 18
+    assert row["p50"] == approx(25.0422, abs=1e-3)
+    # The cutoffs are read off the served curve, so its CDF at p80 is 80 (T-4.31 b2).
+    curve = np.array(json.loads(row["distribution_json"]))
+    xs, ys = curve[:, 0], curve[:, 1]
+    below = xs < row["p80"]
+    head_x = np.append(xs[below], row["p80"])
+    head_y = np.append(ys[below], np.interp(row["p80"], xs, ys))
+    assert 100 * np.trapezoid(head_y, head_x) / np.trapezoid(ys, xs) == approx(80, abs=1e-4)
+    cutoffs = list(row[["p5", "p10", "p20", "p50", "p80", "p95"]])
+    assert cutoffs == sorted(cutoffs)
@@ -59,7 +59,7 @@ def _fixture_csvs() -> list[Path]:
 
 
 def _build_and_export(out_dir: Path, monkeypatch) -> None:
-    """Load the frozen fixture, build all nine tables, and export them to CSV in
+    """Load the frozen fixture, build all tables, and export them to CSV in
     out_dir — the same to_sql → export_datasette_csv path production hashes."""
     monkeypatch.setattr(pc, "DATA_DIR", FIXTURE_RAW)
     data = pc.load_all()
@@ -4,7 +4,7 @@ weakens a check into a no-op, the negative cases here go red.
 
 T-5.7c untracked the derived ``climate-si.*.csv`` (they are generated at datasette
 image-build time now), so these tests no longer read them from disk. Instead they
-build a *structurally valid* nine-table set in code, keyed to the real ``si.yaml``
+build a *structurally valid* table set in code, keyed to the real ``si.yaml``
 station list, and mutate one field per negative case.
 
 The frames carry dummy values on purpose: ``validate.py`` checks shape, bounds and
@@ -235,6 +235,20 @@ def _build_valid_tables(config: dict) -> dict[str, pd.DataFrame]:
         for i, s in enumerate(stations_cfg)
     ])
 
+    # daily_window_national / annual_trend_national — the per-station rows pooled to
+    # one row per key; station_count must equal the number of stations pooled.
+    n = len(stations_cfg)
+    daily_window_national = (
+        daily_window.drop(columns=["era5_name", "station_id"])
+        .drop_duplicates(["month", "day"])
+        .assign(station_count=n)
+    )
+    annual_trend_national = (
+        annual_trend.drop(columns=["era5_name", "station_id"])
+        .drop_duplicates(["variable", "month", "day"])
+        .assign(station_count=n)
+    )
+
     return {
         "stations": stations,
         "daily": daily,
@@ -246,6 +260,8 @@ def _build_valid_tables(config: dict) -> dict[str, pd.DataFrame]:
         "tropical": tropical,
         "spei": spei,
         "spei_station": spei_station,
+        "daily_window_national": daily_window_national,
+        "annual_trend_national": annual_trend_national,
     }
 
 
@@ -292,6 +308,14 @@ def test_date_gap(tables):
     _expect_error(t, "missing day")
 
 
+def test_national_station_count(tables):
+    t = dict(tables)
+    d = tables["daily_window_national"].copy()
+    d.loc[d.index[0], "station_count"] = 1
+    t["daily_window_national"] = d
+    _expect_error(t, "daily_window_national: 1 row(s) pool fewer or more")
+
+
 def test_percentiles_out_of_order(tables):
     t = dict(tables)
     d = tables["daily_window"].copy()
@@ -7,6 +7,8 @@ carry dummy but physically-plausible values — validate_raw checks shape, bound
 date continuity and si.yaml agreement, not that the numbers are correct.
 """
 
+import json
+
 import pandas as pd
 import pytest
 
@@ -183,3 +185,145 @@ def test_negatives_aggregate(frames):
         vr.validate_raw_stations(f)
     msg = str(ei.value)
     assert f"raw[{a}]" in msg and f"raw[{b}]" in msg, msg
+
+
+# ── fused pass vs the reference checks ──────────────────────────────────────────
+#
+# _validate_station only decides WHETHER the schema and the structural checks have
+# something to say; they still word every error. Its list must be exactly what running
+# all of them unconditionally gives — on clean frames and on each kind of corruption.
+
+def _reference_errors(name, df, cfg_station):
+    return (vr._schema_errors(name, df)
+            + vr._check_date_continuity(name, df)
+            + vr._check_elevation(name, df, cfg_station)
+            + vr._check_location(name, df))
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda d: d,
+    lambda d: d.assign(temperature_max=d["temperature_max"].where(d.index != 2, 99.9)),
+    lambda d: d.assign(temperature_mean=d["temperature_max"] + 0.5),
+    lambda d: d.assign(latitude=d["latitude"].where(d.index != 1, float("nan"))),
+    lambda d: d.assign(et0_evapotranspiration=vr.ET0_MAX_MM),          # inclusive bound
+    lambda d: d.assign(precipitation_sum=-0.1),
+    lambda d: d.assign(date=d["date"].where(d.index != 3, "2000-02-30")),
+    lambda d: d.assign(date=d["date"].where(d.index != 3, d["date"][2])),
+    lambda d: d.drop(index=5),
+    lambda d: d.iloc[::-1],
+    lambda d: d.assign(elevation_diff_m=d["elevation_diff_m"].where(d.index != 0, float("nan"))),
+    lambda d: d.assign(elevation_diff_m=d["elevation_diff_m"] + 1.0),
+    lambda d: d.assign(location=d["location"].where(d.index != 4, "Elsewhere")),
+    lambda d: d.assign(source=d["source"].where(d.index != 4, None)),
+    lambda d: d.assign(elevation_station_m=d["elevation_station_m"].astype(object)
+                       .where(d.index != 4, "abc")),
+    lambda d: d.assign(temperature_min=d["temperature_min"].astype(str)),
+    lambda d: d.assign(surprise=1),
+    lambda d: d.drop(columns=["source"]),
+])
+def test_fused_pass_matches_the_reference_checks(frames, config, corrupt):
+    name = _one(frames)
+    cfg_station = next(s for s in config["stations"] if s["name"] == name)
+    df = corrupt(frames[name].copy()).reset_index(drop=True)
+    got = vr._validate_station(name, df, cfg_station, vr.parse_dates(df))
+    assert got == _reference_errors(name, df, cfg_station)
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_load_raw_frames_reads_parses_and_validates(frames, config, tmp_path, monkeypatch, workers):
+    monkeypatch.setenv("PRECOMPUTE_WORKERS", workers)
+    for name, df in frames.items():
+        df.to_csv(tmp_path / f"{name}.csv", index=False)
+
+    loaded = vr.load_raw_frames(tmp_path, config)
+    assert sorted(loaded) == sorted(frames)
+    for name, df in loaded.items():
+        assert pd.api.types.is_datetime64_dtype(df["date"])
+        assert (df["date"].dt.strftime("%Y-%m-%d") == frames[name]["date"]).all()
+
+    # A corrupted file fails with the same aggregated message as the in-memory API.
+    bad = dict(frames)
+    a, b = list(bad)[:2]
+    bad[a] = frames[a].assign(temperature_max=99.9)
+    bad[b] = frames[b].drop(index=5)
+    for name in (a, b):
+        bad[name].to_csv(tmp_path / f"{name}.csv", index=False)
+    (tmp_path / f"{list(bad)[2]}.csv").unlink()
+    del bad[list(bad)[2]]
+    with pytest.raises(v.PipelineValidationError) as from_files:
+        vr.load_raw_frames(tmp_path, config)
+    reread = {name: pd.read_csv(tmp_path / f"{name}.csv") for name in bad}
+    with pytest.raises(v.PipelineValidationError) as in_memory:
+        vr.validate_raw_stations(reread, config)
+    assert str(from_files.value) == str(in_memory.value)
+
+
+# ── incremental validation ──────────────────────────────────────────────────────
+#
+# Past a watermark only the new rows and the seam are checked, but the outcome must be
+# the full-file one: a refresh is accepted, and any corruption — behind the watermark
+# or past it — fails with load_raw_frames' exact message.
+
+def _long_frames(frames, days):
+    """The valid frames stretched to `days` consecutive days."""
+    dates = pd.date_range(_START, periods=days).strftime("%Y-%m-%d")
+    return {name: pd.concat([df.iloc[:1]] * days, ignore_index=True)
+            .assign(date=dates, source=["era5"] * (days - 5) + ["era5t"] * 5)
+            for name, df in frames.items()}
+
+
+def test_watermark_checks_only_new_rows(frames, config, tmp_path, monkeypatch):
+    monkeypatch.setenv("PRECOMPUTE_WORKERS", "1")
+    raw, mark_file = tmp_path / "raw", tmp_path / "marks.json"
+    raw.mkdir()
+    for name, df in _long_frames(frames, 60).items():
+        df.to_csv(raw / f"{name}.csv", index=False)
+    n = len(frames)
+
+    assert vr.validate_raw_files(raw, config, mark_file) == (n, 0)
+    marks = json.loads(mark_file.read_text())
+    assert sorted(marks) == sorted(frames)
+    assert {m["last_date"] for m in marks.values()} == {"2000-02-14"}   # 60 days - 15
+    assert vr.validate_raw_files(raw, config, mark_file) == (n, n)
+
+    # A refresh: the trailing window is rewritten in place and new days appended.
+    name = _one(frames)
+    refreshed = _long_frames(frames, 75)[name]
+    refreshed.to_csv(raw / f"{name}.csv", index=False)
+    checked = []
+    real = vr._validate_station
+    monkeypatch.setattr(vr, "_validate_station",
+                        lambda *a: checked.append(len(a[1])) or real(*a))
+    assert vr.validate_raw_files(raw, config, mark_file) == (n, n)
+    assert max(checked) == 75 - 45                    # never a whole file
+    assert json.loads(mark_file.read_text())[name]["last_date"] == "2000-02-29"
+    monkeypatch.setattr(vr, "_validate_station", real)
+
+    def corrupt_and_compare(df):
+        df.to_csv(raw / f"{name}.csv", index=False)
+        with pytest.raises(v.PipelineValidationError) as incremental:
+            vr.validate_raw_files(raw, config, mark_file)
+        with pytest.raises(v.PipelineValidationError) as full:
+            vr.load_raw_frames(raw, config)
+        assert str(incremental.value) == str(full.value)
+        assert name not in json.loads(mark_file.read_text())
+
+    # Past the watermark: a bad value, then a gap right at the seam.
+    corrupt_and_compare(refreshed.assign(
+        temperature_max=refreshed["temperature_max"].where(refreshed.index != 70, 99.9)))
+    refreshed.to_csv(raw / f"{name}.csv", index=False)
+    vr.validate_raw_files(raw, config, mark_file)
+    corrupt_and_compare(refreshed.drop(index=60))
+    # Behind it: the prefix hash no longer matches, so the whole file is checked.
+    refreshed.to_csv(raw / f"{name}.csv", index=False)
+    vr.validate_raw_files(raw, config, mark_file)
+    corrupt_and_compare(refreshed.assign(
+        precipitation_sum=refreshed["precipitation_sum"].where(refreshed.index != 3, -1.0)))
+
+    # A different contract (here: si.yaml) invalidates every watermark.
+    refreshed.to_csv(raw / f"{name}.csv", index=False)
+    vr.validate_raw_files(raw, config, mark_file)
+    changed = {**config, "stations": [{**s, "lat": s["lat"] + 1e-9} for s in config["stations"]]}
+    assert vr.validate_raw_files(raw, changed, mark_file) == (n, 0)
+    # Without a watermark file every file is checked whole.
+    assert vr.validate_raw_files(raw, config) == (n, 0)
@@ -112,7 +112,7 @@ SPEI_CAT_COLOR = {
 TABLE_NAMES = [
     "stations", "daily", "daily_percentiles", "daily_window",
     "annual_trend", "annual_trend_windows", "season_heatmap", "tropical",
-    "spei", "spei_station",
+    "spei", "spei_station", "daily_window_national", "annual_trend_national",
 ]
 
 
@@ -404,6 +404,65 @@ def _schema_annual_trend_windows(station_names: list[str], max_year: int, dp_col
     )
 
 
+def _schema_daily_window_national(max_year: int, dp_columns) -> pa.DataFrameSchema:
+    # The Slovenija row per day-of-year, pooled from daily_window at build time: the
+    # cutoffs are read off the averaged curve, so they obey the same bounds and order.
+    cols = ["p5", "p10", "p20", "p50", "p80", "p95"]
+    year = pa.Check.in_range(DATA_START_YEAR, max_year)
+    specs = {
+        "month": pa.Column(int, pa.Check.in_range(1, 12), coerce=True),
+        "day": pa.Column(int, pa.Check.in_range(1, 31), coerce=True),
+        **{c: _TEMP for c in cols},
+        "n_samples": pa.Column(int, pa.Check.ge(50), coerce=True),
+        "station_count": pa.Column(int, pa.Check.ge(1), coerce=True),
+        "year_min": pa.Column(int, year, coerce=True),
+        "year_max": pa.Column(int, year, coerce=True),
+        "distribution_json": pa.Column(str, _json_parseable("distribution_json")),
+    }
+    return _strict_schema(
+        "daily_window_national", specs, dp_columns,
+        checks=[
+            _monotonic_nondecreasing(cols),
+            pa.Check(lambda df: df["year_min"] <= df["year_max"],
+                     error="year_min > year_max"),
+        ],
+        unique=["month", "day"],
+    )
+
+
+def _schema_annual_trend_national(max_year: int, dp_columns) -> pa.DataFrameSchema:
+    # Means of the annual_trend station rows. No n_years-span check: n_years is the
+    # longest station fit while year_min/year_max span all stations.
+    year = pa.Check.in_range(DATA_START_YEAR, max_year)
+    specs = {
+        "variable": pa.Column(str, pa.Check.isin(sorted(TREND_VARIABLES))),
+        "month": pa.Column(int, pa.Check.in_range(1, 12), coerce=True),
+        "day": pa.Column(int, pa.Check.in_range(1, 31), coerce=True),
+        "day_label": pa.Column(str),
+        "year_min": pa.Column(int, year, coerce=True),
+        "year_max": pa.Column(int, year, coerce=True),
+        "trend10": pa.Column(float, coerce=True),
+        "p_val": pa.Column(float, pa.Check.in_range(0.0, 1.0), coerce=True),
+        "tau": pa.Column(float, pa.Check.in_range(-1.0, 1.0), coerce=True),
+        "n_years": pa.Column(int, pa.Check.ge(10), coerce=True),
+        "proj_end_year": pa.Column(int, coerce=True),
+        "slope": pa.Column(float, coerce=True),
+        "intercept": pa.Column(float, coerce=True),
+        "slope_hi": pa.Column(float, coerce=True),
+        "intercept_hi": pa.Column(float, coerce=True),
+        "slope_lo": pa.Column(float, coerce=True),
+        "intercept_lo": pa.Column(float, coerce=True),
+        "scatter_json": pa.Column(str, _json_parseable("scatter_json")),
+        "station_count": pa.Column(int, pa.Check.ge(1), coerce=True),
+    }
+    return _strict_schema(
+        "annual_trend_national", specs, dp_columns,
+        checks=pa.Check(lambda df: df["year_min"] <= df["year_max"],
+                        error="year_min > year_max"),
+        unique=["variable", "month", "day"],
+    )
+
+
 def _schema_season_heatmap(station_names: list[str], max_year: int, dp_columns) -> pa.DataFrameSchema:
     specs = {
         "era5_name": pa.Column(str, pa.Check.isin(station_names)),
@@ -581,6 +640,16 @@ def _check_percentile_stations_subset(daily_percentiles: pd.DataFrame,
         if unknown else []
 
 
+def _check_national_station_count(national: pd.DataFrame, per_station: pd.DataFrame,
+                                  table: str) -> list[str]:
+    """Every national row must pool all the stations of its per-station source table;
+    fewer means a station's row for that day went missing before the pooling."""
+    expected = per_station["era5_name"].nunique()
+    bad = national[national["station_count"] != expected]
+    return [f"{table}: {len(bad)} row(s) pool fewer or more than the {expected} stations "
+            f"(station_count {sorted(set(bad['station_count']))})"] if len(bad) else []
+
+
 def _check_spei_consistency(spei: pd.DataFrame,
                             spei_station: pd.DataFrame | None) -> list[str]:
     """Tripwire for fabricated / degraded SPEI (D-16, T-5.1 part 4).
@@ -674,6 +743,8 @@ def validate_tables(tables: dict[str, pd.DataFrame], config: dict | None = None)
         "tropical": lambda: _schema_tropical(station_names, dp_columns),
         "spei": lambda: _schema_spei(max_year, dp_columns),
         "spei_station": lambda: _schema_spei_station(station_names, dp_columns),
+        "daily_window_national": lambda: _schema_daily_window_national(max_year, dp_columns),
+        "annual_trend_national": lambda: _schema_annual_trend_national(max_year, dp_columns),
     }
 
     for name, build in schemas.items():
@@ -710,6 +781,17 @@ def validate_tables(tables: dict[str, pd.DataFrame], config: dict | None = None)
     if "daily_percentiles" in tables and "stations" in tables:
         errors += _check_percentile_stations_subset(tables["daily_percentiles"],
                                                     tables["stations"])
+    if "daily_window_national" in tables:
+        errors += _check_doy_count(tables["daily_window_national"].assign(_all=0),
+                                   "daily_window_national", "_all")
+        if "daily_window" in tables:
+            errors += _check_national_station_count(tables["daily_window_national"],
+                                                    tables["daily_window"],
+                                                    "daily_window_national")
+    if "annual_trend_national" in tables and "annual_trend" in tables:
+        errors += _check_national_station_count(tables["annual_trend_national"],
+                                                tables["annual_trend"],
+                                                "annual_trend_national")
     if "spei" in tables:
         errors += _check_spei_consistency(tables["spei"], tables.get("spei_station"))
 
@@ -26,6 +26,9 @@ Run it:
 
 It reads every station listed in ``si.yaml`` from ``data/climate-si/data/raw/``
 (override the directory with RAW_DIR) and exits 0 if every file is valid, 1 otherwise.
+It keeps a per-station watermark in ``.validate_raw_watermark.json`` next to this
+script (override the path with RAW_WATERMARK; set it empty to always validate whole
+files) and checks only the rows past it — see "Incremental validation" below.
 
 Design notes
 ------------
@@ -39,14 +42,43 @@ Design notes
 * ``elevation_diff_m`` must be constant within a file and equal ``elevation_era5_m -
   elevation`` from ``si.yaml`` for that station — the same si.yaml the derived
   ``stations`` table is checked against (``validate._check_stations_match_config``).
+* Each station gets one vectorised pass (``_validate_station``) that decides whether
+  anything is wrong: NumPy range/null checks, continuity from int64 day numbers,
+  constant columns via min == max. Only a station that fails it goes through the
+  pandera schema and the ``_check_*`` functions, which word the errors — so the error
+  list is exactly theirs, and a valid file (every file, on a normal day) never pays for
+  pandera. ``load_raw_frames`` reads, parses and checks the files over a process pool
+  and hands the parsed frames on to ``precompute_datasette.load_all``.
+* Incremental validation (``main``): a refresh appends a fortnight to files that hold
+  75 years. A station's watermark records the sha256 of the file's bytes up to a row
+  boundary, the date of the row before it, and a hash of the checking contract (this
+  module, ``validate.py`` and the station's si.yaml entry). While the file still starts
+  with exactly those bytes under the same contract, only the rows after the boundary
+  are parsed and checked, plus the seam (the first of them is the day after the
+  watermark date). Any failure there — or a changed prefix, e.g. an ERA5T → ERA5
+  revision that reached behind the boundary — falls back to checking the whole file,
+  so the error list is always the full-file one. The boundary trails the file's last
+  date by ``WATERMARK_LAG_DAYS``, the window mk_collect rewrites, so a normal refresh
+  never moves bytes before it. ``load_raw_frames`` (the build gate) still checks
+  everything: it parses every row for precompute anyway. In CI the watermark file is
+  carried from run to run by an actions/cache entry per branch (the validate-raw-data
+  action); a watermark restored from another branch's files is safe, as its prefix
+  hash simply no longer matches.
 """
 
 from __future__ import annotations
 
+import concurrent.futures as _futures
+import functools
+import hashlib
+import io
+import json
 import os
 import sys
+import tempfile
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pandera.pandas as pa
 
@@ -82,6 +114,26 @@ RAW_COLUMNS = [
     "precipitation_sum", "et0_evapotranspiration", "source",
 ]
 
+# How far behind a file's last date a watermark is placed: mk_collect.REFRESH_WINDOW,
+# the trailing days each refresh may rewrite in place. Rows inside it are re-checked on
+# every run; rows before it are byte-stable and stay behind the watermark.
+WATERMARK_LAG_DAYS = 15
+
+# Inclusive [lo, hi] of every bounded numeric column — the same bounds the schema below
+# declares, for the vectorised pass. elevation_diff_m is unbounded (only non-null).
+RAW_BOUNDS = {
+    "latitude": (45.0, 47.0),
+    "longitude": (13.0, 17.0),
+    "elevation_station_m": (0, 3000),
+    "elevation_era5_m": (0.0, 3000.0),
+    "elevation_diff_m": (-np.inf, np.inf),
+    "temperature_max": (TEMP_MIN_C, TEMP_MAX_C),
+    "temperature_min": (TEMP_MIN_C, TEMP_MAX_C),
+    "temperature_mean": (TEMP_MIN_C, TEMP_MAX_C),
+    "precipitation_sum": (0.0, PRECIP_MAX_MM),
+    "et0_evapotranspiration": (0.0, ET0_MAX_MM),
+}
+
 
 # ── Schema ──────────────────────────────────────────────────────────────────────
 # strict=True: an unexpected or missing column is a schema change and must fail.
@@ -188,8 +240,104 @@ def _check_location(name: str, df: pd.DataFrame) -> list[str]:
     return []
 
 
+# ── Fused per-station pass ──────────────────────────────────────────────────────
+
+def parse_dates(df: pd.DataFrame) -> pd.Series:
+    """The date column as datetime64; NaT where it is not a YYYY-MM-DD date."""
+    return pd.to_datetime(df["date"], format="%Y-%m-%d", errors="coerce")
+
+
+def _schema_clean(df: pd.DataFrame, dates: pd.Series) -> bool:
+    """True when _schema_raw_station would accept df. Every condition the schema
+    checks is covered, so False only means "ask pandera"."""
+    if set(df.columns) != set(RAW_COLUMNS):
+        return False
+    for col in ("location", "date", "source"):
+        if pd.api.types.infer_dtype(df[col], skipna=False) != "string":
+            return False
+    if dates.isna().any() or not df["source"].isin(ALLOWED_SOURCES).all():
+        return False
+    values = {}
+    for col, (lo, hi) in RAW_BOUNDS.items():
+        s = df[col]
+        if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            return False
+        v = s.to_numpy(dtype=float)
+        # NaN fails both comparisons, so this also rejects nulls.
+        if not ((v >= lo) & (v <= hi)).all():
+            return False
+        values[col] = v
+    return bool(((values["temperature_max"] >= values["temperature_mean"])
+                 & (values["temperature_mean"] >= values["temperature_min"])).all())
+
+
+def _continuity_clean(dates: pd.Series) -> bool:
+    """True when _check_date_continuity would report nothing: consecutive days."""
+    if dates.isna().any():
+        return True   # unparseable dates are reported by the schema; it skips them too
+    if dates.empty:
+        return False
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    return bool((np.diff(days) == 1).all())
+
+
+def _validate_station(name: str, df: pd.DataFrame, cfg_station: dict,
+                      dates: pd.Series) -> list[str]:
+    """Every error for one station, in the order validate_raw_stations has always
+    listed them: schema failures, then continuity, elevation and location."""
+    errors: list[str] = []
+    if not _schema_clean(df, dates):
+        errors += _schema_errors(name, df)
+    if not _continuity_clean(dates):
+        errors += _check_date_continuity(name, df)
+    diffs = df["elevation_diff_m"]
+    expected = float(cfg_station["elevation_era5_m"] - cfg_station["elevation"])
+    if not pd.api.types.is_numeric_dtype(diffs) or diffs.empty:
+        errors += _check_elevation(name, df, cfg_station)
+    else:
+        v = diffs.to_numpy(dtype=float)
+        # np.min/np.max propagate NaN, so a NaN never passes as constant.
+        if not v.min() == v.max() or abs(v[0] - expected) > 1e-6:
+            errors += _check_elevation(name, df, cfg_station)
+    if df["location"].empty or not (df["location"] == name).all():
+        errors += _check_location(name, df)
+    return errors
+
+
+def _schema_errors(name: str, df: pd.DataFrame) -> list[str]:
+    errors: list[str] = []
+    try:
+        _schema_raw_station().validate(df, lazy=True)
+    except pa.errors.SchemaErrors as e:
+        for _, row in e.failure_cases.iterrows():
+            errors.append(
+                f"raw[{name}]: {row.get('check')} "
+                f"[col={row.get('column')}, value={row.get('failure_case')!r}]")
+    except pa.errors.SchemaError as e:
+        errors.append(f"raw[{name}]: {e}")
+    return errors
+
+
 # ── Orchestration ───────────────────────────────────────────────────────────────
 
+def _station_set_errors(got, config: dict) -> list[str]:
+    expected = {s["name"] for s in config["stations"]}
+    errors: list[str] = []
+    missing = sorted(expected - set(got))
+    if missing:
+        errors.append(f"missing raw station file(s): {missing}")
+    extra = sorted(set(got) - expected)
+    if extra:
+        errors.append(f"raw station file(s) not in si.yaml: {extra}")
+    return errors
+
+
+def _raise_if_any(errors: list[str]) -> None:
+    if errors:
+        raise PipelineValidationError(
+            f"{len(errors)} raw validation error(s):\n  - " + "\n  - ".join(errors))
+
+
 def validate_raw_stations(frames: dict[str, pd.DataFrame],
                           config: dict | None = None) -> None:
     """Validate every raw per-station frame. Raise PipelineValidationError on any
@@ -198,64 +346,187 @@ def validate_raw_stations(frames: dict[str, pd.DataFrame],
     if config is None:
         config = _load_config()
     cfg_by_name = {s["name"]: s for s in config["stations"]}
-    expected = set(cfg_by_name)
-    got = set(frames)
+    errors = _station_set_errors(frames, config)
+    for name in sorted(set(cfg_by_name) & set(frames)):
+        df = frames[name]
+        errors += _validate_station(name, df, cfg_by_name[name], parse_dates(df))
+    _raise_if_any(errors)
 
-    errors: list[str] = []
 
-    missing = sorted(expected - got)
-    if missing:
-        errors.append(f"missing raw station file(s): {missing}")
-    extra = sorted(got - expected)
-    if extra:
-        errors.append(f"raw station file(s) not in si.yaml: {extra}")
+def _worker_count(n_tasks: int) -> int:
+    """PRECOMPUTE_WORKERS (env) if set — validation runs inside precompute, under the
+    same pin — otherwise os.cpu_count(); capped at the task count, floored at 1."""
+    try:
+        n = int(os.environ.get("PRECOMPUTE_WORKERS") or os.cpu_count() or 1)
+    except ValueError:
+        n = 1
+    return max(1, min(n, n_tasks))
+
+
+def _load_station(path: Path, cfg_station: dict) -> tuple[pd.DataFrame, list[str]]:
+    """Read and validate one raw CSV. Returns the frame with `date` already parsed to
+    datetime64 (what load_all needs) and its errors. Runs in a pool worker."""
+    df = pd.read_csv(path)
+    dates = parse_dates(df)
+    errors = _validate_station(cfg_station["name"], df, cfg_station, dates)
+    df["date"] = dates
+    return df, errors
+
+
+def load_raw_frames(raw_dir: Path, config: dict) -> dict[str, pd.DataFrame]:
+    """Read, parse and validate every si.yaml station's raw CSV from raw_dir, fanned out
+    over a process pool. Raises PipelineValidationError listing every violation
+    (validate_raw_stations' list, in its order); otherwise returns station name ->
+    frame with `date` parsed, for precompute_datasette.load_all. A station whose file
+    is absent is reported as a missing-file error rather than crashing the load."""
+    stations = [s for s in config["stations"] if (raw_dir / f"{s['name']}.csv").exists()]
+    paths = [raw_dir / f"{s['name']}.csv" for s in stations]
+    n_workers = _worker_count(len(paths))
+    if n_workers <= 1:
+        results = [_load_station(p, s) for p, s in zip(paths, stations)]
+    else:
+        with _futures.ProcessPoolExecutor(max_workers=n_workers) as ex:
+            results = list(ex.map(_load_station, paths, stations))
+    frames = {s["name"]: df for s, (df, _) in zip(stations, results)}
+    station_errors = {s["name"]: errs for s, (_, errs) in zip(stations, results)}
+    errors = _station_set_errors(frames, config)
+    for name in sorted(frames):
+        errors += station_errors[name]
+    _raise_if_any(errors)
+    return frames
 
-    schema = _schema_raw_station()
-    for name in sorted(expected & got):
-        df = frames[name]
-        try:
-            schema.validate(df, lazy=True)
-        except pa.errors.SchemaErrors as e:
-            for _, row in e.failure_cases.iterrows():
-                errors.append(
-                    f"raw[{name}]: {row.get('check')} "
-                    f"[col={row.get('column')}, value={row.get('failure_case')!r}]")
-        except pa.errors.SchemaError as e:
-            errors.append(f"raw[{name}]: {e}")
-        # Structural checks run regardless of schema outcome so a file's problems are
-        # all reported at once (aggregate, don't stop at the first).
-        errors += _check_date_continuity(name, df)
-        errors += _check_elevation(name, df, cfg_by_name[name])
-        errors += _check_location(name, df)
 
+# ── Incremental validation ──────────────────────────────────────────────────────
+
+@functools.cache
+def _code_hash() -> str:
+    here = Path(__file__).parent
+    h = hashlib.sha256()
+    for f in ("validate_raw.py", "validate.py"):
+        h.update((here / f).read_bytes())
+    return h.hexdigest()
+
+
+def _contract(cfg_station: dict) -> str:
+    """What a watermark vouches under: the checking code and the station's si.yaml
+    entry. A change to either invalidates the station's watermark."""
+    entry = json.dumps(cfg_station, sort_keys=True, default=str)
+    return hashlib.sha256((_code_hash() + entry).encode()).hexdigest()
+
+
+def _watermark(data: bytes, start: int, dates: pd.Series,
+               contract: str) -> dict | None:
+    """A watermark over data, placed WATERMARK_LAG_DAYS before its last date. The
+    rows from byte `start` on have parsed `dates` (validated, so increasing); the
+    boundary is placed among them. None when no row is old enough, or when the
+    byte lines and the parsed rows do not line up (then never trust an offset)."""
+    lines = data[start:].split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()
+    if len(lines) != len(dates) or dates.empty:
+        return None
+    cut = dates.iloc[-1] - pd.Timedelta(WATERMARK_LAG_DAYS, unit="D")
+    k = int((dates <= cut).sum())
+    if k == 0:
+        return None
+    offset = start + sum(len(line) + 1 for line in lines[:k])
+    return {
+        "contract": contract,
+        "offset": offset,
+        "sha256": hashlib.sha256(data[:offset]).hexdigest(),
+        "last_date": dates.iloc[k - 1].strftime("%Y-%m-%d"),
+    }
+
+
+def _check_station(path: Path, cfg_station: dict,
+                   mark: dict | None) -> tuple[list[str], dict | None, bool]:
+    """Validate one raw CSV, past its watermark when the watermark still holds.
+    Returns (errors, new watermark or None, whether only the tail was checked).
+    Runs in a pool worker."""
+    name = cfg_station["name"]
+    data = path.read_bytes()
+    header_end = data.find(b"\n") + 1
+    contract = _contract(cfg_station)
+    if (mark and mark.get("contract") == contract
+            and header_end <= mark["offset"] <= len(data)
+            and hashlib.sha256(data[:mark["offset"]]).hexdigest() == mark["sha256"]):
+        tail = pd.read_csv(io.BytesIO(data[:header_end] + data[mark["offset"]:]))
+        dates = parse_dates(tail)
+        seam = pd.Timestamp(mark["last_date"]) + pd.Timedelta(1, unit="D")
+        if (not tail.empty and dates.iloc[0] == seam
+                and not _validate_station(name, tail, cfg_station, dates)):
+            new_mark = _watermark(data, mark["offset"], dates, contract)
+            return [], new_mark or mark, True
+    df = pd.read_csv(io.BytesIO(data))
+    dates = parse_dates(df)
+    errors = _validate_station(name, df, cfg_station, dates)
     if errors:
-        raise PipelineValidationError(
-            f"{len(errors)} raw validation error(s):\n  - " + "\n  - ".join(errors))
+        return errors, None, False
+    return [], _watermark(data, header_end, dates, contract), False
 
 
-def _load_raw_frames(raw_dir: Path, config: dict) -> dict[str, pd.DataFrame]:
-    """Read every si.yaml station's raw CSV from raw_dir. A station whose file is
-    absent is reported as a missing-file error rather than crashing the load."""
-    frames: dict[str, pd.DataFrame] = {}
-    for s in config["stations"]:
-        path = raw_dir / f"{s['name']}.csv"
-        if path.exists():
-            frames[s["name"]] = pd.read_csv(path)
-    return frames
+def _read_watermarks(path: Path | None) -> dict:
+    if path is None:
+        return {}
+    try:
+        marks = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return marks if isinstance(marks, dict) else {}
+
+
+def _write_watermarks(path: Path, marks: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(marks, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def validate_raw_files(raw_dir: Path, config: dict,
+                       watermark_path: Path | None = None) -> tuple[int, int]:
+    """Validate every si.yaml station's raw CSV in raw_dir, checking only the rows past
+    each station's watermark where it still holds (see the module docstring). Raises
+    PipelineValidationError with load_raw_frames' error list; otherwise returns
+    (files validated, files checked past their watermark only). The watermarks of
+    stations that pass are advanced and saved to watermark_path, also when others
+    fail; with watermark_path None every file is checked whole and nothing is saved."""
+    stations = [s for s in config["stations"] if (raw_dir / f"{s['name']}.csv").exists()]
+    paths = [raw_dir / f"{s['name']}.csv" for s in stations]
+    old_marks = _read_watermarks(watermark_path)
+    marks = [old_marks.get(s["name"]) for s in stations]
+    n_workers = _worker_count(len(paths))
+    if n_workers <= 1:
+        results = [_check_station(*args) for args in zip(paths, stations, marks)]
+    else:
+        with _futures.ProcessPoolExecutor(max_workers=n_workers) as ex:
+            results = list(ex.map(_check_station, paths, stations, marks))
+    by_name = {s["name"]: r for s, r in zip(stations, results)}
+    if watermark_path is not None:
+        _write_watermarks(watermark_path, {
+            name: mark for name, (_, mark, _) in sorted(by_name.items()) if mark})
+    errors = _station_set_errors(by_name, config)
+    for name in sorted(by_name):
+        errors += by_name[name][0]
+    _raise_if_any(errors)
+    return len(by_name), sum(tail_only for _, _, tail_only in results)
 
 
 def main() -> int:
     config = _load_config()
     raw_dir = Path(os.environ.get(
         "RAW_DIR", str(Path(__file__).parent.parent / "data" / "raw")))
+    watermark = os.environ.get(
+        "RAW_WATERMARK", str(Path(__file__).parent / ".validate_raw_watermark.json"))
     print(f"Validating raw station inputs in {raw_dir}")
-    frames = _load_raw_frames(raw_dir, config)
     try:
-        validate_raw_stations(frames, config)
+        n, n_tail = validate_raw_files(raw_dir, config,
+                                       Path(watermark) if watermark else None)
     except PipelineValidationError as e:
         print(f"\nFAIL — {e}", file=sys.stderr)
         return 1
-    print(f"OK — all {len(frames)} raw station file(s) valid.")
+    print(f"OK — all {n} raw station file(s) valid "
+          f"({n_tail} checked past their watermark only).")
     return 0
 
 
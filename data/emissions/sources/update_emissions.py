@@ -5,19 +5,34 @@
 
 import re
 import requests
+import concurrent.futures
+import functools
+import json
+import multiprocessing
+import operator
 import os
 import pandas as pd
 import glob
 import openpyxl as xl
 import sys
+import threading
 import hashlib
 import numpy as np
+import yaml
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 from datetime import datetime
 from scipy.interpolate import interp1d
 
 CONFIG_FILE = "./data/emissions/sources/update_emissions.config"
 INTERMEDIATE_LATEST = "./data/emissions/sources/emissions_historical_latest.xlsx"
+OUTPUTS_FILE = "./data/emissions/sources/emissions_outputs.yaml"
+MANIFEST_FILE = "./data/emissions/sources/update_emissions.manifest.json"
+TRANSPORT_LATEST = "./data/emissions/sources/Emisije_TGP_iz_cestnega_prometa.xlsx"
+TRANSPORT_CSV = "./data/emissions/data/emissions.historical.energy.transport.csv"
+PARIS_PROJECTIONS = "./data/emissions/sources/ProjekcijeGHG_Slovenija.xlsx"
+NEPN_PROJECTIONS = "./data/emissions/sources/energetska_bilanca_2050_nepn_dps.xlsx"
 
 # Lines that follow are data scraping part
 ###########################################
@@ -55,8 +70,8 @@ def get_newest_date(soup):
 
 
 # Function to retrieve xlsx files from a given URL
-def get_xlsx_files_from_url(url):
-    page = requests.get(url)
+def get_xlsx_files_from_url(session, url):
+    page = session.get(url)
     page.raise_for_status()
     soup = BeautifulSoup(page.content, "html.parser")
     em_elements = soup.find_all("em")
@@ -124,56 +139,97 @@ def count_files_in_directory(directory):
     return file_count
 
 
-# next two functions will read and write parameter vaules form/in a file
-# parameters and values are separated by = and each new parameter with a new line
+# next two functions read and write the parameter values of the config file
+# parameters and values are separated by = and each new parameter with a new line; the file is read once and written back whole
 
-def readConfig(parameter, filename):
+def read_config(filename=CONFIG_FILE):
     try:
         with open(filename, 'r') as file:
-            for line in file:
-                key, value = line.strip().split('=')
-                if key == parameter:
-                    return value
-        print(f"Parameter '{parameter}' not found.")
-        sys.exit(1)
+            return dict(line.strip().split('=', 1) for line in file if line.strip())
     except FileNotFoundError:
         print(f"File '{filename}' not found.")
         sys.exit(1)
 
 
-def writeConfig(parameter, value, filename):
-    try:
-        # Read all lines from the file
-        with open(filename, 'r') as file:
-            lines = file.readlines()
-
-        # Check if the parameter exists
-        parameter_exists = False
-        with open(filename, 'w') as file:
-            for line in lines:
-                key, _ = line.strip().split('=')
-                if key == parameter:
-                    line = f"{parameter}={value}\n"
-                    parameter_exists = True
-                file.write(line)
-
-            # If the parameter does not exist, append it to the file
-            if not parameter_exists:
-                file.write(f"{parameter}={value}\n")
-
-    except FileNotFoundError:
-        print(f"File '{filename}' not found.")
-        sys.exit(1)
+def write_config(config, filename=CONFIG_FILE):
+    with open(filename, 'w') as file:
+        for key, value in config.items():
+            file.write(f"{key}={value}\n")
 
 
 # first of the main functions which to download emission xlsx files
 ###################################################################
-def download_emission_xlsx_files():
-    # ODL URL
-    # BaseURL = "https://cdr.eionet.europa.eu/si/eu/mmr/art07_inventory/ghg_inventory/"
-    # URL below will beceome new ULR from 15.3.2024 on
-    BaseURL = "https://cdr.eionet.europa.eu/si/eu/govreg/inventory/"
-    page = requests.get(BaseURL)
+
+# ODL URL
+# BaseURL = "https://cdr.eionet.europa.eu/si/eu/mmr/art07_inventory/ghg_inventory/"
+# URL below will beceome new ULR from 15.3.2024 on
+# CDR_BASE_URL in the environment overrides it, e.g. with a local HTTP server serving a copy of the pages and files
+CDR_BASE_URL = os.environ.get("CDR_BASE_URL", "https://cdr.eionet.europa.eu/si/eu/govreg/inventory/")
+# size and ETag of every downloaded file, to tell a complete, current file from one that has to be fetched (again)
+DOWNLOADS_FILE = "./data/emissions/sources/downloads.json"
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_CHUNK = 1 << 20
+
+
+# one session for every request: its connections are reused, and failed requests retried with backoff
+def cdr_session():
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_maxsize=DOWNLOAD_WORKERS, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def read_downloads():
+    try:
+        with open(DOWNLOADS_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_downloads(downloads):
+    with open(DOWNLOADS_FILE + ".tmp", 'w') as file:
+        json.dump(downloads, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(DOWNLOADS_FILE + ".tmp", DOWNLOADS_FILE)
+
+
+# Download url to dest unless dest is already there with the size and ETag the server reports (known: its downloads entry)
+# the body is streamed to a hidden file next to the download directory and renamed into place once complete, so dest is
+# never a partial file and the directory only ever holds the xlsx files
+def download_file(session, url, dest, known):
+    head = session.head(url, allow_redirects=True)
+    head.raise_for_status()
+    size = head.headers.get("Content-Length")
+    etag = head.headers.get("ETag")
+    if (os.path.exists(dest) and size is not None and os.path.getsize(dest) == int(size)
+            and known.get("etag", etag) == etag):
+        print(f"    Already downloaded: {dest}")
+        return {"size": int(size), "etag": etag}
+
+    print(url)
+    directory, name = os.path.split(dest)
+    part = os.path.join(os.path.dirname(directory), f".{name}.part")
+    with session.get(url, stream=True) as r:
+        r.raise_for_status()
+        with open(part, 'wb') as file:
+            for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                file.write(chunk)
+        etag = r.headers.get("ETag", etag)
+    got = os.path.getsize(part)
+    if size is not None and got != int(size):
+        os.remove(part)
+        raise IOError(f"{url}: got {got} bytes, expected {size}")
+    os.replace(part, dest)
+    print(f"    Saved to: {dest}")
+    return {"size": os.path.getsize(dest), "etag": etag}
+
+
+def download_emission_xlsx_files(config):
+    session = cdr_session()
+    page = session.get(CDR_BASE_URL)
     page.raise_for_status()
     soupMain = BeautifulSoup(page.content, "html.parser")
 
@@ -187,663 +243,395 @@ def download_emission_xlsx_files():
     if newest_env_string:
         addToBaseURL = remove_last_forward_slash(newest_env_string)
 
-    new_env = readConfig("EU_LATEST_ENV", CONFIG_FILE)
-
     # check if the download was already performed
-    if new_env == addToBaseURL:
-        print(f"There were no new files uploaded on {BaseURL}, continuing with the rest of the data processes")
+    if config["EU_LATEST_ENV"] == addToBaseURL:
+        print(f"There were no new files uploaded on {CDR_BASE_URL}, continuing with the rest of the data processes")
 
-    # if it was not, download the files
+    # if it was not, download the files; an interrupted download resumes from the files that are complete, as the config
+    # only moves on to the new envelope once all of them are
     else:
 
         # Generate URLs for the target pages (page 1 to 3)
-        urls = [f"{BaseURL}{addToBaseURL}/index_html?&page={page_num}" for page_num in range(1, 4)]
+        urls = [f"{CDR_BASE_URL}{addToBaseURL}/index_html?&page={page_num}" for page_num in range(1, 4)]
 
         all_xlsx_files = []
         for url in urls:
-            xlsx_files = get_xlsx_files_from_url(url)
+            xlsx_files = get_xlsx_files_from_url(session, url)
             all_xlsx_files.extend(xlsx_files)
 
-        #  download emission xlsx files and print the results
-
-        for item in all_xlsx_files:
-            #   ******* change this line ********
-            new_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-            dest_dir = "./data/emissions/sources/" + newest_date
-            dest = os.path.join(dest_dir, item)
-
-            if new_date == newest_date:
-                print(f"    Already downloaded: {dest}")
-
-            else:
-                # calculating full URL
-                fullURL = BaseURL + addToBaseURL + "/" + item
-                print(fullURL)
-                r = requests.get(fullURL, allow_redirects=True)
-                r.raise_for_status()
-                # some spare parts for later
-                # ct = r.headers.get('content-type')
-                # if ct.lower() != "application/xlsx":
-                #     print(f"Unexpected content type '{ct}'.")
-                #     raise
-                print(f"    Saving to: {dest}")
-                directory = os.path.dirname(dest)
-                # print(f"temp directory is {directory}")
-                if not os.path.exists(directory):
-                    os.makedirs(directory, exist_ok=True)
-                open(dest, 'wb').write(r.content)
-        writeConfig("EU_LATEST_DATE", newest_date, CONFIG_FILE)
-        writeConfig("EU_LATEST_ENV", addToBaseURL, CONFIG_FILE)
-
-
-# function to touch a file if it does not exists
-def check_and_touch(file_path):
-    # Check if the file exists
-    if not os.path.exists(file_path):
-        # Touch the file (create a new file) if it does not exist
-        with open(file_path, 'a'):
-            pass  # 'pass' is just a placeholder since no action is needed
-
-
-# Lines that follow are for a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main scrip
-# method processes data for the files from the EU site above in an intermediate xlsx file used for other data processing later on
-def create_intermediate_xlsx():
-
-    if compute_sha1_checksum(INTERMEDIATE_LATEST) == readConfig("CHKSUM_LATEST_INTERMEDIATE", CONFIG_FILE):
-        print(f"{INTERMEDIATE_LATEST} already processed")
-    else:
-        inter_latest_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-        latest_dir = "./data/emissions/sources/" + inter_latest_date
-        counted_files = count_files_in_directory(latest_dir)
+        #  download emission xlsx files, DOWNLOAD_WORKERS at a time, and print the results
+        dest_dir = "./data/emissions/sources/" + newest_date
+        os.makedirs(dest_dir, exist_ok=True)
+        downloads = read_downloads()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = {}
+            for item in dict.fromkeys(all_xlsx_files):
+                dest = os.path.join(dest_dir, item)
+                futures[executor.submit(download_file, session, CDR_BASE_URL + addToBaseURL + "/" + item, dest,
+                                        downloads.get(dest, {}))] = dest
+            for future in concurrent.futures.as_completed(futures):
+                downloads[futures[future]] = future.result()
+                write_downloads(downloads)
+
+        config["EU_LATEST_DATE"] = newest_date
+        config["EU_LATEST_ENV"] = addToBaseURL
+        write_config(config)
+
+
+# Workbook cache shared by create_intermediate_xlsx, transport_historical and emissions_historical
+# every source xlsx is parsed once per run and only for the sheets that are used. Sheets are read with header=None,
+# so row r of a sheet is row r-1 of its DataFrame
+CRF_SHEETS = ("Table1.A(a)s3", "Summary2")
+workbook_cache = {}
+workbook_cache_lock = threading.Lock()
+
+
+def read_workbook(file_name, sheet_names):
+    return pd.read_excel(file_name, sheet_name=list(sheet_names), header=None)
+
+
+# Return {sheet name: DataFrame} for each of the files, parsing the ones that are not cached yet across a process pool
+# a file is cached under its modification time too, so a file rewritten during the run (the intermediate xlsx) is parsed again.
+# Stages run in threads: a file another stage is already parsing is waited for, not parsed twice
+def load_workbooks(file_names, sheet_names):
+    keys = [(file_name, os.stat(file_name).st_mtime_ns, tuple(sheet_names)) for file_name in file_names]
+    with workbook_cache_lock:
+        missing = [key for key in dict.fromkeys(keys) if key not in workbook_cache]
+        for key in missing:
+            workbook_cache[key] = concurrent.futures.Future()
+    try:
+        if len(missing) > 1:
+            # forkserver: the pool is started from a stage thread, and forking a multi-threaded process is unsafe
+            with concurrent.futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver")) as executor:
+                parsed = list(executor.map(read_workbook, [key[0] for key in missing], [key[2] for key in missing]))
+        else:
+            parsed = [read_workbook(key[0], key[2]) for key in missing]
+    except BaseException as error:
+        for key in missing:
+            workbook_cache[key].set_exception(error)
+        raise
+    for key, sheets in zip(missing, parsed):
+        workbook_cache[key].set_result(sheets)
+    return [workbook_cache[key].result() for key in keys]
 
-        y = 1
-        end_range = 1986 + counted_files
-        for year in range(1986, end_range):
-            print(year)
-            # Use a wildcard to match files with similar names
 
-            file_pattern = "./data/emissions/sources/" + inter_latest_date + "/SVN_" + inter_latest_date[:4] + "_{:04d}_*.xlsx".format(year)
+# years of the transport csv: the CRF files of latest_date up to two years before its release
+def transport_years(latest_date):
+    return np.arange(1986, int(latest_date[:4]) - 1)
 
-            # Use the glob module to find all files that match the pattern
-            files = glob.glob(file_pattern)
-            print(files)
-            # Loop through each file and read in the data using pandas
-            for file in files:
-                print(file)
-                wb1 = xl.load_workbook(file)
-                ws1 = wb1.worksheets[56]
 
-            print(ws1)
+# path of a year's CRF file in the download of latest_date; the last one if several match
+def crf_file(latest_date, year):
+    file_pattern = "./data/emissions/sources/" + latest_date + "/SVN_" + latest_date[:4] + "_{:04d}_*.xlsx".format(year)
+    return sorted(glob.glob(file_pattern))[-1]
 
-            # opening the destination excel file
 
-            wb2 = xl.load_workbook(INTERMEDIATE_LATEST)
-            ws2 = wb2.active
+# Lines that follow are for a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main scrip
+# method processes data for the files from the EU site above in an intermediate xlsx file used for other data processing later on
 
-            # calculate total number of rows and
-            # columns in source excel file
-            mr = ws1.max_row
-            # mc = ws1.max_column
+# the intermediate xlsx takes column J of every year's Summary2 sheet, from row 7 down
+CRF_SUMMARY_FIRST_ROW = 7
+CRF_SUMMARY_COLUMN = 10
 
-            # copying the cell values from source
-            # excel file to destination excel file
-            for i in range(1, mr + 1):
-                # reading cell value from source excel file
-                c = ws1.cell(row=6+i, column=10)
 
-                # writing the read value to destination excel file
-                # print(c.value)
-                if isinstance(c.value, (int, float)):
-                    ws2.cell(row=i+1, column=y+1).value = c.value
-                else:
-                    # Leave the cell empty
-                    ws2.cell(row=i+1, column=y+1).value = None
+# keep a number from a CRF cell, anything else ("NO", "NA", empty, ...) becomes empty
+def crf_number(value):
+    if isinstance(value, (int, float, np.number)) and not pd.isna(value):
+        return value
+    return None
 
-                # ws2.cell(row = i+1, column = y+1).value = c.value
 
-            # saving the destination excel file
+def create_intermediate_xlsx(config):
+    inter_latest_date = config["EU_LATEST_DATE"]
+    latest_dir = "./data/emissions/sources/" + inter_latest_date
+    counted_files = count_files_in_directory(latest_dir)
 
-            wb2.save(INTERMEDIATE_LATEST)
+    years = range(1986, 1986 + counted_files)
+    files = [crf_file(inter_latest_date, year) for year in years]
+    for year, file_name in zip(years, files):
+        print(year, file_name)
+    workbooks = load_workbooks(files, CRF_SHEETS)
 
-            y += 1
-            writeConfig("CHKSUM_LATEST_INTERMEDIATE", compute_sha1_checksum(INTERMEDIATE_LATEST), CONFIG_FILE)
+    # all years are written to the intermediate xlsx in one save
+    wb = xl.load_workbook(INTERMEDIATE_LATEST)
+    ws = wb.active
+    # row 1 holds the years and column A the labels; year y goes to column y+1 from row 2 down
+    for y, sheets in enumerate(workbooks, start=1):
+        column = sheets["Summary2"].iloc[CRF_SUMMARY_FIRST_ROW - 1:, CRF_SUMMARY_COLUMN - 1]
+        for i, value in enumerate(column, start=1):
+            ws.cell(row=i+1, column=y+1).value = crf_number(value)
+    wb.save(INTERMEDIATE_LATEST)
 
 
 # Next lines of code are a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main scrip
 # method processes data from the historical transport and the intermediate data, processed from the EU site and creates a csv
 
-def transport_historical():
-    TRANSPORT_LATEST = "./data/emissions/sources/Emisije_TGP_iz_cestnega_prometa.xlsx"
-
-    if compute_sha1_checksum(TRANSPORT_LATEST) == readConfig("CHKSUM_LATEST_TRANSPORT", CONFIG_FILE):
-        print(f"{TRANSPORT_LATEST} already processed")
-    else:
-        # inter_latest_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-        # latest_dir = "./data/emissions/sources/" + inter_latest_date
-        # counted_files = count_files_in_directory(latest_dir)
-
-        # global warming potential of gases
-        gwp = {"co2": 1,
-               "ch4": 25,
-               "n2o": 298,
-               "nox": 0.,
-               "co": 1.9,
-               "nmvoc": 3.4,
-               "so2": 0.,
-               "cfc_hfc": 1.}
-
-        inter_latest_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-
-        year_start = 1986
-        year_end = int(inter_latest_date[:4])-2
-        print(year_end)
-
-        years = np.arange(year_start, year_end+1)
-        n = years.shape[0]
-
-        transport__total = np.zeros(n)
-        transport__domestic_aviation = np.zeros(n)
-        transport__road_transporation = np.zeros(n)
-        transport__road_transporation__cars = np.zeros(n)
-        transport__road_transporation__light_duty_trucks = np.zeros(n)
-        transport__road_transporation__heavy_duty_trucks = np.zeros(n)
-        transport__road_transporation__buses = np.zeros(n)
-        # transport__road_transporation__heavy_duty_trucks_buses = np.zeros(n)
-        transport__road_transporation__motorcycles = np.zeros(n)
-        transport__road_transporation__other = np.zeros(n)
-        transport__railways = np.zeros(n)
-        transport__domestic_navigation = np.zeros(n)
-        transport__other_transportation = np.zeros(n)
-        transport__international_aviation = np.zeros(n)
-        transport__international_navigation = np.zeros(n)
-
-        def co2equiv(arr, gwp):
-            return arr[0]*gwp["co2"] + arr[1]*gwp["ch4"] + arr[2]*gwp["n2o"]
-
-        def check_matrix(arr):
-            if all([isinstance(x, str) for x in arr]):
-                return np.zeros(3)
-            else:
-                return arr
-
-        def check_val(x):
-            if isinstance(x, str):
-                return 0
-            else:
-                return x
-
-        i = 0
-        y = year_start
-        while y <= year_end:
-            print(y)
-            # manually loop through sheets
-            # original
-            # #file_name = glob.glob("./data/emissions/sources/20230414/SVN_{0:04d}_{1:04d}_*.xlsx".format(year_end, y))[0]
-            # file_name = glob.glob("./data/emissions/sources/20230414/SVN_{0:04d}_{1:04d}_*.xlsx".format(year_end, y))
-            # print (file_name)
-            # sys.exit(0)
-
-            inter_latest_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-            file_pattern = "./data/emissions/sources/" + inter_latest_date + "/SVN_" + inter_latest_date[:4] + "_{:04d}_*.xlsx".format(y)
-
-            # Use the glob module to find all files that match the pattern
-            file_name = glob.glob(file_pattern)[0]
-            print(file_name)
-
-            # Sectoral report for energy, sheet 1 + sheet2
-            df = pd.read_excel(file_name, sheet_name="Table1.A(a)s3")
-            matrix = df.to_numpy()[7:-2, -3:]
-
-            transport__total[i] = co2equiv(matrix[0], gwp)
-            transport__domestic_aviation[i] = co2equiv(matrix[6], gwp)
-            transport__road_transporation[i] = co2equiv(matrix[10], gwp)
-            transport__road_transporation__cars[i] = co2equiv(matrix[18], gwp)
-            transport__road_transporation__light_duty_trucks[i] = co2equiv(matrix[26], gwp)
-            # transport__road_transporation__heavy_duty_trucks_buses[i] = co2equiv(matrix[34], gwp)
-            transport__road_transporation__motorcycles[i] = co2equiv(matrix[42], gwp)
-            transport__road_transporation__other[i] = co2equiv(check_matrix(matrix[51]), gwp)
-            transport__railways[i] = co2equiv(matrix[52], gwp)
-            transport__domestic_navigation[i] = co2equiv(check_matrix(matrix[58]), gwp)
-            transport__other_transportation[i] = co2equiv(check_matrix(matrix[66]), gwp)
-
-            # add international aviation and navigation
-            df = pd.read_excel(file_name, sheet_name="Summary2")
-            matrix = df.to_numpy()
-
-            transport__international_aviation[i] = matrix[56, -1]
-            transport__international_navigation[i] = check_val(matrix[57, -1])
-
-            # Division between  heavy duty trucks and buses
-            file_name = glob.glob(TRANSPORT_LATEST)[0]
-            df = pd.read_excel(file_name)
-            matrix = df.to_numpy()[2:, 3:]
-
-            transport__road_transporation__heavy_duty_trucks[i] = co2equiv(matrix[::2, i], gwp)
-            transport__road_transporation__buses[i] = co2equiv(matrix[1::2, i], gwp)
-
-            y += 1
-            i += 1
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':     transport__total,
-                'road_transporation.total': transport__road_transporation,
-                'road_transporation.cars':    transport__road_transporation__cars,
-                "road_transporation.light_duty_trucks":    transport__road_transporation__light_duty_trucks,
-                'road_transporation.heavy_duty_trucks':     transport__road_transporation__heavy_duty_trucks,
-                'road_transporation.buses':     transport__road_transporation__buses,
-                'road_transporation.motorcycles': transport__road_transporation__motorcycles,
-                'road_transporation.other': transport__road_transporation__other,
-                'railways': transport__railways,
-                'domestic_aviation': transport__domestic_aviation,
-                'domestic_navigation': transport__domestic_navigation,
-                'other_transportation': transport__other_transportation,
-                'international_aviation': transport__international_aviation,
-                'international_navigation': transport__international_navigation
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.energy.transport.csv", index=False, float_format='%.2f')
-        writeConfig("CHKSUM_LATEST_TRANSPORT", compute_sha1_checksum(TRANSPORT_LATEST), CONFIG_FILE)
-
-
-# Next lines of code are a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main scrip
-# method processes data from the the intermediate data, processed from the EU site, and creates 6 csv-s
-
-def emissions_historical():
-    HISTORICAL_LATEST = "./data/emissions/sources/emissions_historical_latest.xlsx"
-    check_and_touch(HISTORICAL_LATEST)
-    if compute_sha1_checksum(HISTORICAL_LATEST) == readConfig("CHKSUM_LATEST_HISTORICAL", CONFIG_FILE):
-        print(f"{HISTORICAL_LATEST} already processed for historical csvs")
-    else:
-        df = pd.read_excel(INTERMEDIATE_LATEST, sheet_name="Sheet1")
-        emissions_historical = df.values[:, 1:]
-
-        # emission indices
-        ei = {"total_net": 0,
-              "energy": {
-                    "total": 1,
-                    "fuel_combustion_activities": {
-                            "total": 2,
-                            "energy_industries": 3,
-                            "manufacturing_construction": 4,
-                            "transport": 5,
-                            "other_sectors": 6,
-                            "other": 7
-                            },
-                    "fugitive_emissions_from_fuels": {
-                            "total": 8,
-                            "solid_fuels": 9,
-                            "oil_natural_gas_and_energy_production": 10
-                            },
-                    "co2_transport_storage": 11
-                    },
-              "industrial_processes": {
-                    "total": 12,
-                    "mineral_industry": 13,
-                    "chemical_industry": 14,
-                    "metal_industry": 15,
-                    "non_energy_products_from_fuels": 16,
-                    "electronic_industry": 17,
-                    "product_usese_as_ODS": 18,
-                    "other_product_manufacture_use": 19,
-                    "other": 20
-                    },
-              "agriculture": {
-                    "total": 21,
-                    "enteric_fermentation": 22,
-                    "manure_management": 23,
-                    "rice_cultivation": 24,
-                    "agricultural_soils": 25,
-                    "prescribed_burning_of_savannas": 26,
-                    "field_burning_agricultural_residues": 27,
-                    "liming": 28,
-                    "urea_application": 29,
-                    "carbon_containing_fertilizers": 30,
-                    "other": 31
-                    },
-              "lulucf": {
-                    "total": 32,
-                    "forest_land": 33,
-                    "cropland": 34,
-                    "grassland": 35,
-                    "wetlands": 36,
-                    "settlements": 37,
-                    "other_land": 38,
-                    "harvested_wood_prducts": 39,
-                    "other": 40
-                    },
-              "waste": {
-                    "total": 41,
-                    "solid_waste_disposal": 42,
-                    "biological_treatment_solid_waste": 43,
-                    "incineration_open_burning_waste": 44,
-                    "waste_water_treatment_discharge": 45,
-                    "other": 46
-                    },
-              "other": 47,
-              "international_bunkers": {
-                    "total": 50,
-                    "aviation": 51,
-                    "navigation": 52
-                    },
-              "multilateral_operations": 53,
-              "co2_emissions_from_biomass": 54,
-              "co2_captured": 55,
-              "longerim_storage_waste_disposal": 56,
-              "indirect_n20": 57,
-              "indirect_co2": 58,
-              "total_source": 59,
-              }
-
-        historical_latest_date = readConfig("EU_LATEST_DATE", CONFIG_FILE)
-
-        # not sure if this formula is OK
-        years = np.arange(1986, int(historical_latest_date[:4]) - 1)
-
-        print(df)
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total_source':                     emissions_historical[ei["total_source"]],
-                'energy_industries':                emissions_historical[ei["energy"]["fuel_combustion_activities"]["energy_industries"]],
-                'manufacturing_construction_fuels': emissions_historical[ei["energy"]["fuel_combustion_activities"]["manufacturing_construction"]],
-                'transport':                        emissions_historical[ei["energy"]["fuel_combustion_activities"]["transport"]],
-                "industrial_processes":             emissions_historical[ei["industrial_processes"]["total"]],
-                'residential_commercial_agricultural_forestry_fishing_fuels':  emissions_historical[ei["energy"]["fuel_combustion_activities"]["other_sectors"]],
-                'agriculture':                      emissions_historical[ei["agriculture"]["total"]],
-                'waste':                            emissions_historical[ei["waste"]["total"]],
-                "international_aviation":           emissions_historical[ei["international_bunkers"]["aviation"]],
-                "international_navigation":         emissions_historical[ei["international_bunkers"]["navigation"]],
-                'co2_emissions_from_biomass':       emissions_historical[ei["co2_emissions_from_biomass"]],
-                'others':                           emissions_historical[ei["energy"]["fuel_combustion_activities"]["other"]] + emissions_historical[ei["energy"]["fugitive_emissions_from_fuels"]["total"]],
-                'lulucf':                           emissions_historical[ei["lulucf"]["total"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':                                                                emissions_historical[ei["energy"]["total"]],
-                'fuel_combustion_activities.total':                                     emissions_historical[ei["energy"]["fuel_combustion_activities"]["total"]],
-                'fuel_combustion_activities.energy_industries':                         emissions_historical[ei["energy"]["fuel_combustion_activities"]["energy_industries"]],
-                'fuel_combustion_activities.manufacturing_construction':                emissions_historical[ei["energy"]["fuel_combustion_activities"]["manufacturing_construction"]],
-                'fuel_combustion_activities.transport':                                 emissions_historical[ei["energy"]["fuel_combustion_activities"]["transport"]],
-                'fuel_combustion_activities.other_sectors':                             emissions_historical[ei["energy"]["fuel_combustion_activities"]["other_sectors"]],
-                'fuel_combustion_activities.other':                                     emissions_historical[ei["energy"]["fuel_combustion_activities"]["other"]],
-                'fugitive_emissions_from_fuels.total':                                  emissions_historical[ei["energy"]["fugitive_emissions_from_fuels"]["total"]],
-                'fugitive_emissions_from_fuels.solid_fuels':                            emissions_historical[ei["energy"]["fugitive_emissions_from_fuels"]["solid_fuels"]],
-                'fugitive_emissions_from_fuels.oil_natural_gas_and_energy_production':  emissions_historical[ei["energy"]["fugitive_emissions_from_fuels"]["oil_natural_gas_and_energy_production"]],
-                'co2_transport_storage':                                                emissions_historical[ei["energy"]["co2_transport_storage"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.energy.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':                emissions_historical[ei["industrial_processes"]["total"]],
-                'mineral_industry': emissions_historical[ei["industrial_processes"]["mineral_industry"]],
-                'chemical_industry':    emissions_historical[ei["industrial_processes"]["chemical_industry"]],
-                'metal_industry':     emissions_historical[ei["industrial_processes"]["metal_industry"]],
-                'non_energy_products_from_fuels': emissions_historical[ei["industrial_processes"]["non_energy_products_from_fuels"]],
-                'electronic_industry': emissions_historical[ei["industrial_processes"]["electronic_industry"]],
-                'product_usese_as_ODS': emissions_historical[ei["industrial_processes"]["product_usese_as_ODS"]],
-                'other_product_manufacture_use': emissions_historical[ei["industrial_processes"]["other_product_manufacture_use"]],
-                'other': emissions_historical[ei["industrial_processes"]["other"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.industrial.processes.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':                emissions_historical[ei["agriculture"]["total"]],
-                'enteric_fermentation': emissions_historical[ei["agriculture"]["enteric_fermentation"]],
-                'manure_management':    emissions_historical[ei["agriculture"]["manure_management"]],
-                'rice_cultivation':     emissions_historical[ei["agriculture"]["rice_cultivation"]],
-                'agricultural_soils':     emissions_historical[ei["agriculture"]["agricultural_soils"]],
-                'prescribed_burning_of_savannas': emissions_historical[ei["agriculture"]["prescribed_burning_of_savannas"]],
-                'field_burning_agricultural_residues': emissions_historical[ei["agriculture"]["field_burning_agricultural_residues"]],
-                'liming': emissions_historical[ei["agriculture"]["liming"]],
-                'urea_application': emissions_historical[ei["agriculture"]["urea_application"]],
-                'carbon_containing_fertilizers': emissions_historical[ei["agriculture"]["carbon_containing_fertilizers"]],
-                'other':                emissions_historical[ei["agriculture"]["other"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.agriculture.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':                emissions_historical[ei["lulucf"]["total"]],
-                'forest_land': emissions_historical[ei["lulucf"]["forest_land"]],
-                'cropland':    emissions_historical[ei["lulucf"]["cropland"]],
-                "grassland":    emissions_historical[ei["lulucf"]["grassland"]],
-                'wetlands':     emissions_historical[ei["lulucf"]["wetlands"]],
-                'settlements': emissions_historical[ei["lulucf"]["settlements"]],
-                'other_land': emissions_historical[ei["lulucf"]["other_land"]],
-                'harvested_wood_prducts': emissions_historical[ei["lulucf"]["harvested_wood_prducts"]],
-                'other': emissions_historical[ei["lulucf"]["other"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.lulucf.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'total':                emissions_historical[ei["waste"]["total"]],
-                'solid_waste_disposal': emissions_historical[ei["waste"]["solid_waste_disposal"]],
-                'biological_treatment_solid_waste':    emissions_historical[ei["waste"]["biological_treatment_solid_waste"]],
-                'incineration_open_burning_waste':    emissions_historical[ei["waste"]["incineration_open_burning_waste"]],
-                "waste_water_treatment_discharge":    emissions_historical[ei["waste"]["waste_water_treatment_discharge"]],
-                'other':     emissions_historical[ei["waste"]["other"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.waste.csv", index=False, float_format='%.2f')
-
-        df = pd.DataFrame({
-                'year': years.astype(int),
-                'international_bunkers.total':      emissions_historical[ei["international_bunkers"]["total"]],
-                'international_bunkers.aviation':   emissions_historical[ei["international_bunkers"]["aviation"]],
-                'international_bunkers.navigation': emissions_historical[ei["international_bunkers"]["navigation"]],
-                'multilateral_operations':          emissions_historical[ei["multilateral_operations"]],
-                'co2_emissions_from_biomass':       emissions_historical[ei["co2_emissions_from_biomass"]],
-                'co2_captured':    emissions_historical[ei["co2_captured"]],
-                "longerim_storage_waste_disposal":    emissions_historical[ei["longerim_storage_waste_disposal"]],
-                "indirect_n20":    emissions_historical[ei["indirect_n20"]],
-                "indirect_co2":    emissions_historical[ei["indirect_co2"]]
-                })
-        df.to_csv("./data/emissions/data/emissions.historical.memo_items.csv", index=False, float_format='%.2f')
-
-        writeConfig("CHKSUM_LATEST_HISTORICAL", compute_sha1_checksum(HISTORICAL_LATEST), CONFIG_FILE)
-
-
-# Next lines of code are a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main script
-# method processes data from the the paris projections data and creates 1 csv
-def paris_projections():
-    PARIS_PROJECTIONS = "./data/emissions/sources/ProjekcijeGHG_Slovenija.xlsx"
-    if compute_sha1_checksum(PARIS_PROJECTIONS) == readConfig("CHKSUM_PARIS", CONFIG_FILE):
-        print(f"{PARIS_PROJECTIONS} already processed")
-    else:
-        years = np.arange(2020, 2031)
-        df = pd.read_excel(PARIS_PROJECTIONS)
-        matrix = df.to_numpy()
-        bau = matrix[:11, 3]
-        nepn = matrix[:11, 4]
-        # print (nepn)
-        # raise SystemExit(0)
-        ec = matrix[:11, 6]
-        paris20 = matrix[:11, 8]
-        paris15 = matrix[:11, 10]
-
-        df = pd.DataFrame({'year': years.astype(int),
-                           'bau': bau,
-                           'nepn': nepn,
-                           'ec': ec,
-                           'paris20': paris20,
-                           'paris15': paris15})
-        df.to_csv("./data/emissions/data/emissions.projections.ec_paris.csv", index=False, float_format="%.2f")
-        writeConfig("CHKSUM_PARIS", compute_sha1_checksum(PARIS_PROJECTIONS), CONFIG_FILE)
-
-
-# Next lines of code are a method made by Žiga Zaplotnik and adapted a bit by Kesma, to integrate it with other part of the main script
-# method processes data from the the NEPN projections data and creates 6 csvs
-def nepn_projections():
-    NEPN_PROJECTIONS = "./data/emissions/sources/energetska_bilanca_2050_nepn_dps.xlsx"
-    if compute_sha1_checksum(NEPN_PROJECTIONS) == readConfig("CHKSUM_NEPN", CONFIG_FILE):
-        print(f"{NEPN_PROJECTIONS} already processed")
-    else:
-        sp_years = np.arange(2020, 2051, 5)
-
-        df = pd.read_excel(NEPN_PROJECTIONS, sheet_name="EmisijeTGP")
-
-        # current measures
-        sp_emissions_projections_current = df.to_numpy()[23:44, 20:27]
-
-        # business as usual
-        sp_emissions_projections_bau = df.to_numpy()[23:44, 60:67]
-
-        # additional measures, nuclear
-        sp_emissions_projections_add_nuc = df.to_numpy()[23:44, 28:35]
-
-        # additional measures, synthetic
-        sp_emissions_projections_add_syn = df.to_numpy()[23:44, 36:43]
-
-        # ambitious additional measures, nuclear
-        sp_emissions_projections_ambadd_nuc = df.to_numpy()[23:44, 44:51]
-
-        # ambitious additional measures, synthetic
-        sp_emissions_projections_ambadd_syn = df.to_numpy()[23:44, 52:59]
-
-        # perform linear interpolation
-        years = np.arange(2020, 2051, 1)
-
-        fun_emissions_projections_current = interp1d(sp_years, sp_emissions_projections_current, axis=1)
-        emissions_projections_current = fun_emissions_projections_current(years)
-
-        fun_emissions_projections_bau = interp1d(sp_years, sp_emissions_projections_bau, axis=1)
-        emissions_projections_bau = fun_emissions_projections_bau(years)
-
-        fun_emissions_projections_add_nuc = interp1d(sp_years, sp_emissions_projections_add_nuc, axis=1)
-        emissions_projections_add_nuc = fun_emissions_projections_add_nuc(years)
-
-        fun_emissions_projections_add_syn = interp1d(sp_years, sp_emissions_projections_add_syn, axis=1)
-        emissions_projections_add_syn = fun_emissions_projections_add_syn(years)
-
-        fun_emissions_projections_ambadd_nuc = interp1d(sp_years, sp_emissions_projections_ambadd_nuc, axis=1)
-        emissions_projections_ambadd_nuc = fun_emissions_projections_ambadd_nuc(years)
-
-        fun_emissions_projections_ambadd_syn = interp1d(sp_years, sp_emissions_projections_ambadd_syn, axis=1)
-        emissions_projections_ambadd_syn = fun_emissions_projections_ambadd_syn(years)
-
-        # emission indices from file emissions_total.xlsx
-        ei = {"energy": {
-                    "total": 0,
-                    "fuel_combustion_activities": {
-                            "total": 1,
-                            "energy_industries": 2,
-                            "manufacturing_construction": 3,
-                            "transport": 4,
-                            "other_sectors": 5,
-                            "other": 6
-                            },
-                    "fugitive_emissions_from_fuels": {
-                            "total": 7,
-                            "solid_fuels": None,
-                            "oil_natural_gas_and_energy_production": None
-                            },
-                    "co2_transport_storage": None
-                    },
-              "industrial_processes": {
-                    "total": 8,
-                    "mineral_industry": None,
-                    "chemical_industry": None,
-                    "metal_industry": None,
-                    "non_energy_products_from_fuels": None,
-                    "electronic_industry": None,
-                    "product_usese_as_ODS": None,
-                    "other_product_manufacture_use": None,
-                    "other": None
-                    },
-              "agriculture": {
-                    "total": 9,
-                    "enteric_fermentation": None,
-                    "manure_management": None,
-                    "rice_cultivation": None,
-                    "agricultural_soils": None,
-                    "prescribed_burning_of_savannas": None,
-                    "field_burning_agricultural_residues": None,
-                    "liming": None,
-                    "urea_application": None,
-                    "carbon_containing_fertilizers": None,
-                    "other": None
-                    },
-              "lulucf": {
-                    "total": 10,
-                    "forest_land": 11,
-                    "cropland": 12,
-                    "grassland": 13,
-                    "wetlands": 14,
-                    "settlements": 15,
-                    "other_land": 16,
-                    "harvested_wood_prducts": 17,
-                    "other": None
-                    },
-              "waste": {
-                    "total": 18,
-                    "solid_waste_disposal": None,
-                    "biological_treatment_solid_waste": None,
-                    "incineration_open_burning_waste": None,
-                    "waste_water_treatment_discharge": None,
-                    "other": None
-                    },
-              "other": None,
-              "international_bunkers": {
-                    "total": None,
-                    "aviation": None,
-                    "navigation": None
-                    },
-              "multilateral_operations": None,
-              "co2_emissions_from_biomass": None,
-              "co2_captured": None,
-              "longerim_storage_waste_disposal": None,
-              "indirect_n20": None,
-              "indirect_co2": None,
-              "total_source": 19
-              }
-
-        # export data
-        def export_data(data, years, fnm):
-            df = pd.DataFrame({
-                    'year': years.astype(int),
-                    'total_source':                     data[ei["total_source"]],
-                    'energy_industries':                data[ei["energy"]["fuel_combustion_activities"]["energy_industries"]],
-                    'manufacturing_construction_fuels': data[ei["energy"]["fuel_combustion_activities"]["manufacturing_construction"]],
-                    'transport':                        data[ei["energy"]["fuel_combustion_activities"]["transport"]],
-                    "industrial_processes":             data[ei["industrial_processes"]["total"]],
-                    'residential_commercial_agricultural_forestry_fishing_fuels':  data[ei["energy"]["fuel_combustion_activities"]["other_sectors"]],
-                    'agriculture':                      data[ei["agriculture"]["total"]],
-                    'waste':                            data[ei["waste"]["total"]],
-                    'others':                           data[ei["energy"]["fuel_combustion_activities"]["other"]] + data[ei["energy"]["fugitive_emissions_from_fuels"]["total"]],
-                    'lulucf':                           data[ei["lulucf"]["total"]]
-                    })
-            df.to_csv(fnm, index=False, float_format='%.2f')
-
-        export_data(emissions_projections_current, years, "./data/emissions/data/emissions.projections.current.csv")
-        export_data(emissions_projections_bau, years, "./data/emissions/data/emissions.projections.bau.csv")
-        export_data(emissions_projections_add_nuc, years, "./data/emissions/data/emissions.projections.additional_nuclear.csv")
-        export_data(emissions_projections_add_syn, years, "./data/emissions/data/emissions.projections.additional_synthetic.csv")
-        export_data(emissions_projections_ambadd_nuc, years, "./data/emissions/data/emissions.projections.ambitious_additional_nuclear.csv")
-        export_data(emissions_projections_ambadd_syn, years, "./data/emissions/data/emissions.projections.ambitious_additional_synthetic.csv")
-
-        writeConfig("CHKSUM_NEPN", compute_sha1_checksum(NEPN_PROJECTIONS), CONFIG_FILE)
+def transport_historical(config):
+    # global warming potential of gases
+    gwp = {"co2": 1,
+           "ch4": 25,
+           "n2o": 298,
+           "nox": 0.,
+           "co": 1.9,
+           "nmvoc": 3.4,
+           "so2": 0.,
+           "cfc_hfc": 1.}
+
+    inter_latest_date = config["EU_LATEST_DATE"]
+
+    years = transport_years(inter_latest_date)
+    print(years[-1])
+    n = years.shape[0]
+
+    transport__total = np.zeros(n)
+    transport__domestic_aviation = np.zeros(n)
+    transport__road_transporation = np.zeros(n)
+    transport__road_transporation__cars = np.zeros(n)
+    transport__road_transporation__light_duty_trucks = np.zeros(n)
+    transport__road_transporation__heavy_duty_trucks = np.zeros(n)
+    transport__road_transporation__buses = np.zeros(n)
+    # transport__road_transporation__heavy_duty_trucks_buses = np.zeros(n)
+    transport__road_transporation__motorcycles = np.zeros(n)
+    transport__road_transporation__other = np.zeros(n)
+    transport__railways = np.zeros(n)
+    transport__domestic_navigation = np.zeros(n)
+    transport__other_transportation = np.zeros(n)
+    transport__international_aviation = np.zeros(n)
+    transport__international_navigation = np.zeros(n)
+
+    def co2equiv(arr, gwp):
+        return arr[0]*gwp["co2"] + arr[1]*gwp["ch4"] + arr[2]*gwp["n2o"]
+
+    def check_matrix(arr):
+        if all([isinstance(x, str) for x in arr]):
+            return np.zeros(3)
+        else:
+            return arr
+
+    def check_val(x):
+        if isinstance(x, str):
+            return 0
+        else:
+            return x
+
+    files = [crf_file(inter_latest_date, y) for y in years]
+    workbooks = load_workbooks(files, CRF_SHEETS)
+
+    # Division between  heavy duty trucks and buses, one column per year
+    transport = load_workbooks([TRANSPORT_LATEST], [0])[0][0]
+    road_matrix = transport.to_numpy()[3:, 3:]
+
+    for i, (y, file_name, sheets) in enumerate(zip(years, files, workbooks)):
+        print(y)
+        print(file_name)
+
+        # Sectoral report for energy, sheet 1 + sheet2
+        matrix = sheets["Table1.A(a)s3"].to_numpy()[8:-2, -3:]
+
+        transport__total[i] = co2equiv(matrix[0], gwp)
+        transport__domestic_aviation[i] = co2equiv(matrix[6], gwp)
+        transport__road_transporation[i] = co2equiv(matrix[10], gwp)
+        transport__road_transporation__cars[i] = co2equiv(matrix[18], gwp)
+        transport__road_transporation__light_duty_trucks[i] = co2equiv(matrix[26], gwp)
+        # transport__road_transporation__heavy_duty_trucks_buses[i] = co2equiv(matrix[34], gwp)
+        transport__road_transporation__motorcycles[i] = co2equiv(matrix[42], gwp)
+        transport__road_transporation__other[i] = co2equiv(check_matrix(matrix[51]), gwp)
+        transport__railways[i] = co2equiv(matrix[52], gwp)
+        transport__domestic_navigation[i] = co2equiv(check_matrix(matrix[58]), gwp)
+        transport__other_transportation[i] = co2equiv(check_matrix(matrix[66]), gwp)
+
+        # add international aviation and navigation
+        matrix = sheets["Summary2"].to_numpy()
+
+        transport__international_aviation[i] = matrix[57, -1]
+        transport__international_navigation[i] = check_val(matrix[58, -1])
+
+        transport__road_transporation__heavy_duty_trucks[i] = co2equiv(road_matrix[::2, i], gwp)
+        transport__road_transporation__buses[i] = co2equiv(road_matrix[1::2, i], gwp)
+
+    df = pd.DataFrame({
+            'year': years.astype(int),
+            'total':     transport__total,
+            'road_transporation.total': transport__road_transporation,
+            'road_transporation.cars':    transport__road_transporation__cars,
+            "road_transporation.light_duty_trucks":    transport__road_transporation__light_duty_trucks,
+            'road_transporation.heavy_duty_trucks':     transport__road_transporation__heavy_duty_trucks,
+            'road_transporation.buses':     transport__road_transporation__buses,
+            'road_transporation.motorcycles': transport__road_transporation__motorcycles,
+            'road_transporation.other': transport__road_transporation__other,
+            'railways': transport__railways,
+            'domestic_aviation': transport__domestic_aviation,
+            'domestic_navigation': transport__domestic_navigation,
+            'other_transportation': transport__other_transportation,
+            'international_aviation': transport__international_aviation,
+            'international_navigation': transport__international_navigation
+            })
+    df.to_csv(TRANSPORT_CSV, index=False, float_format='%.2f')
+
+
+# Declarative outputs: emissions_outputs.yaml maps every CSV column to a series of a workbook range (see the file for the format)
+# the methods below, originally made by Žiga Zaplotnik and adapted by Kesma, now only decide when to regenerate the CSVs of their source file
+
+
+# "AA45" -> (44, 26), 0-based row and column of an A1 cell reference
+def a1_cell(ref):
+    letters, digits = re.fullmatch(r"([A-Z]+)(\d+)", ref).groups()
+    column = 0
+    for letter in letters:
+        column = column * 26 + ord(letter) - ord("A") + 1
+    return int(digits) - 1, column - 1
+
+
+# Return (years, values) of a source: values[k] is the series at position k of its index, one value per year
+def source_view(grid, source):
+    first, _, last = source["range"].partition(":")
+    row0, col0 = a1_cell(first)
+    row1, col1 = a1_cell(last) if last else (grid.shape[0] - 1, grid.shape[1] - 1)
+    values = grid.to_numpy()
+    if source.get("header"):
+        # values under the header row are typed per column, as pd.read_excel reads a sheet with a header
+        values = pd.DataFrame(values[1:]).infer_objects().to_numpy()
+        row0, row1 = row0 - 1, row1 - 1
+    values = values[row0:row1 + 1, col0:col1 + 1]
+    if source["series"] == "columns":
+        values = values.T
+    step = source["years"].get("step", 1)
+    sheet_years = source["years"]["first"] + step * np.arange(values.shape[1])
+    if step == 1:
+        return sheet_years, values
+    years = np.arange(sheet_years[0], sheet_years[-1] + 1)
+    return years, interp1d(sheet_years, values, axis=1)(years)
+
+
+# Write every CSV of emissions_outputs.yaml whose source is read from file_name; each workbook is parsed once for all of them
+def write_outputs(file_name):
+    with open(OUTPUTS_FILE) as file:
+        mapping = yaml.safe_load(file)
+    sources = {name: source for name, source in mapping["sources"].items() if source["file"] == file_name}
+    sheets = load_workbooks([file_name], list(dict.fromkeys(source["sheet"] for source in sources.values())))[0]
+    views = {name: source_view(sheets[source["sheet"]], source) for name, source in sources.items()}
+
+    for csv_file, output in mapping["outputs"].items():
+        if output["source"] not in sources:
+            continue
+        years, values = views[output["source"]]
+        index = sources[output["source"]]["index"]
+        columns = {"year": years.astype(int)}
+        for column, paths in output["columns"].items():
+            paths = [paths] if isinstance(paths, str) else paths
+            series = [values[functools.reduce(lambda node, key: node[key], path.split("."), index)] for path in paths]
+            columns[column] = functools.reduce(operator.add, series)
+        print(f"    Writing {csv_file}")
+        pd.DataFrame(columns).to_csv(csv_file, index=False, float_format='%.2f')
+
+
+# CSVs from the the intermediate data, processed from the EU site
+def emissions_historical(config):
+    write_outputs(INTERMEDIATE_LATEST)
+
+
+# CSV from the the paris projections data
+def paris_projections(config):
+    write_outputs(PARIS_PROJECTIONS)
+
+
+# CSVs from the the NEPN projections data
+def nepn_projections(config):
+    write_outputs(NEPN_PROJECTIONS)
+
+
+# Build graph
+#############
+# Every stage declares the files it reads and writes. MANIFEST_FILE records per stage the SHA-1 of each of them after its
+# last successful run; a stage reruns only when one of them differs now (an input changed, a different set of CRF files
+# is used, an output was edited or removed), and only after the stages that produce its inputs.
+# Stages that do not depend on each other run in parallel.
+
+# CSVs of emissions_outputs.yaml whose source is read from file_name
+def mapped_outputs(file_name):
+    with open(OUTPUTS_FILE) as file:
+        mapping = yaml.safe_load(file)
+    return [csv_file for csv_file, output in mapping["outputs"].items() if mapping["sources"][output["source"]]["file"] == file_name]
+
+
+# stages in dependency order: a stage comes after the stages producing its inputs
+def emission_stages(config):
+    latest_date = config["EU_LATEST_DATE"]
+    crf_years = range(1986, 1986 + count_files_in_directory("./data/emissions/sources/" + latest_date))
+    return {
+        "intermediate": {"run": create_intermediate_xlsx,
+                         "inputs": [crf_file(latest_date, year) for year in crf_years],
+                         "outputs": [INTERMEDIATE_LATEST]},
+        "transport": {"run": transport_historical,
+                      "inputs": [crf_file(latest_date, year) for year in transport_years(latest_date)] + [TRANSPORT_LATEST],
+                      "outputs": [TRANSPORT_CSV]},
+        "historical": {"run": emissions_historical,
+                       "inputs": [INTERMEDIATE_LATEST, OUTPUTS_FILE],
+                       "outputs": mapped_outputs(INTERMEDIATE_LATEST)},
+        "paris": {"run": paris_projections,
+                  "inputs": [PARIS_PROJECTIONS, OUTPUTS_FILE],
+                  "outputs": mapped_outputs(PARIS_PROJECTIONS)},
+        "nepn": {"run": nepn_projections,
+                 "inputs": [NEPN_PROJECTIONS, OUTPUTS_FILE],
+                 "outputs": mapped_outputs(NEPN_PROJECTIONS)},
+    }
+
+
+def file_hashes(paths):
+    return {path: compute_sha1_checksum(path) if os.path.exists(path) else None for path in paths}
+
+
+def read_manifest():
+    try:
+        with open(MANIFEST_FILE) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(manifest):
+    with open(MANIFEST_FILE + ".tmp", 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+
+
+# Run the stale stages; the manifest is saved after every stage, so a failed run keeps what it finished
+def run_stages(stages, config):
+    manifest = read_manifest()
+    manifest_lock = threading.Lock()
+    producers = {path: name for name, stage in stages.items() for path in stage["outputs"]}
+
+    def run_stage(name, dependencies):
+        for dependency in dependencies:
+            dependency.result()
+        stage = stages[name]
+        state = {"inputs": file_hashes(stage["inputs"]), "outputs": file_hashes(stage["outputs"])}
+        if manifest.get(name) == state:
+            print(f"{name}: up to date")
+            return
+        print(f"{name}: running")
+        stage["run"](config)
+        state["outputs"] = file_hashes(stage["outputs"])
+        with manifest_lock:
+            manifest[name] = state
+            write_manifest(manifest)
+
+    futures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stages)) as executor:
+        for name, stage in stages.items():
+            dependencies = [futures[producers[path]] for path in stage["inputs"] if producers.get(path, name) != name]
+            futures[name] = executor.submit(run_stage, name, dependencies)
+    for future in futures.values():
+        future.result()
 
 
 # main
 if __name__ == "__main__":
-    # Download emission xlsx files
-    download_emission_xlsx_files()
-
-    # Create intermediate xlsx
-    create_intermediate_xlsx()
-
-    # process transport emissions waiting for the
-    transport_historical()
+    config = read_config()
 
-    # process historical emissions
-    emissions_historical()
-
-    # process paris projections
-    paris_projections()
+    # Download emission xlsx files
+    download_emission_xlsx_files(config)
 
-    # process NEPN projections
-    nepn_projections()
+    # Create the intermediate xlsx and the csvs from it and from the transport, paris and NEPN sources, where stale
+    run_stages(emission_stages(config), config)
@@ -1,4 +1,7 @@
 #!/usr/bin/env python3
+import concurrent.futures
+import multiprocessing
+
 import numpy as np
 import pandas as pd
 from netCDF4 import Dataset
@@ -18,86 +21,121 @@ var_column = {
 # create grid
 ln = np.arange(0, 360.1, 0.25)
 lt = np.arange(-90, 90.1, 0.25)
-lons, lats = np.meshgrid(ln, lt)
-dim = lons.shape[0] * lons.shape[1]
 
-# full dataframe placeholder
-full_df = None
+# region of interest, in the output grid: the points strictly inside it, latitude by latitude and each latitude in the
+# order of ln (0..65, then -15..0 for 345..360)
+lon_wrapped = np.where(ln > 180, ln - 360, ln)
+lons_out = lon_wrapped[(lon_wrapped > -15) & (lon_wrapped < 65)]
+lats_out = lt[(lt > 20) & (lt < 75)]
+# the spline is fitted to the model grid around the region only; this many model grid points on each side keep the
+# boundary of the fit away from the values it is evaluated at
+MARGIN = 10
+
+# 10-year running means: the mean centred at time step i covers i-5..i+4, as pandas rolling(10, center=True)
+WINDOW_BEFORE = 5
+WINDOW_AFTER = 4
+
+KEYS = ['year_start', 'latitude', 'longitude']
+OUTPUT = "../data/temperature.climate_models.map_running_10year_average.csv"
+
 
-# loop over variables
-for var in var_all:
+def model_file(var):
     # load CMIP6 ensmean data 1850-2099 ensmean was obtained from anomalous tas from CMIP6 models and then ERA5 1981-2010 climatology was added on top
     if "25" in var or "75" in var:
-        file = Dataset("climate_models/ensmean_perc25_perc75_18502099.nc", "r")
-    else:
-        file = Dataset("climate_models/ensmean_perc10_perc90_one_per_centre_18502099.nc", "r")
+        return Dataset("climate_models/ensmean_perc25_perc75_18502099.nc", "r")
+    return Dataset("climate_models/ensmean_perc10_perc90_one_per_centre_18502099.nc", "r")
+
+
+def read_region(file, var):
+    """The variable over the region and its margin, as (time, lat, lon) in °C with the longitudes in -180..180
+    increasing; only this window is read from the file."""
+    lons_surf = np.asarray(file.variables["lon"][:])
+    lats_surf = np.asarray(file.variables["lat"][:])
+
+    lat_lo = max(np.searchsorted(lats_surf, lats_out[0]) - MARGIN, 0)
+    lat_hi = min(np.searchsorted(lats_surf, lats_out[-1], side="right") + MARGIN, len(lats_surf))
+    # the region crosses the 0° meridian: its western part is the end of the 0..360 longitudes
+    west = np.searchsorted(lons_surf, lons_out.min() + 360) - MARGIN
+    east = np.searchsorted(lons_surf, lons_out.max(), side="right") + MARGIN
+
+    variable = file.variables[var]
+    t2m = np.concatenate([
+        np.ma.filled(variable[:, lat_lo:lat_hi, west:], np.nan),
+        np.ma.filled(variable[:, lat_lo:lat_hi, :east], np.nan),
+    ], axis=2)
+    lons = np.concatenate([lons_surf[west:] - 360, lons_surf[:east]])
+
+    # transform from kelvin to celsius scale
+    return t2m - 273.15, lons, lats_surf[lat_lo:lat_hi]
+
+
+def running_means(t2m, centres):
+    """10-year running means at the given time steps, from cumulative sums along time; a window cut short by the
+    start or end of the series (or holding missing values) averages the values it has."""
+    valid = np.isfinite(t2m)
+    sums = np.cumsum(np.where(valid, t2m, 0), axis=0, dtype=np.float64)
+    counts = np.cumsum(valid, axis=0)
+    sums = np.concatenate([np.zeros((1, *sums.shape[1:])), sums])
+    counts = np.concatenate([np.zeros((1, *counts.shape[1:]), dtype=counts.dtype), counts])
 
-    # read data
-    t2m = file.variables[var][:]
-    lons_surf = file.variables["lon"][:]
-    lats_surf = file.variables["lat"][:]
-
-    # merge data and transform from kelvin to celsius scale
-    t2m = t2m - 273.15
     n = t2m.shape[0]
+    lo = np.maximum(centres - WINDOW_BEFORE, 0)
+    hi = np.minimum(centres + WINDOW_AFTER, n - 1) + 1
+    with np.errstate(invalid="ignore"):
+        return (sums[hi] - sums[lo]) / (counts[hi] - counts[lo])
+
 
-    # compute 10-year running means
-    data = np.reshape(t2m, (len(t2m[:, 0, 0]), len(t2m[0, :, 0]) * len(t2m[0, 0, :])))  # reshape 4D to 2D data
-    df = pd.DataFrame(data)  # get dataframe
-    data = df.rolling(window=10, min_periods=1, axis=0,
-                      center=True).mean().iloc[:, :].values  # running mean
-    data_10yrt = np.reshape(data, (len(t2m[:, 0, 0]), len(t2m[0, :, 0]), len(t2m[0, 0, :])))  # 2D data back to 4D data
-
-    # variable dataframe placeholder
-    var_df = None
-
-    # loop over averages
-    for i in range(6, n+5, 10):
-        year_min = 1850 + i - 6
-        year_max = 1850 + i - 6 + 9
-        print("Year: ", year_min, "-", year_max)
-
-        # perform interpolation
-        xx = np.arange(0, 360, 0.25)
-        yy = np.arange(-90., 90.1, 0.25)
-
-        tint = RectBivariateSpline(lons_surf, lats_surf, data_10yrt[i].T)
-        t2m_int = tint(xx, yy).T
-        data = t2m_int[:]
-        X = data[:, 0]
-        X = np.reshape(X, (X.size, 1))
-        data = np.concatenate((data[:, :], X), axis=1)
-
-        # dictionary of lists
-        data_dict = {'year_start': np.full((dim,), year_min), 'year_end': np.full((dim,), year_max), 'latitude': lats.flatten(), 'longitude': lons.flatten(), 'temperature': data.flatten()}
-
-        # create dataframe
-        df = pd.DataFrame(data_dict)
-        df['longitude'] = np.where(df['longitude'] > 180, df['longitude'] - 360, df['longitude'])
-        # filter out data outside of the region of interest
-        df = df[(df.longitude > -15) & (df.longitude < 65) &
-                (df.latitude > 20) & (df.latitude < 75)]
-
-        # append to variable dataframe
-        if var_df is None:
-            var_df = df
-        else:
-            var_df = pd.concat([var_df, df])
-
-    # rename columns
-    var_df.rename(columns={'temperature': var_column[var]}, inplace=True)
-
-    # append to full dataframe
-    if full_df is None:
-        full_df = var_df
-    else:
-        full_df[var_column[var]] = var_df[var_column[var]]
-
-# round
-rounding = 2
-full_df = full_df.round({'temperature_ensemble_mean': rounding, 'temperature_percentile_10': rounding, 'temperature_percentile_25': rounding, 'temperature_percentile_75': rounding, 'temperature_percentile_90': rounding})
-
-# print and save
-print(full_df)
-print(full_df.dtypes)
-full_df.to_csv("../data/temperature.climate_models.map_running_10year_average.csv", index=False)
+def variable_table(var):
+    """10-year running means of one variable at every point of the region, one row per (year_start, latitude,
+    longitude)."""
+    file = model_file(var)
+    t2m, lons_surf, lats_surf = read_region(file, var)
+    file.close()
+
+    # periods: 1850-1859, 1860-1869, ... centred on steps 6, 16, ...
+    n = t2m.shape[0]
+    centres = np.arange(6, n + 5, 10)
+    years = 1850 + centres - 6
+    data_10yrt = running_means(t2m, centres)
+
+    # perform interpolation, one period at a time; 0° appears twice in lons_out (0 and 360), once here
+    lons_eval = np.unique(lons_out)
+    values = np.empty((len(years), len(lats_out), len(lons_eval)))
+    for k, year_min in enumerate(years):
+        print(var, "year: ", year_min, "-", year_min + 9)
+        tint = RectBivariateSpline(lons_surf, lats_surf, data_10yrt[k].T)
+        values[k] = tint(lons_eval, lats_out).T
+
+    index = pd.MultiIndex.from_product([years, lats_out, lons_eval], names=KEYS)
+    return pd.DataFrame({var_column[var]: values.ravel()}, index=index)
+
+
+def main():
+    # each variable in its own process; they share nothing but the files they read
+    context = multiprocessing.get_context("forkserver")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(var_all), mp_context=context) as executor:
+        tables = list(executor.map(variable_table, var_all))
+
+    # output rows: one per period and point of the region, latitude by latitude in the order of lons_out
+    lons_grid, lats_grid = np.meshgrid(lons_out, lats_out)
+    points = pd.DataFrame({'latitude': lats_grid.ravel(), 'longitude': lons_grid.ravel()})
+
+    # join the variables on their keys, round and save, one period at a time
+    rounding = 2
+    with open(OUTPUT, "w", newline="") as output:
+        for i, year_start in enumerate(tables[0].index.unique('year_start')):
+            df = points.copy()
+            df.insert(0, 'year_start', year_start)
+            df.insert(1, 'year_end', year_start + 9)
+            for table in tables:
+                period = table.xs(year_start, level='year_start', drop_level=False)
+                df = df.join(period, on=KEYS, validate="many_to_one")
+            if df[list(var_column.values())].isna().any(axis=None):
+                raise ValueError(f"Missing values for {year_start}-{year_start + 9}")
+            df = df.round({column: rounding for column in var_column.values()})
+            df.to_csv(output, index=False, header=(i == 0))
+            print(year_start, "-", year_start + 9, len(df), "rows")
+
+
+if __name__ == "__main__":
+    main()
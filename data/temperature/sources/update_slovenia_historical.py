@@ -1,34 +1,58 @@
 #!/usr/bin/env python3
+import os
+
 import numpy as np
 import pandas as pd
 
 # TODO: add the actual data source
 
-data = []
-for year in range(1961, 2021):
-    year_list = []
-    for month in ['jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']:
-        file = f't2_slo_monthly/t2{year}{month}ak.asc'
-        year_list.append(np.loadtxt(file, skiprows=6))
-    data.append(np.asarray(year_list))
+YEARS = range(1961, 2021)
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+GRID_DIR = 't2_slo_monthly'
+# the parsed grids as one (year, month, y, x) array with the files they were read from, reused while the file list
+# is the same and no .asc file is newer
+GRID_CACHE = 't2_slo_monthly.npz'
+NODATA_BELOW = -1000
+
+
+def read_grid(file):
+    """One ESRI ASCII grid: six header lines (ncols, nrows, ...) and nrows rows of ncols values."""
+    with open(file) as f:
+        header = dict(next(f).split() for _ in range(6))
+        values = np.array(f.read().split(), dtype=np.float32)
+    return values.reshape(int(header['nrows']), int(header['ncols']))
+
+
+def read_grids():
+    files = [f'{GRID_DIR}/t2{year}{month}ak.asc' for year in YEARS for month in MONTHS]
+    if os.path.exists(GRID_CACHE) and os.path.getmtime(GRID_CACHE) >= max(os.path.getmtime(file) for file in files):
+        with np.load(GRID_CACHE) as cache:
+            if cache['files'].tolist() == files:
+                return cache['grids']
+    grids = np.stack([read_grid(file) for file in files])
+    grids = grids.reshape(len(YEARS), len(MONTHS), *grids.shape[1:])
+    np.savez(GRID_CACHE, grids=grids, files=np.array(files))
+    return grids
 
-averages = [np.flipud(np.mean(year, axis=0)) for year in data]
+
+data = read_grids()
+
+# (year, y, x), the rows flipped so that y grows northwards
+averages = np.flip(data.mean(axis=1, dtype=np.float64), axis=1)
 overall_average = np.mean(averages, axis=0)
 overall_average_1990 = np.mean(averages[:31], axis=0)
-running_averages = [np.mean(averages[i:i + 10], axis=0) for i in range(len(data) - 9)]
-masked_averages = [np.ma.masked_array(year, mask=year < -1000) for year in averages]
-masked_running_averages = [np.ma.masked_array(year, mask=year < -1000) for year in running_averages]
-masked_running_averages_difference = [np.ma.masked_array(year - overall_average, mask=year < -1000) for year in running_averages]
-masked_running_averages_difference_1990 = [np.ma.masked_array(year - overall_average_1990, mask=year < -1000) for year in running_averages]
-
-year_list = list(range(1961, 2021))
-year_ranges = [(year, year+9) for year in year_list[:-9]]
-total_averages = np.asarray([[y, np.mean(year)] for y, year in zip(year_list, masked_averages)])
+# 10-year running means as differences of the cumulative sum: window k covers years k..k+9
+cumulative = np.cumsum(np.concatenate([np.zeros((1, *averages.shape[1:])), averages]), axis=0)
+running_averages = (cumulative[10:] - cumulative[:-10]) / 10
+masked_averages = np.ma.masked_array(averages, mask=averages < NODATA_BELOW)
+masked_running_averages = np.ma.masked_array(running_averages, mask=running_averages < NODATA_BELOW)
+
+year_list = np.arange(YEARS.start, YEARS.stop)
+year_ends = year_list[9:]
+total_averages = np.column_stack([year_list, masked_averages.mean(axis=(1, 2))])
 total_average_overall = np.mean(total_averages[:, 1])
 total_average_overall_1990 = np.mean(total_averages[:26, 1])
-running_total_averages = np.asarray([[y[1], np.mean(year)] for y, year in zip(year_ranges, masked_running_averages)])
-running_total_averages_difference = np.asarray([[y[1], np.mean(year) - total_average_overall] for y, year in zip(year_ranges, masked_running_averages)])
-running_total_averages_difference_1990 = np.asarray([[y[1], np.mean(year) - total_average_overall_1990] for y, year in zip(year_ranges, masked_running_averages)])
+running_total_averages = np.column_stack([year_ends, masked_running_averages.mean(axis=(1, 2))])
 
 special_averages = [
     [1961, 1990, total_average_overall_1990],
@@ -54,15 +78,17 @@ print(df.dtypes)
 df.to_csv("../data/temperature.slovenia_historical.country_running_10year_average.csv", index=False, float_format='%.3f')
 
 
-matrix_data = []
-for y, matrix in zip(year_ranges, running_averages):
-    for i in range(len(matrix)):
-        for j in range(len(matrix[i])):
-            if matrix[i][j] < - 1000:
-                continue
-            matrix_data.append([y[1], j, i, matrix[i][j], matrix[i][j] - overall_average[i][j], matrix[i][j] - overall_average_1990[i][j]])
-
-df = pd.DataFrame(matrix_data, columns=['year_end', 'x', 'y', 'temperature_average', 'temperature_difference_to_average', 'temperature_difference_to_average_until_1990'])
+# one row per window and pixel with data, windows first and then the pixels row by row
+window, i, j = np.nonzero(running_averages >= NODATA_BELOW)
+values = running_averages[window, i, j]
+df = pd.DataFrame({
+    'year_end': year_ends[window],
+    'x': j,
+    'y': i,
+    'temperature_average': values,
+    'temperature_difference_to_average': values - overall_average[i, j],
+    'temperature_difference_to_average_until_1990': values - overall_average_1990[i, j],
+})
 df = df.astype({'year_end': 'int32'})
 df.insert(0, 'year_start', df['year_end'] - 9)
 print(df)
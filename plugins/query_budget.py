@@ -0,0 +1,208 @@
+'''Per-client, per-database query cost limiter for the podnebnik datasette.
+
+Each request that touches a database runs with a meter. SQLite's progress handler
+(already installed by datasette for `sql_time_limit_ms`) counts the virtual machine
+instructions its queries execute, and the meter's total is charged to a token bucket
+keyed by (client IP, database). A client whose bucket is empty gets 429 with
+Retry-After before any SQL runs; a request that overdraws the bucket mid-way is
+interrupted and answered with 429 as well. Cheap requests cost next to nothing, so the
+budget only ever bites on expensive scans such as the large `_size=max` map pages.
+
+The budget is in VM instructions, not query time: instructions measure the work a query
+does, whatever else the machine is busy with, and SQLite counts them for free in the
+progress handler. Datasette's own `sql_time_limit_ms` still bounds the time.
+
+Configured from the datasette metadata that `invoke create-databases` writes, at the top
+level and optionally per database (keys override the top level):
+
+    "plugins": {
+        "query_budget": {
+            "rate": 20000000,          # instructions refilled per second
+            "burst": 200000000,        # bucket capacity, in instructions
+            "client_header": "cf-connecting-ip",  # unset or absent: the TCP peer address
+            "proxy_hops": 1            # entries appended by trusted proxies, for a list
+                                       # header such as x-forwarded-for
+        }
+    }
+
+T-5.49: table views with `_size=max` and the canned queries still let a crawler drive
+expensive scans after `?sql=` was closed; this bounds what one client can spend.
+'''
+
+import concurrent.futures as futures
+import contextlib
+import contextvars
+import math
+import time
+
+from datasette import database as datasette_database
+from datasette import hookimpl
+
+
+DEFAULTS = {
+    'rate': 20_000_000,
+    'burst': 200_000_000,
+    'client_header': None,
+    'proxy_hops': 1,
+}
+
+# Buckets are dropped once this many exist; a dropped bucket was full or would refill.
+MAX_BUCKETS = 10_000
+
+METER = contextvars.ContextVar('query_budget_meter', default=None)
+
+
+class Meter:
+    '''Instructions executed by one request's queries, and how many it may execute.'''
+
+    def __init__(self, allowance):
+        self.allowance = allowance
+        self.instructions = 0
+        self.exceeded = False
+
+
+class Bucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def retry_after(self, pending=0):
+        '''Seconds until the bucket is positive again, once `pending` is charged.'''
+        return max(1, math.ceil((1 - self.tokens + pending) / self.rate))
+
+
+@contextlib.contextmanager
+def metered_timelimit(conn, ms):
+    '''datasette.utils.sqlite_timelimit, with the request's meter counting in the same
+    progress handler (a connection has only one).'''
+    meter = METER.get()
+    deadline = time.perf_counter() + (ms / 1000)
+    n = 1000 if ms > 20 else 1
+
+    def handler():
+        if meter is not None:
+            meter.instructions += n
+            if meter.instructions > meter.allowance:
+                meter.exceeded = True
+                return 1
+        if time.perf_counter() >= deadline:
+            # Returning 1 terminates the query with an error
+            return 1
+
+    conn.set_progress_handler(handler, n)
+    try:
+        yield
+    finally:
+        conn.set_progress_handler(None, n)
+
+
+class ContextThreadPoolExecutor(futures.ThreadPoolExecutor):
+    '''A thread pool that runs each call in the submitting task's context, so the query
+    threads see the request's meter.'''
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def database_name(datasette, path):
+    segment = path.lstrip('/').split('/', 1)[0]
+    for name in (segment, segment.rsplit('.', 1)[0]):
+        if name in datasette.databases and not name.startswith('_'):
+            return name
+    return None
+
+
+def client_ip(scope, config):
+    header = config['client_header']
+    if header:
+        value = dict(scope['headers']).get(header.lower().encode(), b'').decode('latin-1')
+        addresses = [address.strip() for address in value.split(',') if address.strip()]
+        if len(addresses) >= config['proxy_hops']:
+            # The rightmost entries were appended by our own proxies; anything further
+            # left came from the client and could be forged.
+            return addresses[-config['proxy_hops']]
+    return (scope.get('client') or ('unknown',))[0]
+
+
+async def send_429(send, retry_after):
+    body = b'{"ok": false, "error": "Query budget exceeded, retry later", "status": 429}'
+    await send({
+        'type': 'http.response.start',
+        'status': 429,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'retry-after', str(retry_after).encode()),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+@hookimpl
+def startup(datasette):
+    # datasette.database calls sqlite_timelimit around every query it executes.
+    datasette_database.sqlite_timelimit = metered_timelimit
+    if datasette.executor is not None:
+        old_executor = datasette.executor
+        datasette.executor = ContextThreadPoolExecutor(max_workers=datasette.setting('num_sql_threads'))
+        old_executor.shutdown(wait=False)
+
+
+@hookimpl
+def asgi_wrapper(datasette):
+    buckets = {}
+
+    def database_config(name):
+        return {
+            **DEFAULTS,
+            **(datasette.plugin_config('query_budget') or {}),
+            **(datasette.plugin_config('query_budget', database=name, fallback=False) or {}),
+        }
+
+    def wrap_with_query_budget(app):
+        async def query_budget(scope, receive, send):
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            name = database_name(datasette, scope['path'])
+            if name is None:
+                return await app(scope, receive, send)
+
+            config = database_config(name)
+            key = (client_ip(scope, config), name)
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= MAX_BUCKETS:
+                    buckets.clear()
+                bucket = buckets[key] = Bucket(config['rate'], config['burst'])
+            if bucket.refill() <= 0:
+                return await send_429(send, bucket.retry_after())
+
+            meter = Meter(bucket.tokens)
+            token = METER.set(meter)
+            replaced = False
+
+            async def metered_send(message):
+                nonlocal replaced
+                if message['type'] == 'http.response.start' and meter.exceeded:
+                    replaced = True
+                    await send_429(send, bucket.retry_after(meter.instructions))
+                elif not replaced:
+                    await send(message)
+
+            try:
+                await app(scope, receive, metered_send)
+            finally:
+                METER.reset(token)
+                bucket.tokens -= meter.instructions
+
+        return query_budget
+
+    return wrap_with_query_budget
@@ -0,0 +1,286 @@
+'''Response cache for the podnebnik datasette.
+
+Every database is served immutable (`-i`, with its hash from `--inspect-file`), so a
+GET response is a pure function of the database hash and the URL until the next deploy.
+A database opened mutable has no hash, and its pages pass through uncached. This plugin keeps
+rendered responses in a bounded LRU — in memory, plus an optional on-disk tier — keyed
+by the hash of the database in the path and the canonical query string, and answers
+repeats without running a query. Cached responses carry a strong ETag derived from that
+key, so clients revalidate with a bodyless 304. Concurrent misses for one key render the
+page once; a response too large to store is streamed through without being buffered.
+
+Configured from the datasette metadata (all keys optional):
+
+    "plugins": {
+        "response_cache": {
+            "memory_bytes": 67108864,      # in-memory tier size cap
+            "max_entry_bytes": 16777216,   # larger responses are served, never stored
+            "disk_dir": "/var/cache/datasette",  # enables the on-disk tier
+            "disk_bytes": 1073741824,      # on-disk tier size cap
+            "max_age": 3600                # Cache-Control max-age, seconds
+        }
+    }
+
+T-5.49: a single temperature climate_models map request serialises ~70k rows; repeats
+of it (and of the crawler's enumerations) are what saturated the pod.
+'''
+
+import asyncio
+import collections
+import hashlib
+import json
+import os
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from datasette import hookimpl
+
+
+DEFAULTS = {
+    'memory_bytes': 64 * 1024 * 1024,
+    'max_entry_bytes': 16 * 1024 * 1024,
+    'disk_dir': None,
+    'disk_bytes': 1024 * 1024 * 1024,
+    # The URLs carry no database hash and the data is redeployed daily, so a year-long
+    # max-age would pin stale data in browsers; revalidation is cheap via the ETag.
+    'max_age': 3600,
+}
+
+# Headers recomputed on every response rather than replayed from the cache.
+OWN_HEADERS = {b'cache-control', b'etag', b'content-length'}
+
+
+class MemoryTier:
+    '''LRU of {key: (status, headers, body)} bounded by the total body size.'''
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key)[2])
+        self.entries[key] = entry
+        self.size += len(entry[2])
+        while self.size > self.max_bytes:
+            _, (_, _, body) = self.entries.popitem(last=False)
+            self.size -= len(body)
+
+
+class DiskTier:
+    '''One file per entry (a JSON header line, then the body), bounded by the total file
+    size. Recency is the file mtime, refreshed on every hit; the oldest files are pruned
+    first.'''
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = sum(path.stat().st_size for path in self.directory.glob('*.entry'))
+
+    def path(self, key):
+        return self.directory / f'{key}.entry'
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fi:
+                header = json.loads(fi.readline())
+                body = fi.read()
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in header['headers']]
+        return header['status'], headers, body
+
+    def put(self, key, entry):
+        status, headers, body = entry
+        header = {
+            'status': status,
+            'headers': [(name.decode('latin-1'), value.decode('latin-1')) for name, value in headers],
+        }
+        path = self.path(key)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as fo:
+            fo.write(json.dumps(header).encode() + b'\n')
+            fo.write(body)
+        os.replace(tmp_path, path)
+        self.size += path.stat().st_size
+        if self.size > self.max_bytes:
+            self.prune()
+
+    def prune(self):
+        paths = sorted(self.directory.glob('*.entry'), key=lambda path: path.stat().st_mtime)
+        self.size = sum(path.stat().st_size for path in paths)
+        for path in paths:
+            if self.size <= self.max_bytes:
+                break
+            self.size -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+def canonical_query(query_string):
+    '''The query string with its parameters sorted by name. The sort is stable, so
+    repeated parameters (e.g. several `_col=`) keep their relative order, which datasette
+    gives meaning to.'''
+    pairs = parse_qsl(query_string.decode('latin-1'), keep_blank_values=True)
+    return urlencode(sorted(pairs, key=lambda pair: pair[0]))
+
+
+def database_hash(datasette, path):
+    '''Hash of the database a request path belongs to, or None for instance-level pages
+    and mutable databases.'''
+    segment = path.lstrip('/').split('/', 1)[0]
+    for name in (segment, segment.rsplit('.', 1)[0]):
+        database = datasette.databases.get(name)
+        if database is not None:
+            return database.hash
+    return None
+
+
+def cache_key(datasette, scope):
+    if scope['method'] not in ('GET', 'HEAD'):
+        return None
+    headers = dict(scope['headers'])
+    # Anything that could make the response depend on who is asking is not cached.
+    if b'authorization' in headers or b'ds_actor=' in headers.get(b'cookie', b''):
+        return None
+    db_hash = database_hash(datasette, scope['path'])
+    if db_hash is None:
+        return None
+    # Host and scheme are part of the key: datasette renders absolute URLs (`Link`, `next_url`).
+    host = headers.get(b'host', b'').decode('latin-1')
+    raw = f'{db_hash}\n{scope["scheme"]}://{host}{scope["path"]}\n{canonical_query(scope["query_string"])}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def with_cache_headers(headers, etag, max_age):
+    headers = [(name, value) for name, value in headers if name.lower() not in OWN_HEADERS]
+    headers.append((b'etag', etag))
+    headers.append((b'cache-control', f'public, max-age={max_age}'.encode()))
+    return headers
+
+
+async def send_entry(send, entry, etag, max_age, method, if_none_match):
+    status, headers, body = entry
+    headers = with_cache_headers(headers, etag, max_age)
+    if if_none_match == etag:
+        await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if method == 'HEAD' else body})
+
+
+@hookimpl
+def asgi_wrapper(datasette):
+    config = dict(DEFAULTS, **(datasette.plugin_config('response_cache') or {}))
+    memory = MemoryTier(config['memory_bytes'])
+    disk = DiskTier(config['disk_dir'], config['disk_bytes']) if config['disk_dir'] else None
+
+    # futures of the misses being rendered, by key
+    rendering = {}
+
+    def wrap_with_response_cache(app):
+        async def render(scope, receive, send):
+            '''Run datasette for a miss. A 200 response up to max_entry_bytes without
+            cookies is buffered and returned, for the caller to store and send; anything
+            else is sent straight through as it is rendered, and None returned.'''
+            head = scope['method'] == 'HEAD'
+            start = None
+            chunks = []
+            size = 0
+            passing = False
+            finished = False
+
+            async def pass_body(message):
+                nonlocal finished
+                if finished:
+                    return
+                if head:
+                    # The start carries the headers of the GET; a HEAD ends there.
+                    finished = True
+                    await send({'type': 'http.response.body', 'body': b''})
+                else:
+                    finished = not message.get('more_body', False)
+                    await send(message)
+
+            async def capture(message):
+                nonlocal start, size, passing
+                if message['type'] == 'http.response.start':
+                    start = message
+                    if message['status'] != 200 or any(name.lower() == b'set-cookie' for name, _ in message.get('headers', [])):
+                        passing = True
+                        await send(message)
+                elif message['type'] == 'http.response.body':
+                    if passing:
+                        return await pass_body(message)
+                    chunks.append(message.get('body', b''))
+                    size += len(chunks[-1])
+                    if size > config['max_entry_bytes']:
+                        # Too large to store: stop buffering and send the rest as it comes.
+                        passing = True
+                        await send(start)
+                        await pass_body(dict(message, body=b''.join(chunks)))
+                        chunks.clear()
+
+            # A HEAD runs as a GET, so that the response is the one a GET would store.
+            await app(dict(scope, method='GET'), receive, capture)
+            if passing:
+                return None
+            return start['status'], start.get('headers', []), b''.join(chunks)
+
+        async def response_cache(scope, receive, send):
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            key = cache_key(datasette, scope)
+            if key is None:
+                return await app(scope, receive, send)
+
+            etag = f'"{key[:32]}"'.encode()
+            if_none_match = dict(scope['headers']).get(b'if-none-match')
+
+            entry = memory.get(key)
+            if entry is None and disk is not None:
+                entry = await asyncio.to_thread(disk.get, key)
+                if entry is not None:
+                    memory.put(key, entry)
+            if entry is not None:
+                return await send_entry(send, entry, etag, config['max_age'], scope['method'], if_none_match)
+
+            # Miss: one request renders the page, concurrent requests for the same key
+            # wait for it and are answered from its entry.
+            pending = rendering.get(key)
+            if pending is not None:
+                entry = await asyncio.shield(pending)
+                if entry is not None:
+                    return await send_entry(send, entry, etag, config['max_age'], scope['method'], if_none_match)
+                # Not stored (too large, or not a 200): render it as any uncached page.
+                await render(scope, receive, send)
+                return
+
+            pending = rendering[key] = asyncio.get_running_loop().create_future()
+            entry = None
+            try:
+                entry = await render(scope, receive, send)
+                if entry is not None:
+                    memory.put(key, entry)
+                    if disk is not None:
+                        await asyncio.to_thread(disk.put, key, entry)
+            finally:
+                del rendering[key]
+                pending.set_result(entry)
+            if entry is not None:
+                await send_entry(send, entry, etag, config['max_age'], scope['method'], if_none_match)
+
+        return response_cache
+
+    return wrap_with_response_cache
@@ -1,17 +1,41 @@
 from invoke import task
 
+import concurrent.futures as futures
+import csv
 import glob
-import io
+import hashlib
+import itertools
 import json
+import os
+import re
 import shutil
+import sqlite3
 import sys
+import yaml
 from pathlib import Path
-from frictionless import Package
+from frictionless import FrictionlessException, Package, Resource
 
 
 BASE_DIR = Path(__file__).parent
 DATASETS_DIR = BASE_DIR / 'data'
 SQLITE_DIR = BASE_DIR / 'var/sqlite'
+PLUGINS_DIR = BASE_DIR / 'plugins'
+# VALIDATION_CACHE in the environment moves it, e.g. onto a BuildKit cache mount in the image build
+VALIDATION_CACHE = Path(os.environ.get('VALIDATION_CACHE', BASE_DIR / 'var/validation-cache.json'))
+
+# Per-client query budget (plugins/query_budget.py), in SQLite VM instructions; a full
+# 70k-row temperature map page costs ~3M. Stage and prod sit behind proxied (orange-cloud)
+# Cloudflare and then the cluster Gateway, so the TCP peer and the rightmost
+# X-Forwarded-For entry are a Cloudflare edge or the Gateway, shared by every client.
+# Cloudflare sets CF-Connecting-IP to the client address and replaces any value the
+# client sent. Previews are grey-cloud and get no such header: there every client falls
+# back to the peer address and shares one bucket, which previews can afford.
+QUERY_BUDGET = {
+    'rate': 20_000_000,
+    'burst': 200_000_000,
+    'client_header': 'cf-connecting-ip',
+    'proxy_hops': 1,
+}
 
 
 class Color:
@@ -39,24 +63,253 @@ def get_datapackages():
     return [Package(path) for path in get_datapackage_paths()]
 
 
-@task
-def validate(c):
-    '''Validate available data packages.'''
+def parse_prebuilt(prebuilt):
+    '''Parse `--prebuilt name=path` options into a {package name: db path} dict.'''
+    prebuilt_dbs = {}
+    for item in prebuilt or []:
+        name, sep, path = item.partition('=')
+        if not sep or not name or not path:
+            raise ValueError(f'--prebuilt expects <package>=<path to .db>, got {item!r}')
+        if not Path(path).is_file():
+            raise FileNotFoundError(f'Prebuilt database for {name} not found: {path}')
+        prebuilt_dbs[name] = Path(path)
+    return prebuilt_dbs
+
+
+def get_prebuilt_tables(prebuilt_db):
+    '''Names of the tables in a prebuilt sqlite database.'''
+    conn = sqlite3.connect(prebuilt_db)
+    try:
+        return {row[0] for row in conn.execute("select name from sqlite_master where type = 'table'")}
+    finally:
+        conn.close()
+
+
+def copy_prebuilt_tables(conn, tables):
+    '''Copy tables (with their declared column types and indexes) from the database
+    attached as `prebuilt` and return {table: row count}.
+
+    The rows go through INSERT … SELECT, so they are never serialised to text and parsed
+    back.
+    '''
+    counts = {}
+    for table in tables:
+        (create_sql,) = conn.execute(
+            "select sql from prebuilt.sqlite_master where type = 'table' and name = ?", (table,)).fetchone()
+        conn.execute(create_sql)
+        counts[table] = conn.execute(f'insert into main."{table}" select * from prebuilt."{table}"').rowcount
+        index_sqls = conn.execute(
+            "select sql from prebuilt.sqlite_master where type = 'index' and tbl_name = ? and sql is not null", (table,)).fetchall()
+        for (index_sql,) in index_sqls:
+            conn.execute(index_sql)
+    return counts
+
+
+def load_queries(package_path):
+    '''Canned queries declared in queries.yaml next to a datapackage.yaml, as
+    {name: {title, sql, indexes}}; empty when the package has none.'''
+    queries_path = Path(package_path).parent / 'queries.yaml'
+    if not queries_path.exists():
+        return {}
+    with open(queries_path) as fi:
+        return yaml.safe_load(fi).get('queries') or {}
+
+
+def create_indexes(conn, indexes):
+    '''Create the [{table, columns}] indexes that are not there yet.'''
+    for index in indexes:
+        table, columns = index['table'], index['columns']
+        name = f"idx_{table.replace('.', '_')}_{'_'.join(columns)}"
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        conn.execute(f'create index if not exists "{name}" on "{table}" ({column_list})')
+
+
+def check_queries(conn, queries):
+    '''Compile every canned query against the built database, so a query that names a
+    missing table or column fails the build instead of answering 500 once deployed.'''
+    for name, query in queries.items():
+        params = dict.fromkeys(re.findall(r':(\w+)', query['sql']))
+        try:
+            conn.execute(f"explain {query['sql']}", params)
+        except sqlite3.Error as error:
+            raise ValueError(f'Canned query {name}: {error}') from error
+
+
+def inspect_fragment(database, counts):
+    '''The `datasette inspect` entry of one database, from row counts its builder already
+    knows: only the file hash has to be computed, no table is scanned.'''
+    return {
+        'hash': file_sha256(database),
+        'size': database.stat().st_size,
+        'file': str(database),
+        'tables': {table: {'count': count} for table, count in counts.items()},
+    }
+
+
+def check_prebuilt_counts(prebuilt_db, counts):
+    '''Compare copied row counts with the inspect fragment written next to the prebuilt
+    database (precompute_datasette.py writes climate-si.inspect.json). A mismatch means
+    the fragment is stale, e.g. the database was rebuilt without it.'''
+    fragment_path = prebuilt_db.with_suffix('.inspect.json')
+    if not fragment_path.is_file():
+        return
+    (fragment,) = json.loads(fragment_path.read_text()).values()
+    for table, count in counts.items():
+        expected = fragment['tables'].get(table, {}).get('count')
+        if expected != count:
+            raise ValueError(f'{fragment_path}: {table} has {count} rows, the inspect fragment says {expected}')
+
+
+# SQLite column type and value parser per frictionless field type. Every other type
+# (string, date, datetime, …) is stored as TEXT verbatim: ISO dates compare and sort
+# correctly as text. Empty cells are frictionless' default missing value, so they load
+# as NULL whatever the type.
+FIELD_TYPES = {
+    'integer': ('INTEGER', int),
+    'year': ('INTEGER', int),
+    'number': ('REAL', float),
+}
+TEXT_TYPE = ('TEXT', str)
+CSV_BATCH_SIZE = 10_000
+
+
+def load_csv_table(conn, table, csv_path, field_types):
+    '''Create `table` from the resource schema and load a CSV file into it.
+
+    `field_types` maps column names to their frictionless types. Rows are parsed into
+    typed values with the csv module and inserted in executemany batches; the caller
+    owns the transaction. Returns the number of rows loaded.
+    '''
+    # utf-8-sig: a byte order mark must not end up in the first column name.
+    with open(csv_path, newline='', encoding='utf-8-sig') as fi:
+        reader = csv.reader(fi)
+        header = next(reader)
+        types = [FIELD_TYPES.get(field_types.get(name), TEXT_TYPE) for name in header]
+        columns = ', '.join(f'"{name}" {sql_type}' for name, (sql_type, _) in zip(header, types))
+        conn.execute(f'create table "{table}" ({columns})')
+
+        parsers = [parse for _, parse in types]
+
+        def typed_rows():
+            for row in reader:
+                if len(row) != len(header):
+                    raise ValueError(f'{csv_path}:{reader.line_num}: expected {len(header)} values, got {len(row)}')
+                try:
+                    yield [parse(value) if value != '' else None for parse, value in zip(parsers, row)]
+                except ValueError as e:
+                    raise ValueError(f'{csv_path}:{reader.line_num}: {e}') from e
+
+        placeholders = ', '.join(['?'] * len(header))
+        count = 0
+        for batch in itertools.batched(typed_rows(), CSV_BATCH_SIZE):
+            conn.executemany(f'insert into "{table}" values ({placeholders})', batch)
+            count += len(batch)
+    return count
+
+
+def resolve_jobs(jobs, n_tasks):
+    '''Worker count: `--jobs` if given, else os.cpu_count(), capped at the task count
+    and floored at 1. A value of 1 runs the tasks serially in this process.'''
+    n = jobs if jobs > 0 else (os.cpu_count() or 1)
+    return max(1, min(n, n_tasks))
+
+
+def file_sha256(path):
+    with open(path, 'rb') as fi:
+        return hashlib.file_digest(fi, 'sha256').hexdigest()
+
+
+def resource_cache_key(package_hash, package_path, resource):
+    '''Validation cache key of a resource: the hashes of datapackage.yaml and of the
+    resource file. None (never cached) when the resource is not a local file.'''
+    resource_path = package_path.parent / resource.path
+    if not resource_path.is_file():
+        return None
+    return f'{package_hash}:{file_sha256(resource_path)}'
+
+
+def validate_resource(descriptor, basepath):
+    '''Validate one resource, as Package.validate(parallel=True) does in its workers.'''
+    report = Resource.from_descriptor(descriptor, basepath=basepath).validate()
+    return report.valid
+
+
+@task(iterable=['skip'])
+def validate(c, skip=None, force=False, jobs=0):
+    '''Validate available data packages.
+
+    Valid resources are remembered in VALIDATION_CACHE under the content hashes of the
+    resource file and its datapackage.yaml, so only resources that changed since the
+    last run are validated again (`--force` validates everything). Those run across
+    `--jobs` worker processes (default: one per CPU).
+    '''
     log('Validating data packages:\n')
-    invalid_package_paths = []
+
+    try:
+        cache = json.loads(VALIDATION_CACHE.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    if force:
+        cache = {}
+
+    packages = []
+    pending = []
     for path in get_datapackage_paths():
         package = Package(path)
+        if skip and package.name in skip:
+            packages.append((path, package, None, None))
+            continue
+        try:
+            # Package-level metadata, checked first by Package.validate() as well.
+            package.to_descriptor(validate=True)
+        except FrictionlessException:
+            packages.append((path, package, False, None))
+            continue
+        if any(resource.schema and resource.schema.foreign_keys for resource in package.resources):
+            # Foreign keys are checked across resources, so the package is validated whole.
+            packages.append((path, package, package.validate().valid, None))
+            continue
+        package_hash = file_sha256(path)
+        keys = {}
+        for resource in package.resources:
+            cache_id = f'{package.name}/{resource.name}'
+            keys[cache_id] = resource_cache_key(package_hash, path, resource)
+            if keys[cache_id] is None or cache.get(cache_id) != keys[cache_id]:
+                cache.pop(cache_id, None)
+                pending.append((cache_id, resource.to_descriptor(), resource.basepath))
+        packages.append((path, package, True, keys))
+
+    n_jobs = resolve_jobs(jobs, len(pending))
+    log(f'Validating {len(pending)} changed resources over {n_jobs} workers.\n')
+    if n_jobs == 1:
+        results = [validate_resource(descriptor, basepath) for _, descriptor, basepath in pending]
+    else:
+        with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(validate_resource, [descriptor for _, descriptor, _ in pending], [basepath for _, _, basepath in pending]))
+    invalid_resources = {cache_id for (cache_id, _, _), valid in zip(pending, results) if not valid}
+
+    invalid_package_paths = []
+    for path, package, valid, keys in packages:
         log(f'  Name: {package.name}')
         log(f'  Path: {path}')
         log(f' Title: {package.title}')
-        report = package.validate()
-        if report.valid:
+        if valid is None:
+            log('Status: skipped')
+            log('\n')
+            continue
+        if keys is not None:
+            valid = not invalid_resources.intersection(keys)
+            cache.update({cache_id: key for cache_id, key in keys.items() if key is not None and cache_id not in invalid_resources})
+        if valid:
             log(f'Status: {Color.success("valid")}')
-        if not report.valid:
+        if not valid:
             log(f'Status: {Color.failure("invalid")}')
             invalid_package_paths.append(path)
         log('\n')
 
+    VALIDATION_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    VALIDATION_CACHE.write_text(json.dumps(cache, indent=4, sort_keys=True))
+
     if not invalid_package_paths:
         log('All data packages are valid.')
     else:
@@ -73,25 +326,129 @@ def none_if_empty(value):
         return None
 
 
-@task(iterable=['no_validate_arch'])
-def create_databases(c, no_validate=False, no_validate_arch=None):
-    '''Create sqlite database, import resources data and generate datasette metadata.'''
+def package_metadata(package, queries):
+    '''Datasette metadata for a data package, its CSV resources and canned queries.'''
+    metadata = {
+        'title': package.title,
+        'description': package.description,
+        'license': none_if_empty(', '.join([license.title for license in package.licenses if hasattr(license, 'title')])),
+        'license_url': none_if_empty(', '.join([license.path for license in package.licenses if hasattr(license, 'path')])),
+        # 'source': None,
+        # 'source_url': None,
+        'tables': {},
+    }
+
+    # T-5.49: disable arbitrary SQL (the `?sql=` / `?_where=` surface) on every database.
+    # A crawler enumerated stage-data on 2026-08-03 with `?sql=` queries, saturating
+    # the datasette pod (~2200m CPU) until it was OOMKilled. `?sql=` and `?_where=`
+    # are gated by the single `execute-sql` permission in datasette 0.65.2
+    # (default_permissions.py `execute-sql`; filters.py rejects `?_where=` when it is
+    # denied), so `allow_sql: false` refuses both with 403. Query shapes the frontends
+    # cannot express as table filters are canned queries (queries.yaml), which stay
+    # allowed: the /ali-je-vroce/ `_where=` window is temperature's `historical_window`.
+    metadata['allow_sql'] = False
+    if queries:
+        metadata['queries'] = {name: {'title': query['title'], 'sql': query['sql']} for name, query in queries.items()}
+
+    for resource in package.resources:
+        if resource.format != 'csv':
+            continue
+        metadata['tables'][resource.name] = {
+            'title': resource.title,
+            'description': resource.description,
+            'license': none_if_empty(', '.join([license.title for license in resource.licenses if 'title' in license])),
+            'license_url': none_if_empty(', '.join([license.path for license in resource.licenses if 'path' in license])),
+            # 'source': None,
+            # 'source_url': None,
+        }
+        if resource.schema.fields:
+            metadata['tables'][resource.name]['columns'] = dict([(field.name, field.title) for field in resource.schema.fields if hasattr(field, 'title')])
+            metadata['tables'][resource.name]['units'] = dict([(field.name, field.unit) for field in resource.schema.fields if hasattr(field, 'unit')])
+
+    return metadata
+
+
+def create_package_database(package_path, prebuilt_dbs):
+    '''Create the sqlite database of one data package and return its name, database path,
+    datasette metadata and datasette inspect entry.
+
+    All resources load in-process through one connection and one transaction. Runs in a
+    worker process when create_databases builds several packages concurrently.
+    '''
+    package = Package(package_path)
+    queries = load_queries(package_path)
+    database = SQLITE_DIR / f'{package.name}.db'
+    prebuilt_db = prebuilt_dbs.get(package.name)
+
+    log(f'\nImporting data package {package.name}:')
+
+    prebuilt_tables = get_prebuilt_tables(prebuilt_db) if prebuilt_db else set()
+    csv_resources = []
+    copied_tables = []
+    for resource in package.resources:
+        if resource.format != 'csv':
+            log(f'    Skipping resource {resource.name}, {resource.format} @ {resource.path}')
+        elif resource.name in prebuilt_tables:
+            log(f'    Copying resource {resource.name} from {prebuilt_db}')
+            copied_tables.append(resource.name)
+        else:
+            log(f'    Importing resource {resource.name}, {resource.format} @ {resource.path}')
+            csv_resources.append(resource)
+
+    counts = {}
+    conn = sqlite3.connect(database)
+    try:
+        # ATTACH is not allowed inside a transaction, so it goes first.
+        if copied_tables:
+            conn.execute('attach database ? as prebuilt', (str(prebuilt_db),))
+        with conn:
+            for resource in csv_resources:
+                field_types = {field.name: field.type for field in resource.schema.fields}
+                counts[resource.name] = load_csv_table(conn, resource.name, package_path.parent / resource.path, field_types)
+            copied_counts = copy_prebuilt_tables(conn, copied_tables)
+        if copied_tables:
+            conn.execute('detach database prebuilt')
+            check_prebuilt_counts(prebuilt_db, copied_counts)
+            counts.update(copied_counts)
+        # Indexes come from the resources' `indexes` in datapackage.yaml and from the canned
+        # queries; ANALYZE then gives the planner row estimates to choose between them.
+        indexes = [
+            {'table': resource.name, 'columns': columns}
+            for resource in package.resources if resource.format == 'csv'
+            for columns in resource.custom.get('indexes', [])
+        ]
+        indexes += [index for query in queries.values() for index in query.get('indexes', [])]
+        with conn:
+            create_indexes(conn, indexes)
+            conn.execute('analyze')
+        check_queries(conn, queries)
+    finally:
+        conn.close()
+
+    log(f'Done importing data package {package.name}.')
+    return package.name, database, package_metadata(package, queries), inspect_fragment(database, counts)
+
+
+@task(iterable=['prebuilt'])
+def create_databases(c, no_validate=False, prebuilt=None, jobs=0):
+    '''Create sqlite database, import resources data and generate datasette metadata.
+
+    `--prebuilt <package>=<path>` points at an already-built sqlite database for a data
+    package (e.g. climate-si.db written by precompute_datasette.py). Resources whose table
+    exists there are copied database-to-database instead of being imported from CSV.
+
+    Each data package is its own database, so the packages are built concurrently across
+    `--jobs` worker processes (default: one per CPU; `--jobs 1` builds them serially).
+    '''
+
+    prebuilt_dbs = parse_prebuilt(prebuilt)
 
-    do_validation = True
     if no_validate:
         log("Passed in --no-validate, not doing validation")
-        do_validation = False
-
-    if do_validation and no_validate_arch:
-        # this is a pragmatic option to avoid doing slow data validation in github action
-        import platform
-        machine = platform.machine()
-        if machine in no_validate_arch:
-            log(f"Passed in --no-slow-validate, not doing validation on {machine}.")
-            do_validation = False
-
-    if do_validation:
-        validate(c)
+    else:
+        # Prebuilt packages have no CSVs to validate: their tables were checked against
+        # datapackage.yaml by the pipeline that wrote them (climate-si: validate.py).
+        validate(c, skip=list(prebuilt_dbs), jobs=jobs)
 
     # Reset the sqlite databases directory
     shutil.rmtree(SQLITE_DIR, ignore_errors=True)
@@ -105,77 +462,32 @@ def create_databases(c, no_validate=False, no_validate_arch=None):
         # 'license_url': None,
         # 'source': None,
         # 'source_url': None,
-        'databases': {}
+        'databases': {},
+        'plugins': {'query_budget': QUERY_BUDGET},
     }
 
-    databases = []
+    inspect_data = {}
 
     # Create a new database for each data package
-    for package_path in get_datapackage_paths():
-        package = Package(package_path)
-        database = Path(f'{SQLITE_DIR / package.name}.db')
-        databases.append(database)
-
-        log(f'\nImporting data package {package.name}:')
-
-        # Package metadata
-        metadata['databases'][package.name] = {
-            'title': package.title,
-            'description': package.description,
-            'license': none_if_empty(', '.join([license.title for license in package.licenses if hasattr(license, 'title')])),
-            'license_url': none_if_empty(', '.join([license.path for license in package.licenses if hasattr(license, 'path')])),
-            # 'source': None,
-            # 'source_url': None,
-            'tables': {},
-        }
+    package_paths = get_datapackage_paths()
+    n_jobs = resolve_jobs(jobs, len(package_paths))
+    if n_jobs == 1:
+        results = [create_package_database(path, prebuilt_dbs) for path in package_paths]
+    else:
+        log(f'Importing {len(package_paths)} data packages over {n_jobs} workers.')
+        with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(create_package_database, package_paths, itertools.repeat(prebuilt_dbs)))
 
-        # T-5.49: disable arbitrary SQL (the `?sql=` / `?_where=` surface) per-database.
-        # A crawler enumerated stage-data on 2026-08-03 with `?sql=` queries, saturating
-        # the datasette pod (~2200m CPU) until it was OOMKilled. `?sql=` and `?_where=`
-        # are gated by the single `execute-sql` permission in datasette 0.65.2
-        # (default_permissions.py `execute-sql`; filters.py rejects `?_where=` when it is
-        # denied), so this `allow_sql: false` block refuses both with 403 for the database
-        # it is set on. It is scoped OFF `temperature` on purpose: the legacy
-        # /ali-je-vroce/ page (code/ali-je-vroce/helpers.ts) still issues a `?_where=`
-        # against temperature, and 0.65.2 has no way to allow `_where` while blocking
-        # `?sql=` on the same database. Whether that page is migrated or retired — which
-        # would let temperature be closed too — is an operator decision, out of scope here.
-        if package.name in ('climate-si', 'emissions'):
-            metadata['databases'][package.name]['allow_sql'] = False
-
-        # Import resources
-        for resource in package.resources:
-            if resource.format == 'csv':
-                # Import the resource if it is a CSV file
-                log(f'    Importing resource {resource.name}, {resource.format} @ {resource.path}')
-                metadata['databases'][package.name]['tables'][resource.name] = {
-                    'title': resource.title,
-                    'description': resource.description,
-                    'license': none_if_empty(', '.join([license.title for license in resource.licenses if 'title' in license])),
-                    'license_url': none_if_empty(', '.join([license.path for license in resource.licenses if 'path' in license])),
-                    # 'source': None,
-                    # 'source_url': None,
-                }
-                if resource.schema.fields:
-                    metadata['databases'][package.name]['tables'][resource.name]['columns'] = dict([(field.name, field.title) for field in resource.schema.fields if hasattr(field, 'title')])
-                    metadata['databases'][package.name]['tables'][resource.name]['units'] = dict([(field.name, field.unit) for field in resource.schema.fields if hasattr(field, 'unit')])
-            else:
-                log(f'    Skipping resource {resource.name}, {resource.format} @ {resource.path}')
-
-            # this only creates tables
-            c.run(f'sqlite-utils insert {database} {resource.name} {DATASETS_DIR / package_path.parent / resource.path} --csv --silent --stop-after 10')
-
-            # this loads the data
-            fake_stdin = io.StringIO()
-            fake_stdin.write(f"""delete from "{resource.name}";\n.import --csv --skip 1 {DATASETS_DIR / package_path.parent / resource.path} {resource.name}""")
-            fake_stdin.seek(0)
-            c.run(f'sqlite3 {database}', in_stream=fake_stdin)
-
-
-    # Create the datasette inspect file
+    for name, database, package_meta, package_inspect in results:
+        metadata['databases'][name] = package_meta
+        inspect_data[database.stem] = package_inspect
+
+    # Create the datasette inspect file from the entries the package builds returned:
+    # they know their row counts, so `datasette inspect` need not COUNT(*) every table.
 
     log('Creating datasette inspect json.')
-    c.run(f'datasette inspect {" ".join([str(db) for db in databases])} --inspect-file {SQLITE_DIR / "inspect-data.json"}')
+    with open(SQLITE_DIR / 'inspect-data.json', 'w') as fo:
+        json.dump(inspect_data, fo, indent=2)
 
     # Create the datasette metadata file
     with open(SQLITE_DIR / 'metadata.json', 'w') as fo:
@@ -198,5 +510,9 @@ def datasette(c):
     # max_returned_rows stays 150000: the largest legitimate single request is ~70,080 rows
     # (temperature climate_models map via _size=max); lowering it silently truncates those
     # map pages, which have no truncation guard.
+    # plugins/response_cache.py serves repeated GETs from an LRU keyed by database hash and
+    # canonical query string. Only an immutable database has a hash, so every .db file is
+    # passed with -i (its hash read from inspect-data.json), as in Dockerfile.datasette.
+    immutables = ' '.join(f'-i {database}' for database in sorted(SQLITE_DIR.glob('*.db')))
     # TODO: remove custom setting when no longer needed
-    c.run(f'datasette serve {SQLITE_DIR} --inspect-file {SQLITE_DIR}/inspect-data.json --metadata {SQLITE_DIR}/metadata.json --port 8010 --cors --setting max_returned_rows 150000 --setting allow_facet false --setting suggest_facets false --setting allow_csv_stream false')
+    c.run(f'datasette serve {immutables} --inspect-file {SQLITE_DIR}/inspect-data.json --metadata {SQLITE_DIR}/metadata.json --plugins-dir {PLUGINS_DIR} --port 8010 --cors --setting max_returned_rows 150000 --setting allow_facet false --setting suggest_facets false --setting allow_csv_stream false')
@@ -0,0 +1,52 @@
+"""Helpers to drive the plugins' ASGI wrappers without a server: a stand-in for the
+Datasette object they are configured from, and a request that collects what was sent."""
+
+import asyncio
+
+
+class FakeDatabase:
+    def __init__(self, name):
+        self.hash = f'{name}-hash'
+
+
+class FakeDatasette:
+    def __init__(self, config=None, databases=('temperature',)):
+        self.config = config or {}
+        self.databases = {name: FakeDatabase(name) for name in databases}
+
+    def plugin_config(self, plugin, database=None, fallback=True):
+        if database is not None:
+            return self.config.get(database)
+        return self.config
+
+
+def scope(path, query=b'', method='GET', headers=(), client=('10.0.0.1', 1234)):
+    return {
+        'type': 'http',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': query,
+        'headers': [(b'host', b'localhost'), *headers],
+        'client': client,
+    }
+
+
+async def request(app, scope):
+    '''Run one request through app; (status, headers, body) of what it sent.'''
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(message for message in messages if message['type'] == 'http.response.start')
+    body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
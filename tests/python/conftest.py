@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The datasette plugins and tasks.py are plain modules, not an installed package:
+# put the repository root and plugins/ on the path so the tests can import them.
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'plugins'))
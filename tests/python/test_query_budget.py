@@ -0,0 +1,104 @@
+"""plugins/query_budget.py: client addresses, and the token bucket around a stub app that
+runs real SQLite queries under the plugin's progress handler."""
+
+import sqlite3
+
+import query_budget
+from asgi_stub import FakeDatasette, request, run, scope
+from query_budget import DEFAULTS, client_ip
+
+PAGE = '/temperature/temperature~2Eslovenia_historical~2Ecountry_yearly_average.json'
+# About 1.5M VM instructions.
+COSTLY = 'with recursive n(i) as (select 1 union all select i + 1 from n where i < 100000) select sum(i) from n'
+
+
+def config(**overrides):
+    return dict(DEFAULTS, **overrides)
+
+
+def test_client_ip_without_header_is_the_peer():
+    assert client_ip(scope(PAGE), config()) == '10.0.0.1'
+
+
+def test_client_ip_from_cf_connecting_ip():
+    request_scope = scope(PAGE, headers=[(b'cf-connecting-ip', b'203.0.113.7')])
+    assert client_ip(request_scope, config(client_header='CF-Connecting-IP')) == '203.0.113.7'
+    # Header configured but absent (a request that did not come through Cloudflare).
+    assert client_ip(scope(PAGE), config(client_header='cf-connecting-ip')) == '10.0.0.1'
+
+
+def test_client_ip_from_x_forwarded_for_skips_trusted_hops():
+    forwarded = [(b'x-forwarded-for', b'198.51.100.1, 203.0.113.7, 10.1.2.3')]
+    assert client_ip(scope(PAGE, headers=forwarded), config(client_header='x-forwarded-for', proxy_hops=1)) == '10.1.2.3'
+    assert client_ip(scope(PAGE, headers=forwarded), config(client_header='x-forwarded-for', proxy_hops=2)) == '203.0.113.7'
+    # Fewer entries than trusted hops: the header cannot be trusted at all.
+    assert client_ip(scope(PAGE, headers=forwarded), config(client_header='x-forwarded-for', proxy_hops=4)) == '10.0.0.1'
+
+
+class QueryApp:
+    '''Runs `sql` on an in-memory database under the plugin's progress handler, as
+    datasette does, and answers 200 with the result, or 500 when it was interrupted.'''
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        conn = sqlite3.connect(':memory:')
+        try:
+            with query_budget.metered_timelimit(conn, 10_000):
+                body = str(conn.execute(self.sql).fetchone()[0]).encode()
+            status = 200
+        except sqlite3.OperationalError:
+            body, status = b'interrupted', 500
+        await send({'type': 'http.response.start', 'status': status, 'headers': []})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def wrap(app, **budget):
+    return query_budget.asgi_wrapper(FakeDatasette(dict(DEFAULTS, **budget)))(app)
+
+
+def test_cheap_requests_pass():
+    app = QueryApp('select 1')
+    wrapped = wrap(app, rate=1, burst=1_000_000)
+    for _ in range(3):
+        assert run(request(wrapped, scope(PAGE)))[:3:2] == (200, b'1')
+
+
+def test_overdraw_mid_query_is_interrupted_and_replaced_with_429():
+    app = QueryApp(COSTLY)
+    wrapped = wrap(app, rate=1, burst=100_000)
+    status, headers, body = run(request(wrapped, scope(PAGE)))
+    assert status == 429
+    assert int(headers[b'retry-after']) >= 1
+    assert b'Query budget exceeded' in body
+
+
+def test_empty_bucket_is_429_before_the_query_runs():
+    app = QueryApp(COSTLY)
+    wrapped = wrap(app, rate=1, burst=100_000)
+    run(request(wrapped, scope(PAGE)))
+    status, headers, _ = run(request(wrapped, scope(PAGE)))
+    assert status == 429
+    # The second request never reached the app.
+    assert app.calls == 1
+
+
+def test_buckets_are_per_client_and_database():
+    app = QueryApp(COSTLY)
+    wrapped = wrap(app, rate=1, burst=100_000, client_header='cf-connecting-ip')
+    first = scope(PAGE, headers=[(b'cf-connecting-ip', b'203.0.113.7')])
+    other = scope(PAGE, headers=[(b'cf-connecting-ip', b'203.0.113.8')])
+    assert run(request(wrapped, first))[0] == 429
+    assert run(request(wrapped, first))[0] == 429
+    # Another client behind the same peer address still has its own budget to spend.
+    run(request(wrapped, other))
+    assert app.calls == 2
+
+
+def test_instance_pages_are_not_metered():
+    app = QueryApp(COSTLY)
+    wrapped = wrap(app, rate=1, burst=1)
+    assert run(request(wrapped, scope('/-/versions.json')))[0] == 200
@@ -0,0 +1,178 @@
+"""plugins/response_cache.py's ASGI wrapper, around a stub app standing in for datasette."""
+
+import asyncio
+import sqlite3
+from pathlib import Path
+
+from datasette.app import Datasette
+
+import response_cache
+from asgi_stub import FakeDatasette, request, run, scope
+
+
+class StubApp:
+    '''Answers every request with 200 and `chunks` as the body, one message each; records
+    the scopes it was called with. With `gate` set it waits for it before answering.'''
+
+    def __init__(self, chunks=(b'{"rows": []}',), gate=None, status=200, headers=()):
+        self.chunks = chunks
+        self.gate = gate
+        self.status = status
+        self.headers = [(b'content-type', b'application/json'), *headers]
+        self.scopes = []
+
+    async def __call__(self, scope, receive, send):
+        self.scopes.append(scope)
+        if self.gate is not None:
+            await self.gate.wait()
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': self.headers})
+        for i, chunk in enumerate(self.chunks):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': i < len(self.chunks) - 1})
+
+
+def wrap(stub, **config):
+    return response_cache.asgi_wrapper(FakeDatasette(config))(stub)
+
+
+PAGE = '/temperature/temperature~2Eslovenia_historical~2Ecountry_yearly_average.json'
+
+
+def test_miss_then_hit():
+    stub = StubApp()
+    app = wrap(stub)
+    status, headers, body = run(request(app, scope(PAGE, b'_size=10&_col=year')))
+    assert (status, body) == (200, b'{"rows": []}')
+    assert headers[b'etag'].startswith(b'"')
+    # Same page, parameters in another order: a hit, the stub is not called again.
+    status, headers_again, body = run(request(app, scope(PAGE, b'_col=year&_size=10')))
+    assert (status, body) == (200, b'{"rows": []}')
+    assert headers_again[b'etag'] == headers[b'etag']
+    assert headers_again[b'content-length'] == b'12'
+    assert len(stub.scopes) == 1
+
+
+def test_etag_revalidation_is_304():
+    stub = StubApp()
+    app = wrap(stub)
+    _, headers, _ = run(request(app, scope(PAGE)))
+    status, _, body = run(request(app, scope(PAGE, headers=[(b'if-none-match', headers[b'etag'])])))
+    assert (status, body) == (304, b'')
+    assert len(stub.scopes) == 1
+
+
+def test_head_renders_a_get_and_sends_no_body():
+    stub = StubApp()
+    app = wrap(stub)
+    status, headers, body = run(request(app, scope(PAGE, method='HEAD')))
+    assert (status, body) == (200, b'')
+    assert headers[b'content-length'] == b'12'
+    assert stub.scopes[0]['method'] == 'GET'
+    # The HEAD stored the GET response.
+    assert run(request(app, scope(PAGE)))[2] == b'{"rows": []}'
+    assert len(stub.scopes) == 1
+
+
+def test_cookie_or_authorization_bypasses_the_cache():
+    stub = StubApp()
+    app = wrap(stub)
+    for headers in ([(b'cookie', b'ds_actor=abc')], [(b'authorization', b'Bearer x')]):
+        for _ in range(2):
+            _, sent_headers, _ = run(request(app, scope(PAGE, headers=headers)))
+            assert b'etag' not in sent_headers
+    assert len(stub.scopes) == 4
+
+
+def test_instance_pages_are_not_cached():
+    stub = StubApp()
+    app = wrap(stub)
+    run(request(app, scope('/-/versions.json')))
+    run(request(app, scope('/-/versions.json')))
+    assert len(stub.scopes) == 2
+
+
+def test_large_response_is_streamed_not_stored():
+    client_seen = []
+    seen_before_last_chunk = []
+
+    async def stub(scope_, receive, send):
+        stub.calls += 1
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'a' * 8, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'b' * 8, 'more_body': True})
+        seen_before_last_chunk.append(list(client_seen))
+        await send({'type': 'http.response.body', 'body': b'c' * 8})
+    stub.calls = 0
+
+    async def client(app):
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            client_seen.append(message.get('body', message['type']))
+        await app(scope(PAGE), receive, send)
+
+    app = wrap(stub, max_entry_bytes=10)
+    run(client(app))
+    # Past the cap the plugin stops buffering: the client had the start and the first
+    # 16 bytes before the stub produced its last chunk.
+    assert seen_before_last_chunk == [['http.response.start', b'a' * 8 + b'b' * 8]]
+    assert client_seen[-1] == b'c' * 8
+    # Not stored: a repeat renders again.
+    run(client(app))
+    assert stub.calls == 2
+
+
+def test_concurrent_misses_render_once():
+    async def scenario():
+        gate = asyncio.Event()
+        stub = StubApp(gate=gate)
+        app = wrap(stub)
+        requests = [asyncio.create_task(request(app, scope(PAGE))) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        return stub, await asyncio.gather(*requests)
+
+    stub, responses = run(scenario())
+    assert len(stub.scopes) == 1
+    assert [body for _, _, body in responses] == [b'{"rows": []}'] * 3
+
+
+def test_uncached_status_passes_through():
+    stub = StubApp(status=404)
+    app = wrap(stub)
+    status, headers, _ = run(request(app, scope(PAGE)))
+    assert status == 404 and b'etag' not in headers
+    run(request(app, scope(PAGE)))
+    assert len(stub.scopes) == 2
+
+
+def real_datasette(tmp_path, immutable):
+    '''A real datasette serving one small database with the plugins directory loaded,
+    opened immutable (`-i`) or mutable (a positional file).'''
+    database = tmp_path / 'temperature.db'
+    conn = sqlite3.connect(database)
+    conn.execute('create table yearly (year integer, temperature real)')
+    conn.executemany('insert into yearly values (?, ?)', [(2000, 10.5), (2001, 11.0)])
+    conn.commit()
+    conn.close()
+    files = {'immutables' if immutable else 'files': [str(database)]}
+    return Datasette(**files, plugins_dir=str(Path(response_cache.__file__).parent))
+
+
+def test_immutable_database_is_cached(tmp_path):
+    datasette = real_datasette(tmp_path, immutable=True)
+    response = run(datasette.client.get('/temperature/yearly.json'))
+    assert response.status_code == 200
+    assert response.headers['cache-control'] == f"public, max-age={response_cache.DEFAULTS['max_age']}"
+    revalidated = run(datasette.client.get('/temperature/yearly.json',
+                                           headers={'if-none-match': response.headers['etag']}))
+    assert revalidated.status_code == 304
+
+
+def test_mutable_database_is_not_cached(tmp_path):
+    # A mutable database has no hash, so nothing can key its pages: they pass through
+    # with datasette's own headers. The deployment must serve every database with -i.
+    datasette = real_datasette(tmp_path, immutable=False)
+    response = run(datasette.client.get('/temperature/yearly.json'))
+    assert response.status_code == 200
+    assert 'etag' not in response.headers
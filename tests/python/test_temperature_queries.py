@@ -0,0 +1,44 @@
+"""The canned queries of data/temperature/queries.yaml, run on small SQLite tables."""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from tasks import DATASETS_DIR, load_queries
+
+QUERIES = load_queries(DATASETS_DIR / 'temperature' / 'datapackage.yaml')
+
+
+def build_window(center_mmdd, half_window):
+    '''Month-days within ±half_window of center_mmdd on the non-leap 2001 calendar, as the
+    removed buildWindow in code/ali-je-vroce/helpers.ts listed them.'''
+    month, day = map(int, center_mmdd.split('-'))
+    center = date(2001, month, day)
+    return {(center + timedelta(days=k)).strftime('%m-%d') for k in range(-half_window, half_window + 1)}
+
+
+@pytest.fixture
+def daily():
+    '''Two stations with one row per day over 1999-2005, which holds the leap years
+    2000 and 2004.'''
+    conn = sqlite3.connect(':memory:')
+    conn.execute('create table [temperature.slovenia_historical.daily] (station_id integer, date text, temperature_average_2m real)')
+    days = [date(1999, 1, 1) + timedelta(days=i) for i in range((date(2006, 1, 1) - date(1999, 1, 1)).days)]
+    conn.executemany(
+        'insert into [temperature.slovenia_historical.daily] values (?, ?, ?)',
+        [(station, day.isoformat(), 10.0) for station in (1008, 1014) for day in days])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('center_mmdd, half_window', [('03-01', 3), ('02-28', 1), ('12-31', 3), ('01-02', 7)])
+def test_historical_window_matches_build_window(daily, center_mmdd, half_window):
+    rows = daily.execute(QUERIES['historical_window']['sql'],
+                         {'station_id': 1008, 'center_mmdd': center_mmdd, 'half_window': half_window}).fetchall()
+    window = build_window(center_mmdd, half_window)
+    assert {station for station, _, _ in rows} == {1008}
+    assert {day[5:] for _, day, _ in rows} == window
+    # One sample per month-day and year: no leap day, in leap years or otherwise.
+    assert len(rows) == 7 * len(window)
+    assert [day for _, day, _ in rows] == sorted(day for _, day, _ in rows)
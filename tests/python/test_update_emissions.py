@@ -0,0 +1,137 @@
+"""The CDR download of data/emissions/sources/update_emissions.py, against a local HTTP
+server serving a copy of the envelope pages and files."""
+
+import functools
+import http.server
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+for module in ('bs4', 'openpyxl', 'pandas', 'scipy'):
+    pytest.importorskip(module)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'data' / 'emissions' / 'sources'))
+import update_emissions as ue  # noqa: E402
+
+ENV = 'envrjvxq'
+DATE = '20240312'
+FILES = {f'SVN_2024_{year}_12032024_105132.xlsx': bytes([year % 256]) * (1000 + year) for year in (1986, 1987, 1988)}
+SOURCES = 'data/emissions/sources'
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    '''Serves the fixture directory and records every request. HEAD reports the sizes
+    in `head_sizes` instead of the file's, as when a file changes between the HEAD and
+    the GET.'''
+
+    def __init__(self, *args, log, head_sizes, **kwargs):
+        self.log = log
+        self.head_sizes = head_sizes
+        super().__init__(*args, **kwargs)
+
+    def do_HEAD(self):
+        self.log.append(('HEAD', self.path))
+        name = self.path.rsplit('/', 1)[-1]
+        if name in self.head_sizes:
+            self.send_response(200)
+            self.send_header('Content-Length', str(self.head_sizes[name]))
+            self.end_headers()
+            return
+        super().do_HEAD()
+
+    def do_GET(self):
+        self.log.append(('GET', self.path))
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cdr(tmp_path, monkeypatch):
+    '''The CDR pages and an envelope holding FILES, served over HTTP; the script runs
+    in a working directory of its own.'''
+    served = tmp_path / 'cdr'
+    (served / ENV).mkdir(parents=True)
+    (served / 'index.html').write_text(
+        f'<div class="filessection"><a href="{ENV}/">{ENV}</a></div>'
+        f'<table><tr><td class="tcenter">12 Mar 2024</td></tr></table>')
+    (served / ENV / 'index_html').write_text(''.join(f'<em>{name}</em>' for name in FILES))
+    for name, body in FILES.items():
+        (served / ENV / name).write_bytes(body)
+
+    log, head_sizes = [], {}
+    handler = functools.partial(Handler, directory=str(served), log=log, head_sizes=head_sizes)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    work = tmp_path / 'work'
+    (work / SOURCES).mkdir(parents=True)
+    monkeypatch.chdir(work)
+    monkeypatch.setattr(ue, 'CDR_BASE_URL', f'http://127.0.0.1:{server.server_port}/')
+    yield work, log, head_sizes
+    server.shutdown()
+
+
+def file_gets(log):
+    return sorted(path.rsplit('/', 1)[-1] for method, path in log if method == 'GET' and path.endswith('.xlsx'))
+
+
+def download(config=None):
+    config = config or {'EU_LATEST_DATE': '20230414', 'EU_LATEST_ENV': 'envold'}
+    ue.download_emission_xlsx_files(config)
+    return config
+
+
+def test_fresh_download(cdr):
+    work, log, _ = cdr
+    config = download()
+
+    assert file_gets(log) == sorted(FILES)
+    for name, body in FILES.items():
+        assert (work / SOURCES / DATE / name).read_bytes() == body
+    assert ue.read_downloads() == {
+        f'./{SOURCES}/{DATE}/{name}': {'size': len(body), 'etag': None} for name, body in FILES.items()}
+    assert config == {'EU_LATEST_DATE': DATE, 'EU_LATEST_ENV': ENV}
+    assert not list((work / SOURCES).glob('.*.part'))
+
+
+def test_second_run_skips_complete_files(cdr):
+    work, log, _ = cdr
+    download()
+    log.clear()
+
+    # An interrupted run leaves the config on the previous envelope, so the next run
+    # goes through the files again: every one is complete and only checked.
+    download()
+
+    assert file_gets(log) == []
+    assert sorted(path.rsplit('/', 1)[-1] for method, path in log if method == 'HEAD') == sorted(FILES)
+
+
+def test_truncated_file_is_fetched_again(cdr):
+    work, log, _ = cdr
+    download()
+    truncated = next(iter(FILES))
+    with open(work / SOURCES / DATE / truncated, 'r+b') as file:
+        file.truncate(10)
+    log.clear()
+
+    download()
+
+    assert file_gets(log) == [truncated]
+    assert (work / SOURCES / DATE / truncated).read_bytes() == FILES[truncated]
+
+
+def test_short_download_is_discarded(cdr):
+    work, _, head_sizes = cdr
+    short = next(iter(FILES))
+    head_sizes[short] = len(FILES[short]) + 1
+
+    with pytest.raises(IOError, match=f'got {len(FILES[short])} bytes, expected {len(FILES[short]) + 1}'):
+        download()
+
+    assert not (work / SOURCES / DATE / short).exists()
+    assert not list((work / SOURCES).glob('.*.part'))